@@ -3,7 +3,6 @@ from sklearn.svm import SVC
 from sklearn.tree import DecisionTreeClassifier
 from sklearn.linear_model import LogisticRegression
 from sklearn.ensemble import RandomForestClassifier
-import xgboost as xgb
 
 
 class BaseClassifier:
@@ -22,6 +21,8 @@ class BaseClassifier:
 
 class Classifiers:
     def __init__(self, random_state=0):
+        import xgboost as xgb
+
         self.num_classifiers_ = 0
 
         self.models_ = (
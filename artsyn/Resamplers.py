@@ -8,18 +8,20 @@ from imblearn.over_sampling import SVMSMOTE
 from imblearn.over_sampling import KMeansSMOTE
 from imblearn.over_sampling import ADASYN
 
-from DeepCoreML.generators.c_gan import cGAN
-from DeepCoreML.generators.sb_gan import sbGAN
-from DeepCoreML.generators.ct_gan import ctGAN
-from DeepCoreML.generators.ctd_gan import ctdGAN
-from DeepCoreML.generators.cbr import CBR
-from DeepCoreML.generators.ctabgan_synthesizer import CTABGANSynthesizer
-from DeepCoreML.TabularTransformer import TabularTransformer
+from artsyn.generators.c_gan import cGAN
+from artsyn.generators.sb_gan import sbGAN
+from artsyn.generators.ct_gan import ctGAN
+from artsyn.generators.ctd_gan import ctdGAN
+from artsyn.generators.cbr import CBR
+from artsyn.generators.ctabgan_synthesizer import CTABGANSynthesizer
+from artsyn.TabularTransformer import TabularTransformer
 
-from sdv.single_table import GaussianCopulaSynthesizer
-from sdv.single_table import CTGANSynthesizer
-from sdv.single_table import TVAESynthesizer
-from sdv.single_table import CopulaGANSynthesizer
+
+def _sdv_synthesizers():
+    """The SDV synthesizer classes. SDV is imported at first use, because importing it takes several seconds."""
+    from sdv.single_table import GaussianCopulaSynthesizer, CTGANSynthesizer, TVAESynthesizer, CopulaGANSynthesizer
+
+    return GaussianCopulaSynthesizer, CTGANSynthesizer, TVAESynthesizer, CopulaGANSynthesizer
 
 
 class BaseResampler:
@@ -194,6 +196,7 @@ class TestSynthesizers:
                The values correspond to the desired number of samples for each class.`
         """
         self._random_state = random_state
+        GaussianCopulaSynthesizer, CTGANSynthesizer, TVAESynthesizer, CopulaGANSynthesizer = _sdv_synthesizers()
 
         disc = (256, 256)
         gen = (256, 256)
@@ -367,16 +370,14 @@ class TestSynthesizers:
 
             self._add_base_resampler(name, model)
 
-        elif (isinstance(model, CTGANSynthesizer) or isinstance(model, TVAESynthesizer) or
-              isinstance(model, GaussianCopulaSynthesizer) or isinstance(model, CopulaGANSynthesizer) or
-              isinstance(model, CTABGANSynthesizer)):
-
-            self._add_sdv_resampler(name, model)
-
         elif isinstance(model, ctdGAN) or isinstance(model, ctGAN):
 
             self._add_ct_resampler(name, model)
 
+        elif isinstance(model, CTABGANSynthesizer) or isinstance(model, _sdv_synthesizers()):
+
+            self._add_sdv_resampler(name, model)
+
         else:
             print("The provided model object is not supported. The supported model must be one of the following:")
             print("\tRandomOverSampler, SMOTE, BorderlineSMOTE, SVMSMOTE, KMeansSMOTE, ADASYN, CBR,")
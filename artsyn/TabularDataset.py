@@ -1,20 +1,22 @@
+import os
 import pathlib
 import gzip
 import json
 
+import numpy as np
 import pandas as pd
 
-import seaborn as sns
-import matplotlib.pyplot as plt
-
 from sklearn.preprocessing import LabelEncoder
 from sklearn.datasets import make_classification
 from sklearn.model_selection import cross_validate
 from sklearn.metrics import make_scorer
 from sklearn.metrics import f1_score, accuracy_score, balanced_accuracy_score, precision_score, recall_score
-from imblearn.metrics import sensitivity_score, specificity_score
 
-from DeepCoreML.Dataset import Dataset
+from artsyn.Dataset import Dataset
+from artsyn.shared_arrays import SharedArray, IndexedArray
+from artsyn import dataset_cache
+from artsyn import tabular_ingest
+from artsyn.thread_budget import delegated_budget
 
 import warnings
 
@@ -53,7 +55,10 @@ class TabularDataset(Dataset):
         self._raw_df = None
 
         # The Dataframe after some processing (will be used for training)
-        self.df_ = None
+        self._df = None
+
+        # The dtypes of the processed Dataframe columns (used to rebuild it from the cached arrays)
+        self._column_dtypes = None
 
         # Create one LabelEncoder object for each categorical column
         if categorical_columns is None:
@@ -66,6 +71,75 @@ class TabularDataset(Dataset):
         self.x_ = None
         self.y_ = None
 
+        # Descriptors of the shared buffers of x_ and y_ (see `publish`)
+        self.shared_ = None
+
+    @property
+    def df_(self):
+        # A dataset that was loaded from the cache has its arrays only; the Dataframe is rebuilt on first access.
+        if self._df is None and self._column_dtypes is not None and self.x_ is not None:
+            x = np.asarray(self.x_)
+            columns = {str(c): x[:, c] for c in range(x.shape[1])}
+            columns[str(self.class_column)] = np.asarray(self.y_)
+            self._df = pd.DataFrame(columns).astype(dict(zip(columns, self._column_dtypes)))
+        return self._df
+
+    @df_.setter
+    def df_(self, value):
+        self._df = value
+
+    def __getstate__(self):
+        # A published dataset is pickled without its arrays (and the raw frame it was loaded from); the receiving process
+        # attaches to the shared buffers.
+        state = self.__dict__.copy()
+        if self.shared_ is not None:
+            state['x_'] = state['y_'] = state['_raw_df'] = None
+            if state['_column_dtypes'] is not None:
+                state['_df'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.shared_ is not None:
+            self.x_ = self.shared_['x'].attach()
+            self.y_ = self.shared_['y'].attach()
+
+    def publish(self, backend='shm', directory=None):
+        """Move `x_` and `y_` into shared buffers, so that worker processes attach to them instead of receiving
+        pickled copies. After this call, pickling the dataset (e.g. when it is passed to a process pool) transfers
+        only the names of the buffers.
+
+        Args:
+            backend (str): 'shm' (named shared memory) or 'npy' (memory-mapped `.npy` files).
+            directory (str): The directory of the `.npy` files (backend 'npy').
+
+        Returns:
+            A dictionary with the `SharedArray` descriptors of `x_` ('x') and `y_` ('y').
+        """
+        if self.shared_ is None:
+            self.shared_ = {'x': SharedArray.publish(self.x_, backend=backend, directory=directory),
+                            'y': SharedArray.publish(self.y_, backend=backend, directory=directory)}
+            self.x_ = self.shared_['x'].attach()
+            self.y_ = self.shared_['y'].attach()
+
+        return self.shared_
+
+    def unlink(self):
+        """Copy `x_` and `y_` back to private memory and release their shared buffers (publishing process only)."""
+        if self.shared_ is not None:
+            self.x_, self.y_ = np.array(self.x_), np.array(self.y_)
+            for handle in self.shared_.values():
+                handle.unlink()
+            self.shared_ = None
+
+    def fold(self, indices):
+        """Return read-only views of the rows `indices` of `x_` and `y_` (e.g. the training rows of a cross validation
+        fold). The rows are gathered when the views are accessed; no copy of the dataset is made. The views of a
+        published dataset are pickled with the names of its shared buffers, not with the rows."""
+        if self.shared_ is not None:
+            return IndexedArray(self.shared_['x'], indices), IndexedArray(self.shared_['y'], indices)
+        return IndexedArray(self.x_, indices), IndexedArray(self.y_, indices)
+
     # Create synthetic imbalanced datasets with numeric features
     def create_synthetic(self, num_samples=1000, num_classes=2, imb_ratio=(0.5, 0.5)):
         """
@@ -87,43 +161,71 @@ class TabularDataset(Dataset):
                 n_samples=num_samples, n_features=2, n_clusters_per_class=1, flip_y=0, n_classes=4, weights=imb_ratio,
                 class_sep=1.0, n_informative=2, n_redundant=0, n_repeated=0, random_state=self._random_state)
 
-        self.class_column = 1
         self.num_rows = num_samples
         self.num_classes = num_classes
 
         x = synthetic_dataset[0]
         y = synthetic_dataset[1]
+        self.class_column = x.shape[1]
 
         self.num_rows = num_samples
         self.num_columns = self.dimensionality = x.shape[1]
+        self.x_, self.y_ = x, y
+        self._column_dtypes = [x.dtype.name] * x.shape[1] + [y.dtype.name]
 
         # print("Num Samples:", self.num_rows, "\nClass Distribution:")
         # for k in range(self.num_classes):
         #    print("\tClass", k, ":", len(y[y == k]), "samples")
 
     # Load a dataset from an external CSV file
-    def load_from_csv(self, path=''):
+    def load_from_csv(self, path='', cache_dir=None, chunk_size=None, engine='c'):
         """
         Load a Dataset from a CSV file and compute several basic statistics (number of samples, number of classes,
         input dimensionality). The target variables are Label Encoded.
 
         Args:
             path: The location of the input CSV file.
+            cache_dir: If set, the preprocessed dataset (arrays, encoders and column metadata) is stored in this
+                directory, and subsequent loads of the same file with the same parameters read the memory-mapped arrays
+                from there instead of parsing and preprocessing the file again. Note that the cached dataset keeps the
+                row order of the load that created it.
+            chunk_size: If set, a CSV file is read in chunks of `chunk_size` rows with compact dtypes, directly into
+                preallocated arrays (see `_load_chunked`). The features are stored as int32 (categorical and integer
+                columns only) or float32.
+            engine: The CSV parser of the chunked reader: 'c' (pandas) or 'pyarrow'.
         """
+        key, source, params = None, None, dict(self._cache_params(), chunked=chunk_size is not None)
+        if cache_dir is not None:
+            key, source = dataset_cache.cache_key(path, params)
+            if self._load_cached(cache_dir, key):
+                return
+
         file_extension = pathlib.Path(path).suffix
-        if file_extension == '.csv':
-            self._raw_df = pd.read_csv(path, skipinitialspace=True, encoding='utf-8',
-                                       keep_default_na=True, na_values="<null>")
+        if file_extension == '.csv' and chunk_size is not None:
+            self._load_chunked(path, chunk_size, engine)
         else:
-            self._raw_df = self.get_df(path)
+            if file_extension == '.csv':
+                self._raw_df = pd.read_csv(path, **tabular_ingest.CSV_OPTIONS)
+            else:
+                self._raw_df = self.get_df(path)
+            self._preprocess_frame()
+
+        if cache_dir is not None:
+            self._store_cached(cache_dir, key, source, params)
+
+        # print("Num Samples:", self.num_rows, "\nClass Distribution:")
+        # for k in range(self.num_classes):
+        #    print("\tClass", k, ":", len(self.y_[self.y_ == k]), "samples")
 
+    def _preprocess_frame(self):
+        """Preprocess the raw Dataframe into `df_`, `x_` and `y_`."""
         # Preprocessing steps:
         # Step 1: Remove rows with missing values.
         self.df_ = self._raw_df.dropna(inplace=False)
         self.df_.reset_index(drop=True, inplace=True)
 
         # Step 2: Shuffle the dataframe
-        self.df_ = self.df_.sample(frac=1).reset_index(drop=True)
+        self.df_ = self.df_.sample(frac=1, random_state=np.random.default_rng(self._random_state)).reset_index(drop=True)
 
         # Test only for 1000 rows
         #self.df_ = self.df_.iloc[:1000, :]
@@ -168,10 +270,131 @@ class TabularDataset(Dataset):
         # Useful quick reference statistics
         self.num_classes = len(self.df_.iloc[:, self.class_column].unique())
         self.dimensionality = self.x_.shape[1]
+        self._column_dtypes = [str(dt) for dt in self.df_.dtypes]
 
-        # print("Num Samples:", self.num_rows, "\nClass Distribution:")
-        # for k in range(self.num_classes):
-        #    print("\tClass", k, ":", len(self.y_[self.y_ == k]), "samples")
+    def _load_chunked(self, path, chunk_size, engine):
+        """Read a CSV file in chunks directly into `x_` and `y_` (see `tabular_ingest`).
+
+        The rows with missing values are dropped and the categorical and class columns are label encoded chunk by
+        chunk. The rows of each chunk are copied into arrays that are allocated once for all the lines of the file,
+        and shrunk to the number of complete rows at the end. `df_` is built from the arrays on first access.
+        """
+        categorical = [] if self.categorical_columns is None else list(self.categorical_columns)
+        names, dtypes = tabular_ingest.infer_schema(path, set(categorical) | {self.class_column})
+
+        num_columns = len(names)
+        if self.class_column is None or not 0 <= self.class_column < num_columns:
+            raise ValueError("The chunked reader requires a valid class column.")
+
+        features = [j for j in range(num_columns) if j != self.class_column]
+        x_dtype = np.dtype(np.float32 if any(dtypes[names[j]] == 'float32' for j in features) else np.int32)
+        int_range = np.iinfo(np.int32)
+
+        capacity = tabular_ingest.count_lines(path)
+        x = np.empty((capacity, len(features)), dtype=x_dtype)
+        y = np.empty(capacity, dtype=np.int64)
+
+        encodings = {j: tabular_ingest.LabelEncoding(strip=engine == 'pyarrow') for j in categorical}
+        encodings[self.class_column] = tabular_ingest.LabelEncoding(strip=True)
+
+        n = 0
+        for chunk in tabular_ingest.read_chunks(path, dtypes, chunk_size, engine):
+            chunk = chunk.dropna()
+            rows = slice(n, n + chunk.shape[0])
+
+            for k, j in enumerate(features):
+                if j in encodings:
+                    x[rows, k] = encodings[j].partial_transform(chunk.iloc[:, j])
+                else:
+                    values = chunk.iloc[:, j].to_numpy()
+                    # An integer column is parsed as float in the chunks with missing values; after `dropna`, its
+                    # values are accepted if they are whole numbers.
+                    if x_dtype.kind == 'i' and values.size > 0 and (
+                            values.dtype.kind == 'f' and not np.array_equal(values, np.trunc(values))
+                            or values.min() < int_range.min or values.max() > int_range.max):
+                        raise ValueError("Column " + str(j) + " is not an int32 column beyond the first rows that "
+                                         "its schema was inferred from; declare it as categorical or load the file "
+                                         "without chunk_size.")
+                    x[rows, k] = values
+
+            y[rows] = encodings[self.class_column].partial_transform(chunk.iloc[:, self.class_column])
+            n += chunk.shape[0]
+
+        x.resize((n, len(features)), refcheck=False)
+        y.resize(n, refcheck=False)
+
+        # Replace the provisional codes with the codes of the fitted label encoders
+        for c, j in enumerate(categorical):
+            encodings[j].finalize(self._label_encoders[c], x[:, features.index(j)])
+        encodings[self.class_column].finalize(self._class_encoder, y)
+
+        # Shuffle the rows of x and y in place with the same permutation
+        rng = np.random.default_rng(self._random_state)
+        state = rng.bit_generator.state
+        rng.shuffle(x)
+        rng.bit_generator.state = state
+        rng.shuffle(y)
+
+        # Put the class column in the end and adjust the indices of the categorical columns
+        if self.categorical_columns is not None:
+            self.categorical_columns = [c - 1 if c > self.class_column else c for c in self.categorical_columns]
+        self.class_column = num_columns - 1
+
+        self._raw_df = self._df = None
+        self.x_, self.y_ = x, y
+        self._column_dtypes = ['int32' if j in encodings else x_dtype.name for j in features] + [y.dtype.name]
+
+        self.num_rows = n
+        self.num_columns = num_columns
+        self.num_classes = len(self._class_encoder.classes_)
+        self.dimensionality = len(features)
+
+    def _cache_params(self):
+        """The load parameters that determine the preprocessed dataset (part of the cache key)."""
+        return {'class_column': self.class_column,
+                'categorical_columns': None if self.categorical_columns is None else list(self.categorical_columns),
+                'random_state': self._random_state}
+
+    def _store_cached(self, cache_dir, key, source, params):
+        os.makedirs(cache_dir, exist_ok=True)
+
+        meta = {
+            'source': source,
+            'params': params,
+            'num_rows': self.num_rows,
+            'num_columns': self.num_columns,
+            'num_classes': self.num_classes,
+            'dimensionality': self.dimensionality,
+            'class_column': self.class_column,
+            'categorical_columns': self.categorical_columns,
+            'column_dtypes': self._column_dtypes,
+            'label_encoders': [] if self.categorical_columns is None else
+            [dataset_cache.encoder_state(enc) for enc in self._label_encoders],
+            'class_encoder': dataset_cache.encoder_state(self._class_encoder),
+        }
+        dataset_cache.save_entry(cache_dir, key, self.x_, self.y_, meta)
+
+    def _load_cached(self, cache_dir, key):
+        entry = dataset_cache.load_entry(cache_dir, key)
+        if entry is None:
+            return False
+
+        self.x_, self.y_, meta = entry
+        self._raw_df = self._df = None
+        self._column_dtypes = meta['column_dtypes']
+
+        self.num_rows = meta['num_rows']
+        self.num_columns = meta['num_columns']
+        self.num_classes = meta['num_classes']
+        self.dimensionality = meta['dimensionality']
+        self.class_column = meta['class_column']
+        self.categorical_columns = meta['categorical_columns']
+
+        if self.categorical_columns is not None:
+            self._label_encoders = [dataset_cache.restore_encoder(LabelEncoder(), state)
+                                    for state in meta['label_encoders']]
+        dataset_cache.restore_encoder(self._class_encoder, meta['class_encoder'])
+        return True
 
     # Get dummies - onehot encode the categorical columns
     def get_dummies(self):
@@ -201,6 +424,9 @@ class TabularDataset(Dataset):
         Uses a 2-dimensional space to plot two features of the dataset and color the data points according to their
         class.
         """
+        import seaborn as sns
+        import matplotlib.pyplot as plt
+
         sns.scatterplot(x=self.x_[:, dim1], y=self.x_[:, dim2], hue=self.y_, legend=False)
         plt.show()
 
@@ -214,7 +440,8 @@ class TabularDataset(Dataset):
         Args:
             estimator: A multi-stage Pipeline object. The Pipeline must include a classifier at its final stage.
             num_folds: Number of folds for cross validation.
-            num_threads: The number of parallel threads for cross validation.
+            num_threads: The maximum number of parallel workers for cross validation. If `None`, the folds are
+                distributed over the thread budget of the package (`artsyn.thread_budget`).
             classifier_str: A custom string that describes the Classifier in the Pipeline.
             sampler_str: A custom string that describes the other stages of the Pipeline.
             order: An assistant variable for enumerating the returned results.
@@ -222,6 +449,8 @@ class TabularDataset(Dataset):
         Returns:
             Two objects that store all cross validation results.
         """
+        from imblearn.metrics import sensitivity_score, specificity_score
+
         scorers = {
             'accuracy': make_scorer(accuracy_score),
             'balanced_accuracy': make_scorer(balanced_accuracy_score),
@@ -232,10 +461,15 @@ class TabularDataset(Dataset):
             'recall': make_scorer(recall_score, average='weighted'),
         }
 
+        # A published dataset reaches the cross validation workers as views over its shared buffers: each worker
+        # attaches to them by name and gathers the rows of its fold only.
+        x, y = (self.x_, self.y_) if self.shared_ is None else self.fold(np.arange(self.x_.shape[0]))
+
         # cross_validate uses Stratified kFold when cv is int
-        cv_results = cross_validate(estimator, self.x_, self.y_, cv=num_folds, scoring=scorers,
-                                    return_train_score=False, return_estimator=False, n_jobs=num_threads,
-                                    error_score='raise')
+        with delegated_budget(num_folds, num_threads) as workers:
+            cv_results = cross_validate(estimator, x, y, cv=num_folds, scoring=scorers,
+                                        return_train_score=False, return_estimator=False, n_jobs=workers,
+                                        error_score='raise')
 
         results_list = []
         for key in cv_results.keys():
@@ -282,16 +516,22 @@ class TabularDataset(Dataset):
         """
         return self.df_
 
-    def get_df(self, path):
-        i = 0
-        df = {}
+    def get_df(self, path, chunk_size=100000):
+        # Build one Dataframe per chunk of records and concatenate them, instead of collecting all the records first.
+        chunks, records = [], []
         for d in self.parse(path):
-            df[i] = d
-            i += 1
-        return pd.DataFrame.from_dict(df, orient='index')
+            records.append(d)
+            if len(records) == chunk_size:
+                chunks.append(pd.DataFrame.from_records(records))
+                records = []
+
+        if records or not chunks:
+            chunks.append(pd.DataFrame.from_records(records))
+
+        return pd.concat(chunks, ignore_index=True)
 
     @staticmethod
     def parse(path):
-        g = gzip.open(path, 'rb')
-        for lt in g:
-            yield json.loads(lt)
+        with gzip.open(path, 'rb') as g:
+            for lt in g:
+                yield json.loads(lt)
@@ -2,11 +2,9 @@ import numpy as np
 import pandas as pd
 
 from scipy.stats import chi2_contingency
-import gower
 from sklearn.model_selection import StratifiedKFold
 from sklearn.metrics import f1_score, accuracy_score, balanced_accuracy_score, precision_score, recall_score
 
-from xgboost import XGBClassifier
 
 class TabularEvaluator:
     def __init__(self, df_real, df_syn, target, cat_idx, seed=42):
@@ -61,6 +59,8 @@ class TabularEvaluator:
         }
 
     def gower_metrics(self):
+        import gower
+
         df_r = self._prep_gower(self.df_real_raw)
         df_s = self._prep_gower(self.df_syn_raw)
 
@@ -76,6 +76,8 @@ class TabularEvaluator:
         }
 
     def privacy(self, n_splits=5):
+        from xgboost import XGBClassifier
+
         df = pd.concat([self.df_real_raw, self.df_syn_raw])
         y = np.array([1] * len(self.df_real_raw) + [0] * len(self.df_syn_raw))
 
@@ -105,6 +107,8 @@ class TabularEvaluator:
         }
 
     def utility(self, n_splits=5):
+        from xgboost import XGBClassifier
+
         Xr, yr = self._prep_ml(self.df_real_raw)
         Xs, ys = self._prep_ml(self.df_syn_raw)
 
@@ -8,11 +8,13 @@ from sklearn.preprocessing import StandardScaler, MinMaxScaler, PowerTransformer
 from sklearn.decomposition import PCA
 from sklearn.pipeline import Pipeline
 
-from joblib import Parallel, delayed
-from rdt.transformers import ClusterBasedNormalizer, OneHotEncoder
+from joblib import delayed
+
+from artsyn.instrumentation import instrumented
+from artsyn.shared_arrays import SharedArray
+from artsyn.thread_budget import run_parallel
 
 from collections import namedtuple
-import multiprocessing
 
 SpanInfo = namedtuple('SpanInfo', ['dim', 'activation_fn'])
 ColumnTransformInfo = namedtuple(
@@ -64,6 +66,7 @@ class TabularTransformer(object):
         self.output_dimensions = 0
         self.ohe_dimensions = 0
         self.dataframe = True
+        self.shared_ = None
 
     def _fit_continuous(self, data):
         """Train Bayesian GMM for continuous columns.
@@ -80,6 +83,7 @@ class TabularTransformer(object):
 
         cti = None
         if self._cont_normalizer == 'vgm':
+            from rdt.transformers import ClusterBasedNormalizer
             tran = ClusterBasedNormalizer(model_missing_values=True, max_clusters=min(len(data), self._max_clusters))
             tran.fit(data, column_name)
             num_components = sum(tran.valid_component_indicator)
@@ -157,6 +161,8 @@ class TabularTransformer(object):
         Returns:
             namedtuple: A ``ColumnTransformInfo`` object.
         """
+        from rdt.transformers import OneHotEncoder
+
         column_name = data.columns[0]
         ohe = OneHotEncoder()
         ohe.fit(data, column_name)
@@ -170,6 +176,7 @@ class TabularTransformer(object):
             column_max=-1, column_min=-1,
             output_info=[SpanInfo(num_categories, 'softmax')], output_dimensions=num_categories)
 
+    @instrumented('transformer.fit')
     def fit(self, raw_data, discrete_columns=()):
         """Fit the ``DataTransformer`` in a column-wise fashion. One transformer is fitted per column.
 
@@ -264,11 +271,18 @@ class TabularTransformer(object):
                 process = delayed(self.transform_discrete)(column_transform_info, data)
             processes.append(process)
 
-        return Parallel(n_jobs=-1)(processes)
-        # return Parallel(n_jobs=0.5 * multiprocessing.cpu_count())(processes)
+        return run_parallel(processes)
+
+    @instrumented('transformer.transform')
+    def transform(self, raw_data, shared=None):
+        """Take raw data and output a matrix data.
 
-    def transform(self, raw_data):
-        """Take raw data and output a matrix data."""
+        Args:
+            raw_data: The data to transform (NumPy array or pandas DataFrame).
+            shared: If 'shm' or 'npy', the output matrix is written directly into a new shared buffer (named shared
+                memory or memory-mapped `.npy` file), so that worker processes can attach to it by name. The
+                descriptor of the buffer is stored in `shared_`.
+        """
         if not isinstance(raw_data, pd.DataFrame):
             column_names = [str(num) for num in range(raw_data.shape[1])]
             raw_data = pd.DataFrame(raw_data, columns=column_names)
@@ -279,9 +293,14 @@ class TabularTransformer(object):
         else:
             column_data_list = self._parallel_transform(raw_data, self.column_transform_info_list)
 
-        return np.concatenate(column_data_list, axis=1).astype(float)
+        if shared is None:
+            return np.concatenate(column_data_list, axis=1).astype(float)
+
+        num_columns = sum(np.shape(column_data)[1] for column_data in column_data_list)
+        self.shared_ = SharedArray.create((raw_data.shape[0], num_columns), float, backend=shared)
+        return np.concatenate(column_data_list, axis=1, out=self.shared_.attach(), casting='unsafe')
 
-    def _inverse_transform_continuous(self, column_transform_info, column_data, sigmas, st):
+    def _inverse_transform_continuous(self, column_transform_info, column_data, sigmas, st, rng=None):
         ret_data = None
         encoder = column_transform_info.transform
 
@@ -289,7 +308,7 @@ class TabularTransformer(object):
             data = pd.DataFrame(column_data[:, :2], columns=list(encoder.get_output_sdtypes()))
             data[data.columns[1]] = np.argmax(column_data[:, 1:], axis=1)
             if sigmas is not None:
-                selected_normalized_value = np.random.normal(data.iloc[:, 0], sigmas[st])
+                selected_normalized_value = (np.random if rng is None else rng).normal(data.iloc[:, 0], sigmas[st])
                 data.iloc[:, 0] = selected_normalized_value
 
             ret_data = encoder.reverse_transform(data)
@@ -312,11 +331,13 @@ class TabularTransformer(object):
         data = pd.DataFrame(column_data, columns=list(ohe.get_output_sdtypes()))
         return ohe.reverse_transform(data)[column_transform_info.column_name]
 
-    def inverse_transform(self, data, sigmas=None):
+    @instrumented('transformer.inverse_transform')
+    def inverse_transform(self, data, sigmas=None, rng=None):
         """Take matrix data and output raw data.
 
         Output uses the same type as input to the transform function.
-        Either np array or pd dataframe.
+        Either np array or pd dataframe. If `sigmas` is given, the noise that is added to the normalized values of the
+        continuous columns is drawn from the NumPy random Generator `rng` (the global NumPy random state if `None`).
         """
         st = 0
         recovered_column_data_list = []
@@ -325,7 +346,7 @@ class TabularTransformer(object):
             dim = column_transform_info.output_dimensions
             column_data = data[:, st:st + dim]
             if column_transform_info.column_type == 'continuous':
-                recovered_col_data = self._inverse_transform_continuous(column_transform_info, column_data, sigmas, st)
+                recovered_col_data = self._inverse_transform_continuous(column_transform_info, column_data, sigmas, st, rng)
             else:
                 recovered_col_data = self.inverse_transform_discrete(column_transform_info, column_data)
 
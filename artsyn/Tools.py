@@ -4,8 +4,9 @@ import pandas as pd
 from scipy.stats import chi2_contingency
 import torch
 
-import gc
 import contextlib
+import functools
+import math
 
 
 def set_random_states(manual_seed):
@@ -72,9 +73,55 @@ def reset_random_states(np_random_state, torch_random_state, cuda_random_state):
 
     if torch.cuda.is_available():
         torch.cuda.random.set_rng_state(cuda_random_state)
-        torch.cuda.empty_cache()
 
-    gc.collect()
+
+def random_generators(seed, device='cpu'):
+    """Create the random number generators of a model: a NumPy `Generator` and a torch `Generator` on `device`.
+
+    The models draw their random numbers from these generators only, so that their results depend on their own
+    `random_state`, and not on the global random state that other models (or threads) modify.
+
+    Args:
+        seed: An integer to seed the generators. If `None`, fresh entropy is used.
+        device: The device of the torch `Generator`.
+
+    Returns:
+        The NumPy and the torch `Generator`.
+    """
+    rng, torch_rng = np.random.default_rng(), torch.Generator(device=device)
+    reseed_generators(rng, torch_rng, seed)
+    return rng, torch_rng
+
+
+def reseed_generators(rng, torch_rng, seed):
+    """Reseed the NumPy `Generator` `rng` and the torch `Generator` `torch_rng` in place, so that the objects which
+    hold references to them (e.g. the data samplers of a model) draw from the new streams. The result is identical to
+    `random_generators(seed)`."""
+    rng.bit_generator.state = np.random.default_rng(seed).bit_generator.state
+    torch_rng.manual_seed(int(rng.integers(2 ** 63)))
+
+
+def init_weights(module, generator):
+    """Reinitialize the parameters of the layers of `module` in place, drawing from the torch `Generator` `generator`
+    instead of the global generator. The `nn.Linear` layers are initialized as in PyTorch (Kaiming-uniform weights,
+    uniform biases); the other layers with parameters (e.g. BatchNorm) are reset with their `reset_parameters`.
+
+    Args:
+        module: A `nn.Module` on the device of `generator`.
+        generator: The torch `Generator` of the model.
+
+    Returns:
+        The `module`.
+    """
+    for layer in module.modules():
+        if isinstance(layer, torch.nn.Linear):
+            torch.nn.init.kaiming_uniform_(layer.weight, a=math.sqrt(5), generator=generator)
+            if layer.bias is not None:
+                bound = 1 / math.sqrt(layer.in_features) if layer.in_features > 0 else 0
+                torch.nn.init.uniform_(layer.bias, -bound, bound, generator=generator)
+        elif hasattr(layer, 'reset_parameters'):
+            layer.reset_parameters()
+    return module
 
 
 @contextlib.contextmanager
@@ -125,6 +172,24 @@ def random_state(function):
 
     return wrapper
 
+
+def seeded_training(function):
+    """Decorator of the training methods of the synthesizers. It resets the random number generators of the model
+    (`_seed_random_generators`) before the method runs. The training methods draw all their random numbers (weight
+    initialization, Dropout masks, latent vectors, batches) from these generators and not from the global ones, so
+    the models that are trained concurrently (e.g. in threads) remain reproducible.
+
+    Args:
+        function (Callable): The training method to wrap around.
+    """
+    @functools.wraps(function)
+    def wrapper(self, *args, **kwargs):
+        self._seed_random_generators()
+        return function(self, *args, **kwargs)
+
+    return wrapper
+
+
 def cramers_v(x, y):
     confusion_matrix = pd.crosstab(x, y)
     chi2 = chi2_contingency(confusion_matrix)[0]
@@ -0,0 +1,32 @@
+# ARTSyn: Artificial Tabular Data Synthesizers.
+#
+# The models are exposed lazily: `artsyn.ctdGAN` imports its module (and torch) at first access, so that importing the
+# package itself is cheap. The optional heavy dependencies (plotting, SDV, xgboost, kmodes, gower) are imported by the
+# modules that use them, at first use.
+
+import importlib
+
+# Public name -> module that defines it
+_MODELS = {
+    'cGAN': '.generators.c_gan',
+    'sbGAN': '.generators.sb_gan',
+    'ctGAN': '.generators.ct_gan',
+    'ctdGAN': '.generators.ctd_gan',
+    'CBR': '.generators.cbr',
+    'CTABGANSynthesizer': '.generators.ctabgan_synthesizer',
+}
+
+__all__ = list(_MODELS)
+
+
+def __getattr__(name):
+    if name not in _MODELS:
+        raise AttributeError("module " + repr(__name__) + " has no attribute " + repr(name))
+
+    value = getattr(importlib.import_module(_MODELS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
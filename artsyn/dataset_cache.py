@@ -0,0 +1,121 @@
+# Binary cache of the preprocessed tabular datasets.
+#
+# `TabularDataset.load_from_csv` parses, cleans, shuffles and encodes a file before its arrays can be used. The result
+# is stored once in a cache entry, i.e. a directory named after the cache key, with three files:
+#
+# * `x.npy`: the preprocessed feature matrix `x_`.
+# * `y.npy`: the encoded class labels `y_`.
+# * `meta.json`: the format version, the description of the source file, the load parameters, the column metadata and
+#   the classes of the label encoders.
+#
+# The key is derived from the content digest, size and modification time of the source file and from the load
+# parameters, so an entry is never reused after the file or the parameters change. The arrays of an entry are
+# memory-mapped when they are loaded.
+
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+
+CACHE_FORMAT_VERSION = 2
+
+
+def file_digest(path, block_size=1 << 20):
+    """Compute the BLAKE2b digest of the contents of the file `path`, reading `block_size` bytes at a time."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def cache_key(path, params):
+    """Build the cache key of loading the file `path` with the load parameters `params`.
+
+    Args:
+        path: The location of the source file.
+        params: A JSON serializable dictionary with the parameters that affect the preprocessing.
+
+    Returns:
+        The key (a hex string) and the description of the source file that is stored in `meta.json`.
+    """
+    st = os.stat(path)
+    source = {'path': os.path.abspath(path), 'size': st.st_size, 'mtime_ns': st.st_mtime_ns,
+              'digest': file_digest(path)}
+
+    description = json.dumps({'version': CACHE_FORMAT_VERSION, 'size': source['size'], 'mtime_ns': source['mtime_ns'],
+                              'digest': source['digest'], 'params': params}, sort_keys=True)
+    return hashlib.sha1(description.encode('utf-8')).hexdigest(), source
+
+
+def encoder_state(encoder):
+    """Describe the fitted classes of a `LabelEncoder` with JSON serializable values."""
+    return {'classes': encoder.classes_.tolist(), 'dtype': encoder.classes_.dtype.str}
+
+
+def restore_encoder(encoder, state):
+    """Restore the fitted classes of a `LabelEncoder` from the output of `encoder_state`."""
+    encoder.classes_ = np.asarray(state['classes'], dtype=np.dtype(state['dtype']))
+    return encoder
+
+
+def load_entry(directory, key):
+    """Load the cache entry `key` from `directory`.
+
+    The arrays are memory-mapped copy-on-write: they are paged in on access, and writing to them does not modify the
+    entry. Feature matrices of Python objects (i.e. columns with strings that were not declared as categorical) cannot
+    be memory-mapped and are read into memory.
+
+    Returns:
+        The arrays `x`, `y` and the metadata dictionary, or `None` if the entry does not exist or has an older format.
+    """
+    entry = os.path.join(directory, key)
+    try:
+        with open(os.path.join(entry, 'meta.json'), 'r') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if meta.get('format_version') != CACHE_FORMAT_VERSION:
+        return None
+
+    arrays = []
+    for name in ('x', 'y'):
+        file = os.path.join(entry, name + '.npy')
+        if meta['dtypes'][name] == '|O':
+            arrays.append(np.load(file, allow_pickle=True))
+        else:
+            arrays.append(np.load(file, mmap_mode='c'))
+
+    return arrays[0], arrays[1], meta
+
+
+def save_entry(directory, key, x, y, meta):
+    """Write the cache entry `key` into `directory`.
+
+    The entry is written into a temporary directory which is then renamed, so that a concurrent reader never sees a
+    partial entry. If another process has already stored the same entry, the new one is discarded.
+
+    Returns:
+        The path of the entry.
+    """
+    entry = os.path.join(directory, key)
+    tmp_entry = entry + '.tmp-' + str(os.getpid())
+    os.makedirs(tmp_entry, exist_ok=True)
+
+    x, y = np.asarray(x), np.asarray(y)
+    meta = dict(meta, format_version=CACHE_FORMAT_VERSION, dtypes={'x': x.dtype.str, 'y': y.dtype.str})
+
+    np.save(os.path.join(tmp_entry, 'x.npy'), x, allow_pickle=x.dtype == object)
+    np.save(os.path.join(tmp_entry, 'y.npy'), y, allow_pickle=y.dtype == object)
+    with open(os.path.join(tmp_entry, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=1)
+
+    try:
+        os.replace(tmp_entry, entry)
+    except OSError:
+        shutil.rmtree(tmp_entry, ignore_errors=True)
+
+    return entry
@@ -6,16 +6,17 @@ import time
 import inspect
 from tqdm import tqdm
 
-from DeepCoreML.generators.sb_gan import sbGAN
-from DeepCoreML.generators.c_gan import cGAN
-from DeepCoreML.generators.ct_gan import ctGAN
-from DeepCoreML.generators.ctd_gan import ctdGAN
-
-from DeepCoreML.TabularDataset import TabularDataset
-from DeepCoreML.Resamplers import TestSynthesizers
-from DeepCoreML.Tools import set_random_states, get_random_states, reset_random_states, compute_mixed_matrix
-from DeepCoreML.ResultHandler import ResultHandler
-from DeepCoreML.Classifiers import Classifiers
+from artsyn.generators.sb_gan import sbGAN
+from artsyn.generators.c_gan import cGAN
+from artsyn.generators.ct_gan import ctGAN
+from artsyn.generators.ctd_gan import ctdGAN
+
+from artsyn.TabularDataset import TabularDataset
+from artsyn.Resamplers import TestSynthesizers
+from artsyn.Tools import set_random_states, get_random_states, reset_random_states, compute_mixed_matrix
+from artsyn.ResultHandler import ResultHandler
+from artsyn.instrumentation import recording, span
+from artsyn.Classifiers import Classifiers
 
 import paths
 
@@ -38,7 +39,7 @@ def test_model(model, dataset, seed):
     """
     dset = TabularDataset(name='test', class_column=dataset['class_col'],
                           categorical_columns=dataset['categorical_cols'],  random_state=seed)
-    dset.load_from_csv(path=dataset['path'])
+    dset.load_from_csv(path=dataset['path'], cache_dir=paths.dataset_cache)
     dset.display_params()
 
     x = dset.x_
@@ -81,7 +82,7 @@ def test_model(model, dataset, seed):
 
 # Evaluate the ability of a resampling method to improve classification performance. This procedure employs k-fold
 # cross validation without a Pipeline. Instead, we manually control what takes place in each cross validation fold.
-def eval_resampling(datasets, num_folds=5, transformer=None, random_state=0):
+def eval_resampling(datasets, num_folds=5, transformer=None, random_state=0, phase_timing=False):
     """Evaluate the ability of a resampling method to improve classification performance. This procedure employs k-fold
     cross validation without a Pipeline. Instead, we manually control what takes place in each cross validation fold.
     During each fold, the following steps take place:
@@ -96,6 +97,9 @@ def eval_resampling(datasets, num_folds=5, transformer=None, random_state=0):
         num_folds (int): The number of cross validation folds.
         transformer (str): Determines if/how the balanced data will be normalized.
         random_state: Controls random number generation. Set this to a fixed integer to get reproducible results.
+        phase_timing (bool): If True, the phases of each synthesizer (e.g. clustering, training, sampling) and of each
+            classifier are timed with `instrumentation.recording`, and their times and counters are stored next to
+            the "Fit Time" of the results.
 
     """
     set_random_states(random_state)
@@ -126,7 +130,7 @@ def eval_resampling(datasets, num_folds=5, transformer=None, random_state=0):
 
         dataset = TabularDataset(key, class_column=ds['class_col'], categorical_columns=ds['categorical_cols'],
                                  random_state=random_state)
-        dataset.load_from_csv(path=ds['path'])
+        dataset.load_from_csv(path=ds['path'], cache_dir=paths.dataset_cache)
         performance_list = []
 
         print("\n===================================================================================================")
@@ -170,13 +174,15 @@ def eval_resampling(datasets, num_folds=5, transformer=None, random_state=0):
                 print("\t\tSynthesizer: ", synthesizer.name_)
 
                 # Generate synthetic data with the sampler.
+                recorder = None
                 if synthesizer.name_ == 'None':
                     x_balanced = dataset.x_[train_idx]
                     y_balanced = dataset.y_[train_idx]
                 else:
                     try:
-                        x_balanced, y_balanced = synthesizer.fit_resample(dataset=dataset, training_set_rows=train_idx,
-                                                                          sampling_strategy='auto')
+                        with recording(phase_timing) as recorder, span('eval.fit_resample'):
+                            x_balanced, y_balanced = synthesizer.fit_resample(
+                                dataset=dataset, training_set_rows=train_idx, sampling_strategy='auto')
                     except (ValueError, RuntimeError) as e:
                         # The oversampler failed to produce artificial samples. Classify using only the real samples.
                         print("\t\t\t == Exception Caught: '", e, "' ==")
@@ -208,10 +214,9 @@ def eval_resampling(datasets, num_folds=5, transformer=None, random_state=0):
 
                 # For each classifier
                 for classifier in tqdm(classifiers.models_, desc="Classifying...      "):
-                    reset_random_states(np_random_state, torch_random_state, cuda_random_state)
-
-                    classifier.fit(x_balanced_scaled, y_balanced)
-                    y_predict = classifier.predict(x_test_scaled)
+                    with recording(phase_timing) as classifier_recorder, span('eval.classification'):
+                        classifier.fit(x_balanced_scaled, y_balanced)
+                        y_predict = classifier.predict(x_test_scaled)
 
                     for scorer in scorers:
                         # Binary classification evaluation
@@ -231,12 +236,17 @@ def eval_resampling(datasets, num_folds=5, transformer=None, random_state=0):
                     lst = [key, n_fold, synthesizer.name_, classifier.name_, "Fit Time", oversampling_duration]
                     performance_list.append(lst)
 
+                    # The per-phase breakdown of the synthesizer and of the classifier (if phase_timing is enabled).
+                    for phase_recorder in (recorder, classifier_recorder):
+                        if phase_recorder is not None:
+                            performance_list += phase_recorder.ledger_rows([key, n_fold, synthesizer.name_, classifier.name_])
+
             d_drh = ResultHandler(description=paths.resampling_filename + key + "_seed_" + str(random_state),
                                   cv_results=performance_list, out_path=paths.resampling_path_split_files)
             d_drh.record_results()
 
 
-def eval_fidelity(datasets, num_folds=5, transformer=None, random_state=0):
+def eval_fidelity(datasets, num_folds=5, transformer=None, random_state=0, phase_timing=False):
     """
     Evaluate the ability of a generative model to produce high-fidelity data.
     In this experiment we:
@@ -250,6 +260,9 @@ def eval_fidelity(datasets, num_folds=5, transformer=None, random_state=0):
         num_folds (int): The number of cross validation folds.
         transformer (str or None): Determines if/how the balanced data will be normalized.
         random_state: Controls random number generation. Set this to a fixed integer to get reproducible results.
+        phase_timing (bool): If True, the phases of each synthesizer (e.g. clustering, training, sampling) and of each
+            classifier are timed with `instrumentation.recording`, and their times and counters are stored next to
+            the "Fit Time" of the results.
     """
 
     set_random_states(random_state)
@@ -278,7 +291,7 @@ def eval_fidelity(datasets, num_folds=5, transformer=None, random_state=0):
 
         dataset = TabularDataset(key, class_column=ds['class_col'], categorical_columns=ds['categorical_cols'],
                                  random_state=random_state)
-        dataset.load_from_csv(path=ds['path'])
+        dataset.load_from_csv(path=ds['path'], cache_dir=paths.dataset_cache)
         performance_list = []
 
         print("\n===================================================================================================")
@@ -338,8 +351,6 @@ def eval_fidelity(datasets, num_folds=5, transformer=None, random_state=0):
             y_test = dataset.y_[test_idx]
 
             for classifier in classifiers.models_:
-                reset_random_states(np_random_state, torch_random_state, cuda_random_state)
-
                 classifier.fit(x_train, y_train)
                 y_predict = classifier.predict(x_test)
 
@@ -378,8 +389,9 @@ def eval_fidelity(datasets, num_folds=5, transformer=None, random_state=0):
 
             # Generate synthetic data with the sampler.
             try:
-                x_balanced, y_balanced = synthesizer.fit_resample(
-                    dataset=dataset, training_set_rows=idx, sampling_strategy='create-new')
+                with recording(phase_timing) as recorder, span('eval.fit_resample'):
+                    x_balanced, y_balanced = synthesizer.fit_resample(
+                        dataset=dataset, training_set_rows=idx, sampling_strategy='create-new')
 
                 oversampling_duration = time.time() - t_s
 
@@ -489,10 +501,9 @@ def eval_fidelity(datasets, num_folds=5, transformer=None, random_state=0):
 
                 # For each classifier
                 for classifier in bal_classifiers.models_:
-                    reset_random_states(np_random_state, torch_random_state, cuda_random_state)
-
-                    classifier.fit(x_balanced_scaled, y_c_train)
-                    y_predict = classifier.predict(x_test_scaled)
+                    with recording(phase_timing) as classifier_recorder, span('eval.classification'):
+                        classifier.fit(x_balanced_scaled, y_c_train)
+                        y_predict = classifier.predict(x_test_scaled)
 
                     for scorer in scorers:
                         # Binary classification evaluation
@@ -512,6 +523,11 @@ def eval_fidelity(datasets, num_folds=5, transformer=None, random_state=0):
                     lst = [key, n_fold, synthesizer.name_, classifier.name_, "Fit Time", oversampling_duration]
                     performance_list.append(lst)
 
+                    # The per-phase breakdown of the synthesizer and of the classifier (if phase_timing is enabled).
+                    for phase_recorder in (recorder, classifier_recorder):
+                        if phase_recorder is not None:
+                            performance_list += phase_recorder.ledger_rows([key, n_fold, synthesizer.name_, classifier.name_])
+
             d_drh = ResultHandler(description=paths.fidelity_filename + key + "_seed_" + str(random_state),
                                   cv_results=performance_list, out_path=paths.fidelity_path_split_files)
             d_drh.record_results()
@@ -523,7 +539,7 @@ def eval_fidelity(datasets, num_folds=5, transformer=None, random_state=0):
 # 3. Merge and shuffle the datasets -> create a new dataset.
 # 4. Train a classifier on the new dataset and try to predict the flag. The easier it is to predict the flag, the
 #    more distinguishable between real and synthetic data.
-def eval_detectability(datasets, num_folds=5, transformer=None, random_state=0):
+def eval_detectability(datasets, num_folds=5, transformer=None, random_state=0, phase_timing=False):
     """
     Evaluate the ability of a generative model to produce high-fidelity data.
     In this experiment we:
@@ -540,6 +556,9 @@ def eval_detectability(datasets, num_folds=5, transformer=None, random_state=0):
         num_folds (int): The number of cross validation folds.
         transformer (str): Determines if/how the balanced data will be normalized.
         random_state: Controls random number generation. Set this to a fixed integer to get reproducible results.
+        phase_timing (bool): If True, the phases of each synthesizer (e.g. clustering, training, sampling) and of each
+            classifier are timed with `instrumentation.recording`, and their times and counters are stored next to
+            the "Fit Time" of the results.
     """
     set_random_states(random_state)
     np_random_state, torch_random_state, cuda_random_state = get_random_states()
@@ -568,7 +587,7 @@ def eval_detectability(datasets, num_folds=5, transformer=None, random_state=0):
         ds = datasets[key]
         dataset = TabularDataset(key, class_column=ds['class_col'], categorical_columns=ds['categorical_cols'],
                                  random_state=random_state)
-        dataset.load_from_csv(path=ds['path'])
+        dataset.load_from_csv(path=ds['path'], cache_dir=paths.dataset_cache)
         performance_list = []
 
         print("\n===================================================================================================")
@@ -609,8 +628,9 @@ def eval_detectability(datasets, num_folds=5, transformer=None, random_state=0):
                 t_s = time.time()
 
                 # Generate synthetic data with the sampler
-                x_resampled, y_resampled = synthesizer.fit_resample(dataset=dataset, training_set_rows=all_train_idx,
-                                                                    sampling_strategy=res_dict)
+                with recording(phase_timing) as recorder, span('eval.fit_resample'):
+                    x_resampled, y_resampled = synthesizer.fit_resample(
+                        dataset=dataset, training_set_rows=all_train_idx, sampling_strategy=res_dict)
 
                 # Although we require from the oversampling method to generate an equal number of samples as those
                 # included in the original dataset, several of them (e.g. K-Means SMOTE) may return more. So we
@@ -653,10 +673,9 @@ def eval_detectability(datasets, num_folds=5, transformer=None, random_state=0):
 
                     # For each classifier
                     for classifier in classifiers.models_:
-                        reset_random_states(np_random_state, torch_random_state, cuda_random_state)
-
-                        classifier.fit(x_train_scaled, y_train)
-                        y_predict = classifier.predict(x_test_scaled)
+                        with recording(phase_timing) as classifier_recorder, span('eval.classification'):
+                            classifier.fit(x_train_scaled, y_train)
+                            y_predict = classifier.predict(x_test_scaled)
 
                         for scorer in scorers:
                             performance = scorers[scorer](y_test, y_predict)
@@ -667,6 +686,11 @@ def eval_detectability(datasets, num_folds=5, transformer=None, random_state=0):
                         lst = [key, n_fold, synthesizer.name_, classifier.name_, "Fit Time", oversampling_duration]
                         performance_list.append(lst)
 
+                        # The per-phase breakdown of the synthesizer and of the classifier (if phase_timing is enabled).
+                        for phase_recorder in (recorder, classifier_recorder):
+                            if phase_recorder is not None:
+                                performance_list += phase_recorder.ledger_rows([key, n_fold, synthesizer.name_, classifier.name_])
+
         d_drh = ResultHandler(description=paths.detectability_filename + key + "_seed_" + str(random_state),
                               cv_results=performance_list, out_path=paths.detectability_path_split_files)
         d_drh.record_results()
@@ -713,7 +737,10 @@ def eval_oversampling_efficacy(datasets, num_threads, random_state):
         reset_random_states(np_random_state, torch_random_state, cuda_random_state)
         ds = datasets[key]
         original_dataset = TabularDataset(key, random_state=random_state)
-        original_dataset.load_from_csv(path=ds['path'])
+        original_dataset.load_from_csv(path=ds['path'], cache_dir=paths.dataset_cache)
+
+        # The cross validation workers attach to the shared buffers of the dataset instead of receiving copies of it.
+        original_dataset.publish()
 
         dataset_results_list = []
 
@@ -724,27 +751,30 @@ def eval_oversampling_efficacy(datasets, num_threads, random_state):
             metadata.columns[k] = {'sdtype': 'numerical'}
         metadata.columns[original_dataset.class_column - 1] = {'sdtype': 'categorical'}
 
-        # For each classifier
-        for clf in classifiers.models_:
-            synthesizers = TestSynthesizers(metadata, sampling_strategy='auto', random_state=random_state)
+        try:
+            # For each classifier
+            for clf in classifiers.models_:
+                synthesizers = TestSynthesizers(metadata, sampling_strategy='auto', random_state=random_state)
 
-            # For each over-sampler, balance the input dataset. The fit_resample method of each sampler is called
-            # internally by the `imblearn` pipeline and the cross validator.
-            for s in synthesizers.over_samplers_:
+                # For each over-sampler, balance the input dataset. The fit_resample method of each sampler is called
+                # internally by the `imblearn` pipeline and the cross validator.
+                for s in synthesizers.over_samplers_:
 
-                reset_random_states(np_random_state, torch_random_state, cuda_random_state)
-                order += 1
+                    reset_random_states(np_random_state, torch_random_state, cuda_random_state)
+                    order += 1
 
-                print("Testing", clf.name_, "with", s.name_)
+                    print("Testing", clf.name_, "with", s.name_)
 
-                # pipe_line = make_pipeline(s.sampler_, StandardScaler(), clf.model_)
-                pipe_line = make_pipeline(s, clf.model_)
-                r, _ = original_dataset.cross_val(estimator=pipe_line, num_folds=5, num_threads=num_threads,
-                                                  classifier_str=clf.name_, sampler_str=s.name_, order=order)
+                    # pipe_line = make_pipeline(s.sampler_, StandardScaler(), clf.model_)
+                    pipe_line = make_pipeline(s, clf.model_)
+                    r, _ = original_dataset.cross_val(estimator=pipe_line, num_folds=5, num_threads=num_threads,
+                                                      classifier_str=clf.name_, sampler_str=s.name_, order=order)
 
-                for e in range(len(r)):
-                    results_list.append(r[e])
-                    dataset_results_list.append(r[e])
+                    for e in range(len(r)):
+                        results_list.append(r[e])
+                        dataset_results_list.append(r[e])
+        finally:
+            original_dataset.unlink()
 
         # Record the results for this dataset
         drh = ResultHandler(key + "_oversampling", dataset_results_list)
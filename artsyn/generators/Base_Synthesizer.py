@@ -1,5 +1,7 @@
 import torch
 
+from artsyn.Tools import random_generators, reseed_generators
+
 
 class BaseSynthesizer:
     """`BaseSynthesizer` provides the base class for all generative models.
@@ -18,3 +20,11 @@ class BaseSynthesizer:
         self._samples_per_class = None          # Array [ [x_train_per_class] ]
 
         self._device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+
+        # The random number generators of the model (NumPy and torch). They are reset at the start of training.
+        self._rng, self._torch_rng = random_generators(random_state, self._device)
+
+    def _seed_random_generators(self, seed=None):
+        """Reseed the random number generators of the model in place, from `seed` or (by default) from
+        `random_state`."""
+        reseed_generators(self._rng, self._torch_rng, self._random_state if seed is None else seed)
@@ -1,13 +1,19 @@
+import time
+import warnings
+from contextlib import contextmanager
+
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 
 import torch
 
 from sklearn.preprocessing import OneHotEncoder
 
-from DeepCoreML.generators.Base_Synthesizer import BaseSynthesizer
+from artsyn.generators.Base_Synthesizer import BaseSynthesizer
+from artsyn.generators.sample_stream import iter_chunks, ConcatenatedArray
+from artsyn.generators.gan_generators import quantize_generator
+from artsyn.generators.training_metrics import TrainingMetrics, make_callbacks
+from artsyn.instrumentation import count, instrumented, span
 
 
 class GANSynthesizer(BaseSynthesizer):
@@ -30,12 +36,45 @@ class GANSynthesizer(BaseSynthesizer):
          - `auto`: perform oversampling on the minority classes to establish class imbalance in the dataset
          - `reproduce`: create a new dataset with the same class distribution as the input dataset
         random_state: An integer for seeding the involved random number generators.
+        quantize: Reduced precision for the Generator during sampling: `None` (float32, default), 'int8' (dynamic
+            quantization, CPU only) or 'bf16' (bfloat16 autocast).
+        metrics: The receivers of the per-step training metrics (losses, penalty and model-specific diagnostics):
+            the path of a `.jsonl` or `.parquet` file, a `training_metrics.MetricsCallback`, a function
+            `hook(step, metrics)`, or a list of them. `None` (default) disables the collection of metrics.
+        metrics_every: The number of training steps that are buffered on the device between two flushes of the
+            metrics to their receivers.
+        amp: Mixed precision training: `None` (float32, default) or 'bf16'. With 'bf16', the forward passes of the
+            Generator and the Discriminator during training run under bfloat16 autocast. Their outputs are cast back
+            to float32, so the activations, the losses and the gradient penalty are computed in float32.
+        compile: If True, the forward passes of the Generator and the Discriminator (and the output activations of
+            ctGAN/ctdGAN) are compiled with `torch.compile` during training. If compilation is not available or fails,
+            training continues in eager mode. The time spent compiling is stored in `compile_time_`.
     """
+    # Whether the model builds the conditional latent vectors of `sample_by_class` with `_class_latent`, in one batch.
+    # The other models generate each class with a separate `sample` call.
+    _batched_sampling = False
+
     def __init__(self, name, embedding_dim, discriminator, generator, pac, epochs, batch_size,
-                 disc_lr, gen_lr, disc_decay, gen_decay, sampling_strategy, random_state):
+                 disc_lr, gen_lr, disc_decay, gen_decay, sampling_strategy, random_state, quantize=None,
+                 metrics=None, metrics_every=100, amp=None, compile=False):
 
         super().__init__(name, random_state)
 
+        if quantize not in (None, 'int8', 'bf16'):
+            raise ValueError(f"Unsupported quantization mode {quantize}. Use None, 'int8' or 'bf16'.")
+        self._quantize = quantize
+        self._quantized_G = None
+        self._quantized_key = None
+
+        if amp not in (None, 'bf16'):
+            raise ValueError(f"Unsupported mixed precision mode {amp}. Use None or 'bf16'.")
+        self._amp = amp
+
+        # The torch.compile'd versions of the training functions (`compile=True`), and the time spent compiling them.
+        self._compile = compile
+        self._compiled = {}
+        self.compile_time_ = 0.0
+
         self.embedding_dim_ = embedding_dim
         self.batch_norm_ = True
         self.pac_ = pac
@@ -62,6 +101,197 @@ class GANSynthesizer(BaseSynthesizer):
         self.C_ = None
         self.C_optimizer_ = None
 
+        # The rank of this process and the number of processes in data-parallel training (see `gan_distributed`).
+        self._rank = 0
+        self._world_size = 1
+
+        self._metrics_callbacks = make_callbacks(metrics)
+        self._metrics_every = metrics_every
+
+    def _local_batch_size(self):
+        """The number of samples per training batch of each rank. In data-parallel training, the batch is divided
+        among the ranks (in multiples of `pac`), so that the averaged gradients correspond to a full batch."""
+        if self._world_size == 1:
+            return self._batch_size
+
+        batch_size = (self._batch_size // self._world_size) // self.pac_ * self.pac_
+        if batch_size == 0:
+            raise ValueError(f"batch_size={self._batch_size} is too small for {self._world_size} processes "
+                             f"with pac={self.pac_}.")
+        return batch_size
+
+    def _forward(self, module, x):
+        """Apply the Generator or the Discriminator `module` to `x` during training. With `amp='bf16'` the forward
+        pass runs under bfloat16 autocast and its output is returned in float32."""
+        if self._amp is None:
+            return self._call(module, x)
+
+        with torch.autocast(device_type=self._device.type, dtype=torch.bfloat16):
+            return self._call(module, x).float()
+
+    def _compile_training(self, *functions):
+        """Compile the training `functions` (modules or methods) with `torch.compile` if `compile=True`. The compiled
+        versions are used by `_call` until `_release_compiled` is called."""
+        self._compiled = {}
+        self.compile_time_ = 0.0
+        if not self._compile:
+            return
+
+        with span('gan.compile'):
+            start = time.perf_counter()
+            try:
+                for function in functions:
+                    self._compiled[function] = (torch.compile(function, dynamic=False), set())
+            except (AttributeError, RuntimeError) as e:
+                warnings.warn(f"torch.compile is not available ({e}); training in eager mode.")
+                self._compiled = {}
+            self.compile_time_ += time.perf_counter() - start
+
+    def _release_compiled(self):
+        """Drop the compiled training functions; sampling and export use the eager modules."""
+        self._compiled = {}
+
+    def _call(self, function, *args):
+        """Call the compiled version of `function`, if there is one. torch.compile traces and generates code on the
+        first call for each shape of the inputs (and whenever their `requires_grad` flags change). The backward graph
+        is compiled on the first backward pass, so these calls also run a backward pass that is discarded; their time
+        is added to `compile_time_`. If compilation fails, `function` runs in eager mode from then on."""
+        entry = self._compiled.get(function)
+        if entry is None:
+            return function(*args)
+
+        compiled, shapes = entry
+        key = tuple(None if a is None else (tuple(a.shape), a.requires_grad) for a in args)
+        if key in shapes:
+            return compiled(*args)
+
+        with span('gan.compile'):
+            start = time.perf_counter()
+            try:
+                output = compiled(*args)
+                if output.requires_grad:
+                    inputs = [a for a in args if a is not None and a.requires_grad]
+                    if isinstance(function, torch.nn.Module):
+                        inputs += [p for p in function.parameters() if p.requires_grad]
+                    torch.autograd.grad(output.sum(), inputs, retain_graph=True, allow_unused=True)
+            except Exception as e:
+                warnings.warn(f"torch.compile failed ({type(e).__name__}: {e}); training in eager mode.")
+                del self._compiled[function]
+                return function(*args)
+            finally:
+                self.compile_time_ += time.perf_counter() - start
+
+        shapes.add(key)
+        return output
+
+    def _training_metrics(self):
+        """A new `TrainingMetrics` buffer for a training run. In data-parallel training, only the first rank reports
+        metrics."""
+        return TrainingMetrics(self._metrics_callbacks if self._rank == 0 else [], self._metrics_every, self._device)
+
+    def _loader_generator(self):
+        """A CPU torch `Generator` for the shuffling of a `DataLoader`, seeded from the generators of the model."""
+        return torch.Generator().manual_seed(int(self._rng.integers(2 ** 63)))
+
+    def _sync_gradients(self, module):
+        """Average the gradients of `module` across the ranks of data-parallel training (no-op otherwise)."""
+        if self._world_size == 1:
+            return
+
+        grads = [p.grad for p in module.parameters() if p.grad is not None]
+        flat = torch.cat([g.reshape(-1) for g in grads])
+        torch.distributed.all_reduce(flat)
+        flat /= self._world_size
+
+        st = 0
+        for g in grads:
+            g.copy_(flat[st:st + g.numel()].view_as(g))
+            st += g.numel()
+
+    @contextmanager
+    def generation_mode(self):
+        """Context manager for sampling from the trained networks.
+
+        Inside the context, autograd is disabled with `torch.inference_mode()` (no computational graph is recorded, so
+        the outputs need no `detach()`), and the networks are switched to evaluation mode, so that BatchNorm uses its
+        running statistics and Dropout is deactivated. If `quantize` was set, `self.G_` is temporarily replaced by
+        its reduced-precision version. The Generator and the training mode of each network are restored on exit.
+        """
+        modules = [m for m in (self.G_, self.D_, self.C_) if m is not None]
+        training = [m.training for m in modules]
+        for m in modules:
+            m.eval()
+
+        generator = self.G_
+        try:
+            if generator is not None and self._quantize is not None:
+                self.G_ = self._sampling_generator()
+
+            with torch.inference_mode():
+                yield
+        finally:
+            self.G_ = generator
+            for m, mode in zip(modules, training):
+                m.train(mode)
+
+    def _sampling_generator(self):
+        """Return the reduced-precision version of `self.G_`. The quantized copy is cached, and it is rebuilt only if
+        the Generator has been replaced or its weights have been updated since the copy was made."""
+        key = (id(self.G_), self._quantize, sum(p._version for p in self.G_.parameters()))
+        if self._quantized_key != key:
+            self._quantized_G = quantize_generator(self.G_, self._quantize, self._device.type)
+            self._quantized_key = key
+
+        return self._quantized_G
+
+    def quantization_drift(self, num_samples=2000, y=None, categorical_columns=(), quantize=None, seed=0):
+        """Measure the fidelity drift of reduced-precision sampling against float32 sampling.
+
+        Two datasets are generated from the same random state: one in float32 and one with the `quantize` mode. They
+        are compared with the measures of `eval_fidelity`: the mean absolute difference of their Pearson correlation
+        matrices and their mean Gower distance. The mean Gower distance of the float32 dataset to itself is reported
+        as a reference; the drift is the difference between the two Gower values.
+
+        Args:
+            num_samples (int): The number of samples to generate.
+            y: A condition on the class of the generated samples (passed to `sample`).
+            categorical_columns: The categorical columns of the generated data (for the Gower distance).
+            quantize: The reduced precision mode to evaluate. If `None`, the mode set in the constructor is used.
+            seed (int): The seed of the random generators that is shared by both datasets.
+
+        Returns:
+            A dictionary with the keys 'CorrelationDiff', 'MeanGower' and 'MeanGowerFP32'.
+        """
+        import gower
+
+        quantize = quantize or self._quantize
+        if quantize is None:
+            raise ValueError("Specify the quantization mode ('int8' or 'bf16') to evaluate.")
+
+        states = self._rng.bit_generator.state, self._torch_rng.get_state()
+        original_mode = self._quantize
+        samples = {}
+        try:
+            for mode in (None, quantize):
+                self._quantize = mode
+                self._seed_random_generators(seed)
+                samples[mode] = pd.DataFrame(self.sample(num_samples, y))
+        finally:
+            self._quantize = original_mode
+            self._rng.bit_generator.state = states[0]
+            self._torch_rng.set_state(states[1])
+
+        real, synthetic = samples[None], samples[quantize]
+        corr_distance = np.mean(np.abs(real.corr(method="pearson") - synthetic.corr(method="pearson")))
+
+        cat_cols = real.columns[list(categorical_columns)]
+        real[cat_cols] = real[cat_cols].astype(str)
+        synthetic[cat_cols] = synthetic[cat_cols].astype(str)
+
+        return {'CorrelationDiff': float(corr_distance),
+                'MeanGower': float(gower.gower_matrix(real, synthetic).mean()),
+                'MeanGowerFP32': float(gower.gower_matrix(real, real).mean())}
+
     def display_models(self):
         """Display the Generator and Discriminator objects."""
         self.D_.display()
@@ -74,40 +304,7 @@ class GANSynthesizer(BaseSynthesizer):
                 ]
         print(info)
 
-    @staticmethod
-    def plot_losses(losses, store_losses):
-        """
-        Plot the Discriminator loss and the Generator loss values vs. the training epoch.
-        Args:
-            losses: A list of tuples (iteration, epoch, Discriminator loss, Generator loss) recorded during training.
-            store_losses: The file path to store the plot.
-        """
-        custom_params = {'axes.facecolor': '#f0f0f0', 'axes.edgecolor': 'black', 'grid.color': '#ffffff',
-                         'legend.labelspacing': 0.5, 'legend.fontsize': 15.0,
-                         'axes.spines.right': False, 'axes.spines.top': False}
-        sns.set_theme(rc=custom_params, font_scale=1.6)
-        colors = ['#0072b0', '#ffa868']
-
-        columns = ['Iteration', 'Epoch', 'Critic Loss it', 'Generator Loss it']
-        df = pd.DataFrame(losses, columns=columns)
-        df.to_csv(store_losses + 'ctdGAN_losses.csv', sep=';', decimal='.', index=False)
-
-        df_mean = pd.DataFrame()
-        df_mean['Critic Loss'] = df.groupby('Epoch')['Critic Loss it'].mean()
-        df_mean['Generator Loss'] = df.groupby('Epoch')['Generator Loss it'].mean()
-        df_mean['Epoch'] = df_mean.index + 1
-        df_mean.to_csv(store_losses + 'ctdGAN_mean_losses.csv', sep=';', decimal='.', index=False)
-
-        # plot = df.plot(x="Iteration", y=["Discriminator Loss", "Generator Loss"], ylim=(0, 1))
-        plot = df_mean.plot(x='Epoch', y=['Critic Loss', 'Generator Loss'], kind='line', color=colors,
-                            xlabel='Epoch', ylabel='Loss', title="Dry Bean")
-
-        fig = plot.get_figure()
-        # fig.savefig(store_losses + 'GAN_losses.png')
-        fig.savefig(store_losses + 'GAN_losses.pdf', format='pdf', bbox_inches='tight')
-
-        plt.show()
-
+    @instrumented('gan.prepare')
     def prepare(self, x_train, y_train):
         """
         Data preparation function. Several auxiliary structures are built here (e.g. samples-per-class tensors, etc.) .
@@ -142,27 +339,151 @@ class GANSynthesizer(BaseSynthesizer):
         dataset_rows = training_data.shape[0]
         if dataset_rows % self.pac_ != 0:
             required_samples = self.pac_ * (dataset_rows // self.pac_ + 1) - dataset_rows
-            random_samples = training_data[np.random.randint(0, dataset_rows, (required_samples,))]
+            random_samples = training_data[self._rng.integers(0, dataset_rows, (required_samples,))]
             training_data = np.vstack((training_data, random_samples))
 
         return training_data
 
     def synthesize_dataset(self):
-        i = 0
-        x_synthetic, y_synthetic = None, None
-        for cls in range(self._n_classes):
-            # print("Sampling class", cls, "Create", self._gen_samples_ratio[cls], "samples")
-            samples_to_generate = self._gen_samples_ratio[cls]
-
-            generated_samples = self.sample(samples_to_generate, cls)
-            generated_classes = np.full(samples_to_generate, cls)
-
-            if i == 0:
-                x_synthetic = generated_samples
-                y_synthetic = generated_classes
-            else:
-                x_synthetic = np.vstack((x_synthetic, generated_samples))
-                y_synthetic = np.hstack((y_synthetic, generated_classes))
-            i += 1
-
-        return x_synthetic, y_synthetic
+        """Generate a synthetic dataset with the class distribution of the training data."""
+        return self.sample_by_class({cls: self._gen_samples_ratio[cls] for cls in range(self._n_classes)})
+
+    def _class_latent(self, y):
+        """Build the conditional latent vectors of the Generator for the class labels `y` (a 1D NumPy array), as one
+        tensor on the device: random normal vectors concatenated with the one-hot-encoded classes. The models with
+        other conditional inputs (e.g. ctGAN) override it."""
+        latent_x = torch.randn((y.shape[0], self.embedding_dim_), generator=self._torch_rng, device=self._device)
+        latent_y = torch.nn.functional.one_hot(torch.as_tensor(y, dtype=torch.int64), num_classes=self._n_classes)
+        return torch.cat((latent_x, latent_y.to(self._device)), dim=1)
+
+    def _apply_activate(self, data):
+        """The activation of the Generator output before the inverse transformation (none by default)."""
+        return data
+
+    def _inverse_generated(self, data):
+        """Map the (activated) Generator outputs `data` to the original feature space."""
+        return self._transformer.inverse_transform(data)
+
+    def _generate(self, latent, chunk_size):
+        """Pass the latent vectors through the Generator in chunks of `chunk_size` rows and write the activated
+        outputs into one preallocated NumPy array. It must be called inside `generation_mode`."""
+        generated = None
+        for start in range(0, latent.shape[0], chunk_size):
+            chunk = self._apply_activate(self.G_(latent[start:start + chunk_size])).cpu().numpy()
+            if generated is None:
+                generated = np.empty((latent.shape[0], chunk.shape[1]), dtype=chunk.dtype)
+            generated[start:start + chunk.shape[0]] = chunk
+        return generated
+
+    @instrumented('gan.sampling')
+    def sample_by_class(self, counts, chunk_size=10000):
+        """Generate samples of several classes in one pass.
+
+        The conditional latent vectors of all the requested samples are built as one batch, ordered by class (in the
+        order of `counts`), and they are passed to the Generator in chunks of `chunk_size` rows. The outputs are
+        written into one preallocated array, and the inverse transformation is applied once, to all of them.
+
+        Args:
+            counts (dict): The number of samples to generate from each class: `{class: number of samples}`.
+            chunk_size (int): The number of latent vectors per Generator pass.
+
+        Returns:
+            The generated samples and their classes, ordered by class.
+        """
+        counts = {cls: int(n) for cls, n in counts.items() if n > 0}
+        y = np.repeat(np.asarray(list(counts)), list(counts.values()))
+        if y.shape[0] == 0:
+            return np.empty((0, self._input_dim)), y
+
+        if not self._batched_sampling:
+            samples = [self.sample(n, cls) for cls, n in counts.items()]
+            return np.vstack(samples), np.repeat(np.asarray(list(counts)), [x.shape[0] for x in samples])
+
+        with self.generation_mode():
+            generated = self._generate(self._class_latent(y), chunk_size)
+
+        count('rows', y.shape[0])
+        return self._inverse_generated(generated), y
+
+    def _resample(self, x_train, y_train, plan, keep_real=True):
+        """Generate the samples of a sampling plan `{class: number of samples}` with `sample_by_class` and append
+        them to the training data (if `keep_real`)."""
+        x_synthetic, y_synthetic = self.sample_by_class(plan)
+        if not keep_real:
+            return x_synthetic, y_synthetic
+
+        return np.vstack((x_train, x_synthetic)), np.hstack((y_train, y_synthetic))
+
+    def sample_iter(self, n, y=None, chunk_size=10000):
+        """Generate `n` artificial samples in chunks of `chunk_size` rows, so that the memory footprint is bounded by
+        the chunk size instead of `n`. The chunks can be written straight to disk with
+        `generators.sample_stream.write_chunks`.
+
+        Args:
+            n (int): The total number of samples to generate.
+            y: A condition on the class of the generated samples (passed to `sample`), or a (class, cluster) pair
+                for the models that condition on clusters (ctdGAN).
+            chunk_size (int): The number of samples in each yielded chunk.
+
+        Yields:
+            2D NumPy arrays with `chunk_size` rows (the last chunk may be smaller).
+        """
+        return iter_chunks(lambda num_samples: self.sample(num_samples, y), n, chunk_size)
+
+    def _sampling_plan(self, y_train):
+        """Determine the number of samples to generate from each class according to `self._sampling_strategy`.
+
+        Returns:
+            A dictionary {class: number of samples} and a flag indicating whether the real data are kept in the
+            resampled dataset.
+        """
+        classes, counts = np.unique(y_train, return_counts=True)
+
+        if self._sampling_strategy == 'auto':
+            num_majority_samples = counts.max()
+            return {cls: int(num_majority_samples - c) for cls, c in zip(classes, counts)
+                    if c < num_majority_samples}, True
+
+        elif isinstance(self._sampling_strategy, dict):
+            # In imblearn sampling strategy stores the class distribution of the output dataset. So we have to
+            # create the half number of samples, and we divide by 2.
+            return {cls: int(self._sampling_strategy[cls] / 2) for cls in self._sampling_strategy}, True
+
+        elif self._sampling_strategy == 'create-new':
+            return {cls: int(c) for cls, c in zip(classes, counts)}, False
+
+        raise ValueError("Unsupported sampling strategy: " + str(self._sampling_strategy))
+
+    def fit_resample_lazy(self, x_train, y_train, chunk_size=10000):
+        """A memory-friendly variant of `fit_resample`. The model is trained with `fit` and the synthetic samples
+        are generated chunk-by-chunk with `sample_iter`. The real data are not copied: the method returns lazily
+        concatenated views over the real data and the generated chunks (`sample_stream.ConcatenatedArray`).
+
+        The sampling strategies of the model's `_sampling_plan` are supported. The targets of a plan are classes, or
+        (class, cluster) pairs (ctdGAN's 'balance-clusters'), whose samples are labelled with their class.
+
+        Args:
+            x_train: The training data instances.
+            y_train: The classes of the training data instances.
+            chunk_size (int): The number of samples generated per `sample` call.
+
+        Returns:
+            x_resampled: A view of the training data instances + the generated data instances.
+            y_resampled: A view of the classes of the training data instances + the classes of the generated data.
+        """
+        self.fit(x_train, y_train)
+
+        plan, keep_real = self._sampling_plan(y_train)
+
+        x_blocks, y_blocks = [], []
+        if keep_real:
+            x_blocks.append(x_train)
+            y_blocks.append(y_train)
+
+        for target, samples_to_generate in plan.items():
+            cls = target[0] if isinstance(target, tuple) else target
+            for chunk in self.sample_iter(samples_to_generate, target, chunk_size=chunk_size):
+                x_blocks.append(chunk)
+                y_blocks.append(np.full(chunk.shape[0], cls))
+
+        return ConcatenatedArray(x_blocks), ConcatenatedArray(y_blocks)
@@ -13,6 +13,8 @@ from imblearn.over_sampling import SMOTE
 
 from tqdm import tqdm
 
+from artsyn.generators.sample_stream import iter_chunks
+
 
 class CentroidSampler:
     """
@@ -36,10 +38,7 @@ class CentroidSampler:
         self._random_state = random_state
 
     def fit_resample(self, x_in, y_in):
-        np.random.seed(self._random_state)
-
-        x_out = x_in.copy()
-        y_out = y_in.copy()
+        rng = np.random.default_rng(self._random_state)
 
         self._n_samples = x_in.shape[0]
         self._input_dim = x_in.shape[1]
@@ -51,73 +50,46 @@ class CentroidSampler:
         max_samples = np.max(samples_per_class)
         # print("Samples per Class:", samples_per_class, samples_per_class.shape)
 
+        x_out = [x_in]
+        y_out = [np.asarray(y_in)]
+
         # For each class:
         for cls in range(self._n_classes):
+            idx = np.flatnonzero(y_res[:, 0] == cls)
 
             # Class balancing mode - this does not touch the majority class:
             if self._sampling_strategy == 'auto':
 
                 # If this is a minority class and has more than 1 data instances:
-                if max_samples > samples_per_class[cls] > 1:
-                    idx = [p for p in range(y_res.shape[0]) if y_res[p] == cls]
-                    x_class = x_in[idx, :]
-                    num_min_samples = x_class.shape[0]
-
-                    samples_to_create = max_samples - num_min_samples
-                    centroid = np.mean(x_class, axis=0)
-
-                    # print("Minority samples of class", cls, ":\n", X_class)
-                    # print("Number of samples to create:", samples_to_create)
-                    # print("\tCluster", cls, " Centroid: ", centroid)
-
-                    # Keep creating samples until the desired number (=generated_samples) is reached:
-                    generated_samples = 0
-                    m = 0
-                    while generated_samples < samples_to_create:
-
-                        scale = np.random.uniform(0, 1)
-                        x_new = x_class[m] + scale * (x_class[m] - centroid)
-                        # print(X_new)
-
-                        x_out = np.vstack((x_out, x_new.reshape(1, -1)))
-                        y_out = np.hstack((y_out, cls))
-
-                        generated_samples += 1
-                        m += 1
-                        if m >= num_min_samples:
-                            m = 0
+                if not max_samples > samples_per_class[cls] > 1:
+                    continue
+                samples_to_create = max_samples - len(idx)
 
             # Dictionary mode: self._sampling_strategy explicitly declares the number of samples to be created per class
             elif isinstance(self._sampling_strategy, dict):
-                idx = [p for p in range(y_res.shape[0]) if y_res[p] == cls]
-                x_class = x_in[idx, :]
-                num_min_samples = x_class.shape[0]
-
                 samples_to_create = len(idx)
-                centroid = np.mean(x_class, axis=0)
 
-                # print("Minority samples of class", cls, ":\n", X_class)
-                # print("Number of samples to create:", samples_to_create)
-                # print("\tCluster", cls, " Centroid: ", centroid)
+            else:
+                continue
 
-                # Keep creating samples until the desired number (=generated_samples) is reached:
-                generated_samples = 0
-                m = 0
-                while generated_samples < samples_to_create:
+            if samples_to_create <= 0:
+                continue
 
-                    scale = np.random.uniform(0, 1)
-                    x_new = x_class[m] + scale * (x_class[m] - centroid)
-                    # print(X_new)
+            x_class = x_in[idx, :]
+            centroid = np.mean(x_class, axis=0)
 
-                    x_out = np.vstack((x_out, x_new.reshape(1, -1)))
-                    y_out = np.hstack((y_out, cls))
+            # print("Minority samples of class", cls, ":\n", X_class)
+            # print("Number of samples to create:", samples_to_create)
+            # print("\tCluster", cls, " Centroid: ", centroid)
 
-                    generated_samples += 1
-                    m += 1
-                    if m >= num_min_samples:
-                        m = 0
+            # Create the samples at once: the reference points are visited cyclically, and each new sample lies at a
+            # random point over the line that connects its reference point and the centroid.
+            m = np.arange(samples_to_create) % x_class.shape[0]
+            scale = rng.uniform(0, 1, samples_to_create).reshape(-1, 1)
+            x_out.append(x_class[m] + scale * (x_class[m] - centroid))
+            y_out.append(np.full(samples_to_create, cls, dtype=y_out[0].dtype))
 
-        return x_out, y_out
+        return np.concatenate(x_out, axis=0), np.concatenate(y_out)
 
 
 class CBR:
@@ -157,6 +129,7 @@ class CBR:
         self.gcd = None  # Global Class Distribution
         self._majority_class = None
         self._random_state = random_state
+        self._rng = np.random.default_rng(random_state)
 
         self._n_samples = 0
         self._n_clusters = 0
@@ -165,6 +138,12 @@ class CBR:
         self._k_neighbors = k_neighbors
         self._min_distance_factor = min_distance_factor
 
+        # Reference points of the over-sampled clusters, their in-cluster class centroids and their classes. They are
+        # recorded by `fit_resample` and used by `sample_iter`.
+        self._ref_x = None
+        self._ref_c = None
+        self._ref_y = None
+
     def display_info(self):
         print("Num samples:", self._n_samples)
         print("Dimensions:", self._input_dim)
@@ -228,11 +207,13 @@ class CBR:
             * The classes of the training data instances + the classes of the generated data instances.
         """
 
+        self._rng = np.random.default_rng(self._random_state)
         self._fit(x_in, y_in)
         cluster_labels = self._perform_clustering(x_in)
 
         x_ret = []
         y_ret = []
+        ref_x, ref_c, ref_y = [], [], []
         for cluster in tqdm(range(-1, self._n_clusters), desc="CBR Sampling        "):
             x_cluster_all = x_in[cluster_labels == cluster, :]
             y_cluster_all = y_in[cluster_labels == cluster]
@@ -286,6 +267,11 @@ class CBR:
             # reference points for data generation.
             if included_classes > 1:
                 # print("Balancing cluster", cluster)
+                x_inc, y_inc = np.array(x_cluster_inc), np.array(y_cluster_inc)
+                for cls in np.unique(y_inc):
+                    ref_x.append(x_inc[y_inc == cls])
+                    ref_c.append(np.broadcast_to(ref_x[-1].mean(axis=0), ref_x[-1].shape))
+                    ref_y.append(y_inc[y_inc == cls])
 
                 if self._cluster_resampler == 'cs':
                     resampler = CentroidSampler(sampling_strategy=self._sampling_strategy,
@@ -305,4 +291,40 @@ class CBR:
                 print("===== NEW DATASET:", np.array(x_ret).shape)
                 print(np.array(x_ret))
 
+        if len(ref_y) > 0:
+            self._ref_x, self._ref_c, self._ref_y = np.vstack(ref_x), np.vstack(ref_c), np.concatenate(ref_y)
+
         return np.array(x_ret), np.array(y_ret)
+
+    def sample_iter(self, n, y=None, chunk_size=10000):
+        """Generate `n` artificial samples in chunks of `chunk_size` rows, after `fit_resample` has been called.
+
+        The samples are created with centroid sampling over the reference points of the clusters that were
+        over-sampled by `fit_resample`: the reference points of the requested class are visited cyclically, and each new
+        sample lies at a random point over the line that connects the reference point and its in-cluster class centroid.
+
+        Args:
+            n (int): The total number of samples to generate.
+            y (int): The class of the generated samples. If `None`, the reference points of all classes are used.
+            chunk_size (int): The number of samples in each yielded chunk.
+
+        Yields:
+            2D NumPy arrays with `chunk_size` rows (the last chunk may be smaller).
+        """
+        if self._ref_y is None:
+            raise ValueError("CBR has no reference points: call fit_resample first, or no cluster was over-sampled.")
+
+        rows = np.arange(self._ref_y.shape[0]) if y is None else np.flatnonzero(self._ref_y == y)
+        if rows.shape[0] == 0:
+            raise ValueError("No over-sampled cluster contains samples of class " + str(y))
+
+        cursor = [0]
+
+        def sample(num_samples):
+            pick = rows[(cursor[0] + np.arange(num_samples)) % rows.shape[0]]
+            cursor[0] = (cursor[0] + num_samples) % rows.shape[0]
+
+            scale = self._rng.uniform(0, 1, num_samples).reshape(-1, 1)
+            return self._ref_x[pick] + scale * (self._ref_x[pick] - self._ref_c[pick])
+
+        return iter_chunks(sample, n, chunk_size)
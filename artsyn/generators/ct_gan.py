@@ -9,26 +9,33 @@ import warnings
 import numpy as np
 import pandas as pd
 import torch
-import torch.nn as nn
 
 from tqdm import tqdm
 
 from sklearn.preprocessing import OneHotEncoder
 
-from DeepCoreML.TabularTransformer import TabularTransformer
-from DeepCoreML.generators.gan_discriminators import Critic
-from DeepCoreML.generators.gan_generators import ctGenerator
-from DeepCoreML.generators.GAN_Synthesizer import GANSynthesizer
+from artsyn.TabularTransformer import TabularTransformer
+from artsyn.generators.gan_discriminators import Critic
+from artsyn.generators.gan_generators import ctGenerator
+from artsyn.generators.output_spans import OutputSpans
+from artsyn.generators.training_batches import TrainingBatches, training_tensor
+from artsyn.generators.GAN_Synthesizer import GANSynthesizer
+from artsyn.generators.gan_distributed import run_data_parallel
+from artsyn.generators.gan_export import transformer_columns, spans_of, save_exported_model
+from artsyn.instrumentation import count, instrumented
+from artsyn.Tools import seeded_training, init_weights
 
-import DeepCoreML.paths as paths
 
 
 class DataSampler(object):
     """DataSampler samples the conditional vector and corresponding data for CTGAN."""
 
-    def __init__(self, data, output_info, log_frequency):
+    def __init__(self, data, output_info, log_frequency, rng=None):
         self._data = data
 
+        # The NumPy random Generator of the conditional vectors and the data samples (normally, the one of the model)
+        self._rng = np.random.default_rng() if rng is None else rng
+
         def is_discrete_column(column_info):
             return len(column_info) == 1 and column_info[0].activation_fn == 'softmax'
 
@@ -87,7 +94,7 @@ class DataSampler(object):
 
     def _random_choice_prob_index(self, discrete_column_id):
         probs = self._discrete_column_category_prob[discrete_column_id]
-        r = np.expand_dims(np.random.rand(probs.shape[0]), axis=1)
+        r = np.expand_dims(self._rng.random(probs.shape[0]), axis=1)
         return (probs.cumsum(axis=1) > r).argmax(axis=1)
 
     def sample_condvec(self, batch_size):
@@ -102,7 +109,7 @@ class DataSampler(object):
         if self._n_discrete_columns == 0:
             return None
 
-        discrete_column_id = np.random.choice(np.arange(self._n_discrete_columns), batch_size)
+        discrete_column_id = self._rng.choice(np.arange(self._n_discrete_columns), batch_size)
         # print("self._n_discrete_columns = ", self._n_discrete_columns, "discrete_column_id = ", discrete_column_id)
 
         cond = np.zeros((batch_size, self._n_categories), dtype='float32')
@@ -124,8 +131,8 @@ class DataSampler(object):
         cond = np.zeros((batch, self._n_categories), dtype='float32')
 
         for i in range(batch):
-            row_idx = np.random.randint(0, len(self._data))
-            col_idx = np.random.randint(0, self._n_discrete_columns)
+            row_idx = self._rng.integers(0, len(self._data))
+            col_idx = self._rng.integers(0, self._n_discrete_columns)
             matrix_st = self._discrete_column_matrix_st[col_idx]
             matrix_ed = matrix_st + self._discrete_column_n_category[col_idx]
             pick = np.argmax(self._data[row_idx, matrix_st:matrix_ed])
@@ -140,12 +147,12 @@ class DataSampler(object):
             n rows of matrix data.
         """
         if col is None:
-            idx = np.random.randint(len(self._data), size=n)
+            idx = self._rng.integers(len(self._data), size=n)
             return self._data[idx]
 
         idx = []
         for c, o in zip(col, opt):
-            idx.append(np.random.choice(self._rid_by_cat_cols[c][o]))
+            idx.append(self._rng.choice(self._rid_by_cat_cols[c][o]))
 
         return self._data[idx]
 
@@ -192,94 +199,73 @@ class ctGAN(GANSynthesizer):
             Number of training epochs. Defaults to 300.
         pac (int):
             Number of samples to group together when applying the discriminator. Defaults to 10.
+        quantize (str):
+            Reduced precision for the Generator during sampling: 'int8' (dynamic quantization, CPU only) or 'bf16'
+            (bfloat16 autocast). Defaults to ``None`` (float32).
+        penalty (str):
+            The regularization of the Critic: ``'gp'`` (WGAN gradient penalty) or ``'r1'`` (R1 penalty on the real
+            samples). Defaults to ``'gp'``.
+        penalty_every (int):
+            Apply the penalty on one of every ``penalty_every`` Critic steps, with its weight scaled accordingly
+            (lazy regularization). Defaults to 1 (every step).
+        penalty_weight (float):
+            The weight of the penalty (lambda of ``'gp'``, gamma of ``'r1'``). Defaults to ``None``: ``pac`` for
+            ``'gp'``, as in the original implementation, and 10 for ``'r1'``.
+        world_size (int):
+            The number of processes for data-parallel training on the CPU cores of a single host (``torch.distributed``
+            with the gloo backend). Each process trains on ``batch_size / world_size`` samples per step and the
+            gradients are averaged, so the optimization is equivalent to single-process training. Defaults to 1.
+        metrics:
+            The receivers of the per-step training metrics ``loss_d``, ``loss_g`` and ``penalty``: the path of a
+            ``.jsonl`` or ``.parquet`` file, a ``training_metrics.MetricsCallback``, a function
+            ``hook(step, metrics)``, or a list of them. Defaults to ``None`` (no metrics).
+        metrics_every (int):
+            The number of Generator steps that are buffered on the device between two flushes of the metrics.
+            Defaults to 100.
+        amp (str):
+            Mixed precision training: ``'bf16'`` runs the forward passes of the Generator and the Critic under
+            bfloat16 autocast; the activations, the losses and the gradient penalty stay in float32. Defaults to
+            ``None`` (float32).
+        compile (bool):
+            Compile the Generator, the Critic and the output activations with ``torch.compile`` during training, with
+            a fallback to eager mode. The compilation time is stored in ``compile_time_``. Defaults to ``False``.
     """
+    _batched_sampling = True
+
     def __init__(self, embedding_dim=128, generator=(256, 256), discriminator=(256, 256), pac=10, epochs=300,
                  batch_size=32, lr=2e-4, decay=1e-6, sampling_strategy='auto', discriminator_steps=1,
-                 log_frequency=True, verbose=False, random_state=0):
+                 log_frequency=True, verbose=False, random_state=0, quantize=None, penalty='gp', penalty_every=1,
+                 world_size=1, metrics=None, metrics_every=100, amp=None, compile=False, penalty_weight=None):
 
         super().__init__("ctGAN", embedding_dim, discriminator, generator, pac, epochs, batch_size,
-                         lr, lr, decay, decay, sampling_strategy, random_state)
+                         lr, lr, decay, decay, sampling_strategy, random_state, quantize, metrics, metrics_every,
+                         amp, compile)
 
         assert batch_size % 2 == 0
 
+        if penalty not in ('gp', 'r1'):
+            raise ValueError(f"Unsupported penalty {penalty}. Use 'gp' or 'r1'.")
+
         self._discriminator_steps = discriminator_steps
+        self._penalty = penalty
+        self._penalty_every = penalty_every
+        self._penalty_weight = penalty_weight if penalty_weight is not None else self.pac_ if penalty == 'gp' else 10
+        self._train_world_size = world_size
         self._log_frequency = log_frequency
         self._verbose = verbose
 
         self._data_sampler = None
-
-    @staticmethod
-    def _gumbel_softmax(logits, tau=1.0, hard=False, eps=1e-10, dim=-1):
-        """Deals with the instability of the gumbel_softmax for older versions of torch.
-
-        For more details about the issue:
-        https://drive.google.com/file/d/1AA5wPfZ1kquaRtVruCd6BiYZGcDeNxyP/view?usp=sharing
-
-        Args:
-            logits (array(…, num_features)): Unnormalized log probabilities
-            tau: Non-negative scalar temperature/
-            hard (bool): If True, the returned samples will be discretized as one-hot vectors,
-                but will be differentiated as if it is the soft sample in autograd
-            dim (int): A dimension along which softmax will be computed. Default: -1.
-
-        Returns:
-            Sampled tensor of same shape as logits from the Gumbel-Softmax distribution.
-        """
-        for _ in range(10):
-            transformed = nn.functional.gumbel_softmax(logits, tau=tau, hard=hard, eps=eps, dim=dim)
-            if not torch.isnan(transformed).any():
-                return transformed
-
-        raise ValueError('gumbel_softmax returning NaN.')
+        self._spans = None
 
     def _apply_activate(self, data):
         """Apply proper activation function to the output of the generator."""
-        data_t = []
-        st = 0
-        for column_info in self._transformer.output_info_list:
-            for span_info in column_info:
-                if span_info.activation_fn == 'tanh':
-                    ed = st + span_info.dim
-                    data_t.append(torch.tanh(data[:, st:ed]))
-                    st = ed
-                elif span_info.activation_fn == 'softmax':
-                    ed = st + span_info.dim
-                    transformed = self._gumbel_softmax(data[:, st:ed], tau=0.2)
-                    data_t.append(transformed)
-                    st = ed
-                else:
-                    raise ValueError(f'Unexpected activation function {span_info.activation_fn}.')
-
-        return torch.cat(data_t, dim=1)
+        noise = self._spans.exponential_noise(data, generator=self._torch_rng)
+        return self._call(self._spans.activate_with_noise, data, noise)
 
     def _cond_loss(self, generated_data, c, m):
         """Compute the cross entropy loss on the fixed discrete column."""
-        discrete_loss = []
-        st = 0
-        st_c = 0
-        for column_info in self._transformer.output_info_list:
-            for span_info in column_info:
-                if len(column_info) != 1 or span_info.activation_fn != 'softmax':
-                    # not discrete column
-                    st += span_info.dim
-                else:
-                    ed = st + span_info.dim
-                    ed_c = st_c + span_info.dim
-                    #print("Start:", st, ", End: ", ed, ", Generated Data:", generated_data[:, st:ed])
-                    #print("Start_Col:", st_c, ", End_Col: ", ed_c, ", CondVec:", c[:, st_c:ed_c])
-                    tmp = nn.functional.cross_entropy(generated_data[:, st:ed], torch.argmax(c[:, st_c:ed_c], dim=1),
-                                                      reduction='none')
-                    # print("Temp=", tmp)
-                    # a = input('').split(" ")[0]
-                    # print("Original: ")
-                    discrete_loss.append(tmp)
-                    st = ed
-                    st_c = ed_c
-
-        loss = torch.stack(discrete_loss, dim=1)  # noqa: PD013
-        ret_loss = (loss * m).sum() / generated_data.size()[0]
-        #print(m.shape)
-        return ret_loss
+        loss = self._spans.cond_cross_entropy(generated_data, self._spans.cond_targets(c))
+        return (loss * m).sum() / generated_data.size()[0]
 
     def _validate_discrete_columns(self, train_data, discrete_columns):
         """Check whether ``discrete_columns`` exists in ``train_data``.
@@ -305,7 +291,9 @@ class ctGAN(GANSynthesizer):
         if invalid_columns:
             raise ValueError(f'Invalid columns found: {invalid_columns}')
 
-    def train(self, train_data, discrete_columns=(), epochs=None, store_losses=None):
+    @instrumented('gan.fit')
+    @seeded_training
+    def train(self, train_data, discrete_columns=(), epochs=None):
         """Fit the CTGAN Synthesizer models to the training data.
 
         Args:
@@ -316,7 +304,6 @@ class ctGAN(GANSynthesizer):
                 numpy array, this list should contain the integer indices of the columns. Otherwise, if it is
                 a ``pandas.DataFrame``, this list should contain the column names.
             epochs: deprecated
-            store_losses:
         """
         self._validate_discrete_columns(train_data, discrete_columns)
 
@@ -336,7 +323,9 @@ class ctGAN(GANSynthesizer):
         train_data = self._transformer.transform(train_data)
         # print(train_data.shape, "\n", train_data)
 
-        self._data_sampler = DataSampler(train_data, self._transformer.output_info_list, self._log_frequency)
+        self._data_sampler = DataSampler(train_data, self._transformer.output_info_list, self._log_frequency,
+                                         rng=self._rng)
+        self._spans = OutputSpans(self._transformer.output_info_list, self._device)
 
         data_dim = self._transformer.output_dimensions
         # CtGAN components: ctGenerator & Critic
@@ -344,85 +333,72 @@ class ctGAN(GANSynthesizer):
                               data_dim).to(self._device)
 
         self.D_ = Critic(data_dim + self._data_sampler.dim_cond_vec(), self.D_Arch_,
-                         pac=self.pac_).to(self._device)
+                         pac=self.pac_, generator=self._torch_rng).to(self._device)
+        init_weights(self.G_, self._torch_rng)
+        init_weights(self.D_, self._torch_rng)
 
         self.D_optimizer_ = torch.optim.Adam(self.D_.parameters(),
                                              lr=self._disc_lr, weight_decay=self._disc_decay, betas=(0.5, 0.9))
         self.G_optimizer_ = torch.optim.Adam(self.G_.parameters(),
                                              lr=self._gen_lr, weight_decay=self._gen_decay, betas=(0.5, 0.9))
 
-        mean = torch.zeros(self._batch_size, self.embedding_dim_, device=self._device)
-        std = mean + 1
+        # One float32 copy of the training data on the device, shared by the data-parallel ranks.
+        data = training_tensor(train_data, self._device, shared=self._train_world_size > 1)
 
         steps_per_epoch = max(len(train_data) // self._batch_size, 1)
+        if self._train_world_size > 1:
+            run_data_parallel(self, self._train_loop, (epochs, steps_per_epoch, data), self._train_world_size)
+        else:
+            self._train_loop(epochs, steps_per_epoch, data)
+
+    @instrumented('gan.training')
+    def _train_loop(self, epochs, steps_per_epoch, data):
+        """The adversarial training loop of the Generator and the Critic on the training data tensor `data`. In
+        data-parallel training, each rank runs this loop on its share of the batch."""
+        batch_size = self._local_batch_size()
+        metrics = self._training_metrics()
+        self._compile_training(self.G_, self.D_, self._spans.activate_with_noise)
+
+        batches = TrainingBatches(self._data_sampler, data, batch_size, self.embedding_dim_, self._device,
+                                  self._torch_rng)
+
         loss_d = loss_g = 0
-        c2 = 0
-        losses = []
-        for i in tqdm(range(epochs), desc="ctGAN Training      "):
+        d_step = 0
+        for i in tqdm(range(epochs), desc="ctGAN Training      ", disable=self._rank > 0):
             for id_ in range(steps_per_epoch):
 
                 for n in range(self._discriminator_steps):
-                    fakez = torch.normal(mean=mean, std=std)
-
-                    condvec = self._data_sampler.sample_condvec(self._batch_size)
-                    if condvec is None:
-                        c1, m1, col, opt = None, None, None, None
-                        real = self._data_sampler.sample_data(self._batch_size, col, opt)
-                    else:
-                        c1, m1, col, opt = condvec
-                        c1 = torch.from_numpy(c1).to(self._device)
-                        m1 = torch.from_numpy(m1).to(self._device)
-                        fakez = torch.cat([fakez, c1], dim=1)
-
-                        # print("c1=", c1, ", m1=", m1, ", col=", col, "opt=", opt)
-                        perm = np.arange(self._batch_size)
-                        np.random.shuffle(perm)
-                        real = self._data_sampler.sample_data(self._batch_size, col[perm], opt[perm])
-                        c2 = c1[perm]
-
-                    fake = self.G_(fakez)
-                    fakeact = self._apply_activate(fake)
-
-                    real = torch.from_numpy(real.astype('float32')).to(self._device)
+                    d_step += 1
+                    fakez, c1, _ = batches.sample_latent()
+                    real_cat = batches.sample_real()
 
-                    if c1 is not None:
-                        fake_cat = torch.cat([fakeact, c1], dim=1)
-                        real_cat = torch.cat([real, c2], dim=1)
-                    else:
-                        real_cat = real
-                        fake_cat = fakeact
+                    fake = self._forward(self.G_, fakez)
+                    fakeact = self._apply_activate(fake)
+                    fake_cat = fakeact if c1 is None else torch.cat([fakeact, c1], dim=1)
 
-                    y_fake = self.D_(fake_cat)
-                    y_real = self.D_(real_cat)
+                    y_fake = self._forward(self.D_, fake_cat)
+                    y_real = self._forward(self.D_, real_cat)
 
-                    pen = self.D_.calc_gradient_penalty(real_cat, fake_cat, self._device, self.pac_)
+                    pen = self.D_.calc_penalty(real_cat, fake_cat, d_step, self._device, self._penalty_weight,
+                                               self._penalty, self._penalty_every, self._torch_rng)
                     loss_d = -(torch.mean(y_real) - torch.mean(y_fake))
 
                     self.D_optimizer_.zero_grad(set_to_none=False)
-                    pen.backward(retain_graph=True)
-                    loss_d.backward()
+                    (loss_d if pen is None else loss_d + pen).backward()
+                    self._sync_gradients(self.D_)
                     self.D_optimizer_.step()
 
-                fakez = torch.normal(mean=mean, std=std)
-                condvec = self._data_sampler.sample_condvec(self._batch_size)
-
-                if condvec is None:
-                    c1, m1, col, opt = None, None, None, None
-                else:
-                    c1, m1, col, opt = condvec
-                    c1 = torch.from_numpy(c1).to(self._device)
-                    m1 = torch.from_numpy(m1).to(self._device)
-                    fakez = torch.cat([fakez, c1], dim=1)
+                fakez, c1, m1 = batches.sample_latent()
 
-                fake = self.G_(fakez)
+                fake = self._forward(self.G_, fakez)
                 fakeact = self._apply_activate(fake)
 
                 if c1 is not None:
-                    y_fake = self.D_(torch.cat([fakeact, c1], dim=1))
+                    y_fake = self._forward(self.D_, torch.cat([fakeact, c1], dim=1))
                 else:
-                    y_fake = self.D_(fakeact)
+                    y_fake = self._forward(self.D_, fakeact)
 
-                if condvec is None:
+                if c1 is None:
                     cross_entropy = 0
                 else:
                     cross_entropy = self._cond_loss(fake, c1, m1)
@@ -431,17 +407,18 @@ class ctGAN(GANSynthesizer):
 
                 self.G_optimizer_.zero_grad(set_to_none=False)
                 loss_g.backward()
+                self._sync_gradients(self.G_)
                 self.G_optimizer_.step()
 
-            if store_losses is not None:
-                losses.append((i, i + 1, loss_d.detach().cpu(), loss_g.detach().cpu()))
+                metrics.record(i * steps_per_epoch + id_ + 1, i + 1, loss_d=loss_d, loss_g=loss_g, penalty=pen)
 
-            if self._verbose:
+            if self._verbose and self._rank == 0:
                 print(f'Epoch {i+1}, Loss G: {loss_g.detach().cpu(): .4f},'
                       f'Loss D: {loss_d.detach().cpu(): .4f}', flush=True)
 
-        if store_losses is not None:
-            self.plot_losses(losses, store_losses)
+        metrics.close()
+        self._release_compiled()
+        count('steps', epochs * steps_per_epoch)
 
     def fit(self, x_train, y_train):
         """`fit` invokes the GAN training process. `fit` renders ctGAN compatible with `imblearn`'s interface,
@@ -464,6 +441,7 @@ class ctGAN(GANSynthesizer):
         # Train the ctGAN
         self.train(training_data, discrete_columns=(self._input_dim,))
 
+    @instrumented('gan.sampling')
     def sample_original(self, n, condition_column=None, condition_value=None):
         """Sample data similar to the training data.
 
@@ -487,40 +465,101 @@ class ctGAN(GANSynthesizer):
 
         steps = n // self._batch_size + 1
         data = []
-        for i in range(steps):
-            mean = torch.zeros(self._batch_size, self.embedding_dim_)
-            std = mean + 1
-            fakez = torch.normal(mean=mean, std=std).to(self._device)
-
-            if global_condition_vec is not None:
-                condvec = global_condition_vec.copy()
-            else:
-                condvec = self._data_sampler.sample_original_condvec(self._batch_size)
+        with self.generation_mode():
+            for i in range(steps):
+                mean = torch.zeros(self._batch_size, self.embedding_dim_, device=self._device)
+                std = mean + 1
+                fakez = torch.normal(mean=mean, std=std, generator=self._torch_rng)
+
+                if global_condition_vec is not None:
+                    condvec = global_condition_vec.copy()
+                else:
+                    condvec = self._data_sampler.sample_original_condvec(self._batch_size)
 
-            if condvec is None:
-                pass
-            else:
-                c1 = condvec
-                c1 = torch.from_numpy(c1).to(self._device)
-                fakez = torch.cat([fakez, c1], dim=1)
+                if condvec is None:
+                    pass
+                else:
+                    c1 = condvec
+                    c1 = torch.from_numpy(c1).to(self._device)
+                    fakez = torch.cat([fakez, c1], dim=1)
 
-            fake = self.G_(fakez)
-            # print("fake:\n", fake)
-            fakeact = self._apply_activate(fake)
-            # print("fakeact:\n", fakeact)
-            data.append(fakeact.detach().cpu().numpy())
+                fake = self.G_(fakez)
+                # print("fake:\n", fake)
+                fakeact = self._apply_activate(fake)
+                # print("fakeact:\n", fakeact)
+                data.append(fakeact.cpu().numpy())
 
         data = np.concatenate(data, axis=0)
         data = data[:n]
+        count('rows', n)
 
         return self._transformer.inverse_transform(data)
 
+    def _class_latent(self, y):
+        """The latent vectors of the Generator for the classes `y`: random normal vectors concatenated with the
+        conditional vectors that select each class in the class column."""
+        fakez = torch.randn((y.shape[0], self.embedding_dim_), generator=self._torch_rng, device=self._device)
+        if self._data_sampler.dim_cond_vec() == 0:
+            return fakez
+
+        # One conditional vector per distinct class, exactly as `sample_original` computes it, repeated per sample.
+        classes, inverse = np.unique(y, return_inverse=True)
+        class_column = str(self._input_dim)
+        condvec = np.concatenate([self._data_sampler.generate_cond_from_condition_column_info(
+            self._transformer.convert_column_name_value_to_id(class_column, cls), 1) for cls in classes])
+        return torch.cat([fakez, torch.from_numpy(condvec[inverse]).to(self._device)], dim=1)
+
+    def _inverse_generated(self, data):
+        """Map the activated Generator outputs to the original feature space, without the class column."""
+        return self._transformer.inverse_transform(data)[:, 0:self._input_dim]
+
     def sample(self, num_samples, y=None):
-        """Wrapper to the `sample_original` function. It provides a unified interface, similar to the `sample` methods
-        of the other GANs.
+        """Wrapper to the `sample_original` function (or to `sample_by_class`, if a class `y` is requested). It
+        provides a unified interface, similar to the `sample` methods of the other GANs.
         """
-        return self.sample_original(n=num_samples, condition_column=str(self._input_dim),
-                                    condition_value=y)[:, 0:self._input_dim]
+        if y is None:
+            return self.sample_original(n=num_samples)[:, 0:self._input_dim]
+
+        return self.sample_by_class({y: num_samples})[0]
+
+    def export(self, path):
+        """Export the trained model for production sampling with `artsyn.runtime`. The artifact contains the traced
+        Generator (with the activations of `_apply_activate`), the construction of the conditional vectors and the
+        parameters of the inverse data transformation.
+
+        Args:
+            path (str): The output directory.
+
+        Returns:
+            The path of the artifact directory.
+        """
+        arrays = {}
+        spec = {'embedding_dim': self.embedding_dim_, 'n_columns': self._input_dim,
+                'columns': transformer_columns(self._transformer, arrays),
+                'cond_dim': int(self._data_sampler.dim_cond_vec()), 'class_cond': [], 'cond_columns': []}
+
+        if spec['cond_dim'] > 0:
+            # Position of each class in the conditional vector, exactly as `sample_original` computes it.
+            class_column = str(self._input_dim)
+            for cti in self._transformer.get_column_transform_info_list():
+                if cti.column_name == class_column and cti.column_type == 'discrete':
+                    for value in cti.transform.dummies:
+                        info = self._transformer.convert_column_name_value_to_id(class_column, value)
+                        vec = self._data_sampler.generate_cond_from_condition_column_info(info, 1)
+                        value = value.item() if isinstance(value, np.generic) else value
+                        spec['class_cond'].append([value, int(np.argmax(vec[0]))])
+
+            # Category frequencies of each discrete column, as observed by `sample_original_condvec`.
+            ds = self._data_sampler
+            for c in range(ds._n_discrete_columns):
+                st = ds._discrete_column_matrix_st[c]
+                n_categories = ds._discrete_column_n_category[c]
+                picks = np.argmax(ds._data[:, st:st + n_categories], axis=1)
+                arrays['cond%d.probs' % c] = np.bincount(picks, minlength=n_categories) / len(picks)
+                spec['cond_columns'].append(int(ds._discrete_column_cond_st[c]))
+
+        return save_exported_model(path, 'ctGAN', self.G_, self.embedding_dim_ + spec['cond_dim'],
+                                   spans_of(self._transformer.output_info_list), spec, arrays)
 
     def fit_resample(self, x_train, y_train, categorical_columns=None):
         """`fit_resample` alleviates the problem of class imbalance in imbalanced datasets. The function renders ctGAN
@@ -548,13 +587,12 @@ class ctGAN(GANSynthesizer):
         self._input_dim = x_train.shape[1]
 
         # Train ctGAN
-        # self.train(training_data, discrete_columns=(self._input_dim,), store_losses=paths.output_path_loss)
         if categorical_columns is None:
             categorical_columns = [self._input_dim]
         else:
             categorical_columns.append(self._input_dim)
 
-        self.train(training_data, discrete_columns=categorical_columns, store_losses=None)
+        self.train(training_data, discrete_columns=categorical_columns)
 
         # One-hot-encode the class labels; Get the number of classes and the number of samples to generate per class.
         class_encoder = OneHotEncoder()
@@ -562,68 +600,14 @@ class ctGAN(GANSynthesizer):
         self._n_classes = y_encoded.shape[1]
         self._gen_samples_ratio = [int(sum(y_encoded[:, c])) for c in range(self._n_classes)]
 
-        x_resampled = np.copy(x_train)
-        y_resampled = np.copy(y_train)
-
-        # auto mode: Use ctGAN to equalize the number of samples per class. This is achieved by generating samples
-        # of the minority classes (i.e. we perform oversampling).
-        if self._sampling_strategy == 'auto':
-            majority_class = np.array(self._gen_samples_ratio).argmax()
-            num_majority_samples = np.max(np.array(self._gen_samples_ratio))
-
-            # Perform oversampling
-            for cls in range(self._n_classes):
-                if cls != majority_class:
-                    samples_to_generate = num_majority_samples - self._gen_samples_ratio[cls]
-
-                    # Generate the appropriate number of samples to equalize cls with the majority class.
-                    # print("\tSampling Class y:", cls, " Gen Samples ratio:", gen_samples_ratio[cls])
-                    generated_samples = self.sample_original(n=samples_to_generate,
-                                                             condition_column=str(self._input_dim),
-                                                             condition_value=cls)
-                    generated_classes = np.full(generated_samples.shape[0], cls)
-
-                    x_resampled = np.vstack((x_resampled, generated_samples[:, :generated_samples.shape[1]-1]))
-                    y_resampled = np.hstack((y_resampled, generated_classes))
-
-                    print("Created:", y_resampled.shape[0], " - Accepted:", np.sum(y_resampled))
-
-        # dictionary mode: the keys correspond to the targeted classes. The values correspond to the desired number of
-        # samples for each targeted class.
-        elif isinstance(self._sampling_strategy, dict):
-            for cls in self._sampling_strategy:
-                samples_to_generate = self._sampling_strategy[cls]
-
-                # Generate the appropriate number of samples to equalize cls with the majority class.
-                # print("\tSampling Class y:", cls, " Gen Samples ratio:", gen_samples_ratio[cls])
-                generated_samples = self.sample_original(n=samples_to_generate,
-                                                         condition_column=str(self._input_dim),
-                                                         condition_value=cls)[:, 0:self._input_dim]
-                generated_classes = np.full(samples_to_generate, cls)
-
-                x_resampled = np.vstack((x_resampled, generated_samples))
-                y_resampled = np.hstack((y_resampled, generated_classes))
-
-        elif self._sampling_strategy == 'create-new':
-            x_resampled = None
-            y_resampled = None
-
-            s = 0
-            for cls in tqdm(range(self._n_classes), desc="ctGAN Sampling      "):
-                # Generate as many samples, as the corresponding class cls
-                samples_to_generate = int(self._gen_samples_ratio[cls])
-                generated_samples = self.sample(num_samples=samples_to_generate, y=cls)
-
-                if generated_samples is not None and generated_samples.shape[0] > 0:
-                    # print("\t\tCreated", generated_samples.shape[0], "samples")
-                    generated_classes = np.full(generated_samples.shape[0], cls)
-
-                    if s == 0:
-                        x_resampled = generated_samples
-                        y_resampled = generated_classes
-                        s = 1
-                    else:
-                        x_resampled = np.vstack((x_resampled, generated_samples))
-                        y_resampled = np.hstack((y_resampled, generated_classes))
-
-        return x_resampled, y_resampled
+        # Generate the samples of all the classes of the sampling plan with batched Generator passes.
+        plan, keep_real = self._sampling_plan(y_train)
+        return self._resample(x_train, y_train, plan, keep_real)
+
+    def _sampling_plan(self, y_train):
+        """Determine the number of samples to generate from each class according to `self._sampling_strategy`. Unlike
+        the other GANs, in dictionary mode ctGAN generates exactly the requested number of samples per class."""
+        if isinstance(self._sampling_strategy, dict):
+            return {cls: int(n) for cls, n in self._sampling_strategy.items()}, True
+
+        return super()._sampling_plan(y_train)
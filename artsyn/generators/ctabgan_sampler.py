@@ -0,0 +1,166 @@
+import numpy as np
+
+
+def _cumulative_table(probs, spans):
+    """Build a row-offset cumulative probability table for vectorized inverse-CDF sampling.
+
+    Row `i` of `probs` holds the category probabilities of the i-th discrete column (zero-padded). The cumulative
+    sums are normalized so that each row ends exactly at 1 and then shifted by the row index. The flattened table is
+    therefore non-decreasing, and a single `searchsorted` call can sample one category per requested row.
+    """
+    cum = np.cumsum(probs, axis=1)
+    cum = np.minimum(cum / cum[:, -1:], 1.0)
+    cum[np.arange(cum.shape[1]) >= spans.reshape(-1, 1)] = 1.0
+    return (cum + np.arange(cum.shape[0]).reshape(-1, 1)).ravel()
+
+
+def sample_modes(probs):
+    """Draw one mode per row of `probs` by inverse-CDF sampling.
+
+    This is equivalent to calling `np.random.choice(n_modes, p=pp)` on each row, with `pp` the smoothed and normalized
+    probabilities of the row (it even consumes the same random stream), but all the rows are handled at once.
+    """
+    cdf = np.cumsum(probs + 1e-6, axis=1)
+    cdf /= cdf[:, -1:]
+    r = np.random.rand(probs.shape[0], 1)
+    return np.minimum((cdf <= r).sum(axis=1), probs.shape[1] - 1)
+
+
+class Cond(object):
+    """Conditional vector sampler of CTAB-GAN/FCT-GAN.
+
+    The per-column category distributions are stored as cumulative probability tables, so that the conditional
+    vectors of a full batch are drawn with one `searchsorted` call instead of a Python loop over the rows.
+    """
+    def __init__(self, data, output_info):
+        self.interval = []
+        self.n_col = 0
+        self.n_opt = 0
+
+        freqs = []
+        st = 0
+        for item in output_info:
+            if item[1] == 'tanh':
+                st += item[0]
+                continue
+
+            elif item[1] == 'softmax':
+                ed = st + item[0]
+                freqs.append(np.sum(data[:, st:ed], axis=0))
+                self.interval.append((self.n_opt, item[0]))
+                self.n_opt += item[0]
+                self.n_col += 1
+                st = ed
+
+        self.interval = np.asarray(self.interval, dtype=int).reshape(-1, 2)
+
+        # p: log-frequency probabilities (training), p_sampling: empirical frequencies (generation).
+        max_interval = int(self.interval[:, 1].max(initial=0))
+        self.p = np.zeros((self.n_col, max_interval))
+        self.p_sampling = np.zeros((self.n_col, max_interval))
+        for i, freq in enumerate(freqs):
+            log_freq = np.log(freq + 1)
+            self.p[i, :len(freq)] = log_freq / np.sum(log_freq)
+            self.p_sampling[i, :len(freq)] = freq / np.sum(freq)
+
+        self._max_interval = max_interval
+        if self.n_col > 0:
+            self._p_cum = _cumulative_table(self.p, self.interval[:, 1])
+            self._p_sampling_cum = _cumulative_table(self.p_sampling, self.interval[:, 1])
+
+    def _sample_options(self, cum_table, idx):
+        """Draw one category per row from the distributions of the discrete columns `idx`."""
+        r = np.random.rand(idx.shape[0])
+        opt = np.searchsorted(cum_table, idx + r, side='right') - idx * self._max_interval
+        return np.minimum(opt, self.interval[idx, 1] - 1)
+
+    def _build_vec(self, idx, opt):
+        batch = idx.shape[0]
+        vec = np.zeros((batch, self.n_opt), dtype='float32')
+        vec[np.arange(batch), self.interval[idx, 0] + opt] = 1
+        return vec
+
+    def sample_train(self, batch):
+        """Generate the conditional vectors for training (log-frequency category sampling).
+
+        Returns:
+            vec: The conditional vectors (batch x categories).
+            mask: A one-hot matrix indicating the selected discrete column (batch x discrete columns).
+            idx: The selected discrete column of each row.
+            opt1prime: The selected category in the selected discrete column of each row.
+        """
+        if self.n_col == 0:
+            return None
+
+        idx = np.random.choice(np.arange(self.n_col), batch)
+
+        mask = np.zeros((batch, self.n_col), dtype='float32')
+        mask[np.arange(batch), idx] = 1
+        opt1prime = self._sample_options(self._p_cum, idx)
+
+        return self._build_vec(idx, opt1prime), mask, idx, opt1prime
+
+    def sample(self, batch):
+        """Generate the conditional vectors for generation (original category frequencies)."""
+        if self.n_col == 0:
+            return None
+
+        idx = np.random.choice(np.arange(self.n_col), batch)
+        opt1prime = self._sample_options(self._p_sampling_cum, idx)
+
+        return self._build_vec(idx, opt1prime)
+
+    def generate_cond(self, col, opt, batch):
+        """Generate `batch` conditional vectors that all select the category `opt` of the discrete column `col`."""
+        vec = np.zeros((batch, self.n_opt), dtype='float32')
+        vec[:, self.interval[col, 0] + opt] = 1
+        return vec
+
+
+class Sampler(object):
+    """Real-data sampler of CTAB-GAN/FCT-GAN.
+
+    The row ids of every (discrete column, category) pair are stored in CSR form: `_rid` holds the row ids grouped by
+    global category id and `_rid_ptr` the start of each group. A batch of rows that satisfy the sampled conditions is
+    then gathered with a few array operations.
+    """
+    def __init__(self, data, output_info):
+        super(Sampler, self).__init__()
+        self.data = data
+        self.n = len(data)
+
+        offsets = []
+        rows, cats = [], []
+        n_opt = 0
+        st = 0
+        for item in output_info:
+            if item[1] == 'tanh':
+                st += item[0]
+                continue
+            elif item[1] == 'softmax':
+                ed = st + item[0]
+                r, j = np.nonzero(data[:, st:ed])
+                rows.append(r)
+                cats.append(j + n_opt)
+                offsets.append(n_opt)
+                n_opt += item[0]
+                st = ed
+
+        self._col_offsets = np.asarray(offsets, dtype=int)
+        if n_opt > 0:
+            rows = np.concatenate(rows)
+            cats = np.concatenate(cats)
+            order = np.argsort(cats, kind='stable')
+            self._rid = rows[order]
+            self._rid_ptr = np.concatenate(([0], np.cumsum(np.bincount(cats, minlength=n_opt))))
+
+    def sample(self, n, col, opt):
+        if col is None:
+            idx = np.random.choice(np.arange(self.n), n)
+            return self.data[idx]
+
+        cat = self._col_offsets[col] + opt
+        start = self._rid_ptr[cat]
+        count = self._rid_ptr[cat + 1] - start
+        pick = start + (np.random.rand(len(cat)) * count).astype(int)
+        return self.data[self._rid[pick]]
@@ -7,7 +7,9 @@ from torch.optim import Adam
 from torch.nn import functional as F
 from torch.nn import (Dropout, LeakyReLU, Linear, Module, ReLU, Sequential, Conv2d, ConvTranspose2d, Sigmoid, init,
                       BCELoss, CrossEntropyLoss, SmoothL1Loss, LayerNorm)
-from DeepCoreML.generators.ctabgan_transformer import ImageTransformer, DataTransformer
+from artsyn.generators.ctabgan_transformer import ImageTransformer, DataTransformer
+from artsyn.generators.ctabgan_sampler import Cond, Sampler
+from artsyn.generators.sample_stream import iter_chunks
 from tqdm import tqdm
 
 
@@ -81,102 +83,6 @@ def get_st_ed(target_col_index, output_info):
     return st, ed
 
 
-def random_choice_prob_index_sampling(probs, col_idx):
-    option_list = []
-    for i in col_idx:
-        pp = probs[i]
-        option_list.append(np.random.choice(np.arange(len(probs[i])), p=pp))
-
-    return np.array(option_list).reshape(col_idx.shape)
-
-
-def random_choice_prob_index(a, axis=1):
-    r = np.expand_dims(np.random.rand(a.shape[1 - axis]), axis=axis)
-    return (a.cumsum(axis=axis) > r).argmax(axis=axis)
-
-
-def maximum_interval(output_info):
-    max_interval = 0
-    for item in output_info:
-        max_interval = max(max_interval, item[0])
-    return max_interval
-
-
-class Cond(object):
-    def __init__(self, data, output_info):
-
-        self.model = []
-        st = 0
-        counter = 0
-        for item in output_info:
-            if item[1] == 'tanh':
-                st += item[0]
-                continue
-            elif item[1] == 'softmax':
-                ed = st + item[0]
-                counter += 1
-                self.model.append(np.argmax(data[:, st:ed], axis=-1))
-                st = ed
-
-        self.interval = []
-        self.n_col = 0  
-        self.n_opt = 0  
-        st = 0
-        self.p = np.zeros((counter, maximum_interval(output_info)))  
-        self.p_sampling = []
-        for item in output_info:
-            if item[1] == 'tanh':
-                st += item[0]
-                continue
-
-            elif item[1] == 'softmax':
-                ed = st + item[0]
-                tmp = np.sum(data[:, st:ed], axis=0)  
-                tmp_sampling = np.sum(data[:, st:ed], axis=0)     
-                tmp = np.log(tmp + 1)
-                tmp = tmp / np.sum(tmp) 
-                tmp_sampling = tmp_sampling / np.sum(tmp_sampling)
-                self.p_sampling.append(tmp_sampling)
-                self.p[self.n_col, :item[0]] = tmp
-                self.interval.append((self.n_opt, item[0]))
-                self.n_opt += item[0]
-                self.n_col += 1
-                st = ed
-
-        self.interval = np.asarray(self.interval)
-
-    def sample_train(self, batch):
-        if self.n_col == 0:
-            return None
-        batch = batch
-
-        idx = np.random.choice(np.arange(self.n_col), batch)
-
-        vec = np.zeros((batch, self.n_opt), dtype='float32')
-        mask = np.zeros((batch, self.n_col), dtype='float32')
-        mask[np.arange(batch), idx] = 1  
-        opt1prime = random_choice_prob_index(self.p[idx]) 
-        for i in np.arange(batch):
-            vec[i, self.interval[idx[i], 0] + opt1prime[i]] = 1
-
-        return vec, mask, idx, opt1prime
-
-    def sample(self, batch):
-        if self.n_col == 0:
-            return None
-        batch = batch
-
-        idx = np.random.choice(np.arange(self.n_col), batch)
-
-        vec = np.zeros((batch, self.n_opt), dtype='float32')
-        opt1prime = random_choice_prob_index_sampling(self.p_sampling, idx)
-        
-        for i in np.arange(batch):
-            vec[i, self.interval[idx[i], 0] + opt1prime[i]] = 1
-
-        return vec
-
-
 def cond_loss(data, output_info, c, m):
     loss = []
     st = 0
@@ -198,35 +104,6 @@ def cond_loss(data, output_info, c, m):
     return (loss * m).sum() / data.size()[0]
 
 
-class Sampler(object):
-    def __init__(self, data, output_info):
-        super(Sampler, self).__init__()
-        self.data = data
-        self.model = []
-        self.n = len(data)
-        st = 0
-        for item in output_info:
-            if item[1] == 'tanh':
-                st += item[0]
-                continue
-            elif item[1] == 'softmax':
-                ed = st + item[0]
-                tmp = []
-                for j in range(item[0]):
-                    tmp.append(np.nonzero(data[:, st + j])[0])
-                self.model.append(tmp)
-                st = ed
-
-    def sample(self, n, col, opt):
-        if col is None:
-            idx = np.random.choice(np.arange(self.n), n)
-            return self.data[idx]
-        idx = []
-        for c, o in zip(col, opt):
-            idx.append(np.random.choice(self.model[c][o]))
-        return self.data[idx]
-
-
 class Discriminator(Module):
     def __init__(self, side, layers):
         super(Discriminator, self).__init__()
@@ -364,6 +241,9 @@ class CTABGANSynthesizer:
         self.Gtransformer = None
         self.Dtransformer = None
 
+        # Acceptance statistics of the last `sample_remaining_columns` call
+        self.sampling_stats_ = None
+
         self.mixed = {}
         self.general = []
         self.p_type = {}
@@ -550,17 +430,31 @@ class CTABGANSynthesizer:
                                 
             epoch += 1
 
-    def sample(self, n):
+    def _generate(self, n, condition=None):
+        """Pass `n` latent vectors (rounded up to full batches) through the Generator.
+
+        Args:
+            n: The number of rows to generate.
+            condition: An optional `(discrete column, category)` tuple that is fed to the conditional vector of every
+                row. If `None`, the conditional vectors are sampled from the original category frequencies.
+
+        Returns:
+            The activated Generator output (before the inverse transformation).
+        """
         self.generator.eval()
 
+        c = None
+        if condition is not None:
+            c = self.cond_generator.generate_cond(condition[0], condition[1], self.batch_size)
+            c = torch.from_numpy(c).to(self.device)
+
         output_info = self.transformer.output_info
         steps = n // self.batch_size + 1
         data = []
         for i in range(steps):
             noisez = torch.randn(self.batch_size, self.random_dim, device=self.device)
-            condvec = self.cond_generator.sample(self.batch_size)
-            c = condvec
-            c = torch.from_numpy(c).to(self.device)
+            if condition is None:
+                c = torch.from_numpy(self.cond_generator.sample(self.batch_size)).to(self.device)
             noisez = torch.cat([noisez, c], dim=1)
             noisez = noisez.view(self.batch_size, self.random_dim + self.cond_generator.n_opt, 1, 1)
 
@@ -569,71 +463,144 @@ class CTABGANSynthesizer:
             fakeact = apply_activate(faket, output_info)
             data.append(fakeact.detach().cpu().numpy())
 
-        data = np.concatenate(data, axis=0)
+        return np.concatenate(data, axis=0)
+
+    def sample(self, n, condition=None):
+        data = self._generate(n, condition)
         result, resample = self.transformer.inverse_transform(data)
 
+        # Top up the rows that were rejected by the inverse transformation (values out of the fitted range).
         retries = 10
         n_retry = 0
         while len(result) < n:
             n_retry += 1
-            if n_retry < retries:
+            if n_retry > retries:
                 break
 
-            data_resample = []    
-            steps_left = resample // self.batch_size + 1
+            data_resample = self._generate(resample, condition)
+            res, resample = self.transformer.inverse_transform(data_resample)
+            result = np.concatenate([result, res], axis=0)
 
-            for i in range(steps_left):
-                noisez = torch.randn(self.batch_size, self.random_dim, device=self.device)
-                condvec = self.cond_generator.sample(self.batch_size)
-                c = condvec
-                c = torch.from_numpy(c).to(self.device)
-                noisez = torch.cat([noisez, c], dim=1)
-                noisez = noisez.view(self.batch_size, self.random_dim + self.cond_generator.n_opt, 1, 1)
+        return result[0:n]
 
-                fake = self.generator(noisez)
-                faket = self.Gtransformer.inverse_transform(fake)
-                fakeact = apply_activate(faket, output_info)
-                data_resample.append(fakeact.detach().cpu().numpy())
+    def sample_iter(self, n, y=None, chunk_size=10000):
+        """Generate `n` rows in chunks of `chunk_size` rows, so that the memory footprint is bounded by the chunk size.
 
-            data_resample = np.concatenate(data_resample, axis=0)
+        Args:
+            n: The total number of rows to generate.
+            y: An optional value of the class (i.e. last) column. It is fed to the conditional vector, and the rows of
+                other classes are discarded.
+            chunk_size: The number of rows in each yielded chunk.
 
-            res, resample = self.transformer.inverse_transform(data_resample)
-            result = np.concatenate([result, res], axis=0)
+        Yields:
+            2D NumPy arrays with `chunk_size` rows (the last chunk may be smaller).
+        """
+        if y is None:
+            return iter_chunks(self.sample, n, chunk_size)
 
-        return result[0:n]
+        condition = self._condition_of(len(self.transformer.meta) - 1, y)
+        if condition is None:
+            raise ValueError("The class " + str(y) + " was not seen during training.")
+
+        def sample(num_rows):
+            rows = self.sample(num_rows, condition)
+            return rows[rows[:, -1] == y]
+
+        return iter_chunks(sample, n, chunk_size)
+
+    def _condition_of(self, column, value):
+        """Map a known (column, value) pair to the `(discrete column, category)` of the conditional vector.
+
+        Returns `None` if the column is not categorical, or if the value was not seen during training.
+        """
+        cond_col = 0
+        for id_, info in enumerate(self.transformer.meta):
+            if id_ == column:
+                if info['type'] == "categorical" and value in info['i2s']:
+                    return cond_col, info['i2s'].index(value)
+                return None
+
+            # Every column except the general-transformed continuous ones contributes one softmax span.
+            if info['type'] != "continuous" or id_ not in self.transformer.general_columns:
+                cond_col += 1
+
+        return None
 
     def sample_remaining_columns(self, max_tries_per_batch=500, known_columns=None):
+        """Generate rows whose values match the `known_columns` (e.g. the class column).
+
+        The first categorical known column is fed to the conditional vector of the Generator, and the generated rows
+        are filtered with a vectorized mask over all the known columns. The size of each retry is derived from the
+        match rate that has been observed so far. The acceptance statistics are stored in `self.sampling_stats_`.
+
+        Args:
+            max_tries_per_batch: The maximum number of generation rounds for each distinct combination of known values.
+            known_columns: A DataFrame whose column names are the (positional) indices of the known columns.
+
+        Returns:
+            A DataFrame with the generated rows. It has fewer rows than `known_columns` if the retries are exhausted.
+        """
         if known_columns is None:
             print("CTABGAN cannot sample_remaining_columns without known_columns")
             exit()
 
         requested_samples = known_columns.shape[0]
+        col_ids = [int(c) for c in known_columns.columns]
+        known = known_columns.to_numpy(dtype=float)
+
+        result = np.empty((requested_samples, len(self.transformer.meta)))
+        filled = np.zeros(requested_samples, dtype=bool)
+        num_generated, num_matched, num_accepted, num_retries = 0, 0, 0, 0
 
-        num_samples = 0
-        num_retries = 0
-        generated_samples = []
         pbar = tqdm(total=requested_samples, desc="CTABGAN++ Sampling  ")
-        while num_samples < requested_samples:
-            generated_data = self.sample(requested_samples)
-            num_retries += 1
-
-            if num_retries > max_tries_per_batch:
-                ret_samples = np.array(generated_samples)
-                pbar.close()
-                # print("\t\tIncompletely created ", ret_samples.shape[0], "for class")
-                return pd.DataFrame(ret_samples)
-
-            num_generated_samples = generated_data.shape[0]
-            for i in range(num_generated_samples):
-                for j in range(known_columns.shape[1]):
-                    ref_data = known_columns.iloc[:, j].to_numpy()
-                    # print(ref_data[i], np.round(generated_data[i, int(known_columns.columns[j])]))
-                    if ref_data[i] == np.round(generated_data[i, int(known_columns.columns[j])]):
-                        generated_samples.append(generated_data[i, :])
-                        num_samples += 1
-                        pbar.update(1)
-
-        ret_samples = np.array(generated_samples)[0:requested_samples, :]
-        # print("\t\tPerfectly created ", ret_samples.shape[0], " samples for class")
+
+        # Rows with the same known values are generated together.
+        groups, group_ids = np.unique(known, axis=0, return_inverse=True)
+        for g, values in enumerate(groups):
+            rows = np.flatnonzero(group_ids.reshape(-1) == g)
+
+            condition = None
+            for j, column in enumerate(col_ids):
+                condition = self._condition_of(column, values[j])
+                if condition is not None:
+                    break
+
+            group_generated, group_matched, group_accepted, tries = 0, 0, 0, 0
+            batch = rows.shape[0]
+            while group_accepted < rows.shape[0] and tries < max_tries_per_batch:
+                tries += 1
+                generated_data = self.sample(batch, condition)
+
+                matches = generated_data[np.all(np.round(generated_data[:, col_ids]) == values, axis=1)]
+                take = min(matches.shape[0], rows.shape[0] - group_accepted)
+                result[rows[group_accepted:group_accepted + take]] = matches[:take]
+                filled[rows[group_accepted:group_accepted + take]] = True
+
+                # `sample` may return fewer rows than the batch (it drops the invalid ones), and the matches beyond
+                # the missing rows are discarded; the match rate counts all of them.
+                group_generated += generated_data.shape[0]
+                group_matched += matches.shape[0]
+                group_accepted += take
+                pbar.update(take)
+
+                # Size the next batch from the match rate observed so far. The rate is floored at 1% to bound the batch.
+                remaining = rows.shape[0] - group_accepted
+                rate = max(group_matched / group_generated if group_generated > 0 else 0.0, 0.01)
+                batch = int(np.ceil(1.1 * remaining / rate))
+
+            num_generated += group_generated
+            num_matched += group_matched
+            num_accepted += group_accepted
+            num_retries += tries
+
         pbar.close()
-        return pd.DataFrame(ret_samples)
+
+        self.sampling_stats_ = {
+            'requested': requested_samples,
+            'accepted': num_accepted,
+            'generated': num_generated,
+            'retries': num_retries,
+            'acceptance_rate': num_matched / num_generated if num_generated > 0 else 0.0,
+        }
+
+        return pd.DataFrame(result[filled])
@@ -2,6 +2,7 @@ import numpy as np
 import pandas as pd
 import torch
 from sklearn.mixture import BayesianGaussianMixture
+from artsyn.generators.ctabgan_sampler import sample_modes
 
 
 class DataTransformer:
@@ -89,12 +90,7 @@ class DataTransformer:
 
                 gm1.fit(data[:, id_].reshape([-1, 1]))
 
-                filter_arr = []
-                for element in data[:, id_]:
-                    if element not in info['modal']:
-                        filter_arr.append(True)
-                    else:
-                        filter_arr.append(False)
+                filter_arr = ~np.isin(data[:, id_], info['modal'])
 
                 gm2.fit(data[:, id_][filter_arr].reshape([-1, 1]))
                 mode_freq = (pd.Series(gm2.predict(data[:, id_][filter_arr].reshape([-1, 1]))).value_counts().keys())
@@ -139,15 +135,11 @@ class DataTransformer:
                     else:
                         features = (current - means) / (4 * stds)
                         probs = self.model[id_].predict_proba(current.reshape([-1, 1]))
-                        n_opts = sum(self.components[id_])
                         features = features[:, self.components[id_]]
                         probs = probs[:, self.components[id_]]
 
-                        opt_sel = np.zeros(len(data), dtype='int')
-                        for i in range(len(data)):
-                            pp = probs[i] + 1e-6
-                            pp = pp / sum(pp)
-                            opt_sel[i] = np.random.choice(np.arange(n_opts), p=pp)
+                        # Assign each row to a mode of the GMM (inverse-CDF sampling over the mode probabilities)
+                        opt_sel = sample_modes(probs)
 
                         idx = np.arange((len(features)))
                         features = features[idx, opt_sel].reshape([-1, 1])
@@ -155,14 +147,12 @@ class DataTransformer:
                         probs_onehot = np.zeros_like(probs)
                         probs_onehot[np.arange(len(probs)), opt_sel] = 1
 
-                        re_ordered_phot = np.zeros_like(probs_onehot)
                         col_sums = probs_onehot.sum(axis=0)
 
                         n = probs_onehot.shape[1]
                         largest_indices = np.argsort(-1*col_sums)[:n]
                         self.ordering.append(largest_indices)
-                        for cid, val in enumerate(largest_indices):
-                            re_ordered_phot[:, cid] = probs_onehot[:, val]
+                        re_ordered_phot = probs_onehot[:, largest_indices]
 
                         values += [features, re_ordered_phot]
                 else:
@@ -222,43 +212,35 @@ class DataTransformer:
 
                 probs = self.model[id_][1].predict_proba(current.reshape([-1, 1]))
 
-                n_opts = sum(self.components[id_])  # 8
                 features = features[:, self.components[id_]]
                 probs = probs[:, self.components[id_]]
                 
-                opt_sel = np.zeros(len(current), dtype='int')
-                for i in range(len(current)):
-                    pp = probs[i] + 1e-6
-                    pp = pp / sum(pp)
-                    opt_sel[i] = np.random.choice(np.arange(n_opts), p=pp)
+                opt_sel = sample_modes(probs)
                 idx = np.arange((len(features)))
                 features = features[idx, opt_sel].reshape([-1, 1])
                 features = np.clip(features, -.99, .99)
                 probs_onehot = np.zeros_like(probs)
                 probs_onehot[np.arange(len(probs)), opt_sel] = 1
-                extra_bits = np.zeros([len(current), len(info['modal'])])
-                temp_probs_onehot = np.concatenate([extra_bits, probs_onehot], axis=1)
+
+                # The rows that hold one of the modal values are encoded by the modal value's indicator; the rest
+                # of the rows (in their original order) receive the GMM features and mode indicators.
+                modal_cat = np.full(len(data), -1)
+                for category_, mode in reversed(list(enumerate(info['modal']))):
+                    modal_cat[data[:, id_] == mode] = category_
+                is_modal = modal_cat >= 0
+
                 final = np.zeros([len(data), 1 + probs_onehot.shape[1] + len(info['modal'])])
-                features_curser = 0
-                for idx, val in enumerate(data[:, id_]):
-                    if val in info['modal']:
-                        category_ = list(map(info['modal'].index, [val]))[0]
-                        final[idx, 0] = mode_vals[category_]
-                        final[idx, (category_+1)] = 1
-                    
-                    else:
-                        final[idx, 0] = features[features_curser]
-                        final[idx, (1+len(info['modal'])):] = temp_probs_onehot[features_curser][len(info['modal']):]
-                        features_curser = features_curser + 1
-               
+                final[is_modal, 0] = np.asarray(mode_vals)[modal_cat[is_modal]]
+                final[is_modal, modal_cat[is_modal] + 1] = 1
+                final[~is_modal, 0] = features[:, 0]
+                final[~is_modal, (1+len(info['modal'])):] = probs_onehot
+
                 just_onehot = final[:, 1:]
-                re_ordered_jhot = np.zeros_like(just_onehot)
                 n = just_onehot.shape[1]
                 col_sums = just_onehot.sum(axis=0)
                 largest_indices = np.argsort(-1*col_sums)[:n]
                 self.ordering.append(largest_indices)
-                for cid, val in enumerate(largest_indices):
-                    re_ordered_jhot[:, cid] = just_onehot[:, val]
+                re_ordered_jhot = just_onehot[:, largest_indices]
                 final_features = final[:, 0].reshape([-1, 1])
                 values += [final_features, re_ordered_jhot]
                 mixed_counter = mixed_counter + 1
@@ -274,7 +256,7 @@ class DataTransformer:
 
     def inverse_transform(self, data):
         data_t = np.zeros([len(data), len(self.meta)])
-        invalid_ids = []
+        invalid = np.zeros(len(data), dtype=bool)
         st = 0
         for id_, info in enumerate(self.meta):
             if info['type'] == "continuous":
@@ -283,9 +265,7 @@ class DataTransformer:
                     v = data[:, st + 1:st + 1 + np.sum(self.components[id_])]
                     order = self.ordering[id_]
                     v_re_ordered = np.zeros_like(v)
-
-                    for cid, val in enumerate(order):
-                        v_re_ordered[:, val] = v[:, cid]
+                    v_re_ordered[:, order] = v
 
                     v = v_re_ordered
 
@@ -301,10 +281,8 @@ class DataTransformer:
                     mean_t = means[p_argmax]
                     tmp = u * 4 * std_t + mean_t
 
-                    for idx, val in enumerate(tmp):
-                        if (val < info["min"]) | (val > info['max']):
-                            invalid_ids.append(idx)
-                  
+                    invalid |= (tmp < info["min"]) | (tmp > info['max'])
+
                     if id_ in self.non_categorical_columns:
                         tmp = np.round(tmp)
 
@@ -327,9 +305,7 @@ class DataTransformer:
                 full_v = data[:, (st + 1):(st + 1) + len(info['modal']) + np.sum(self.components[id_])]
                 order = self.ordering[id_]
                 full_v_re_ordered = np.zeros_like(full_v)
-
-                for cid, val in enumerate(order):
-                    full_v_re_ordered[:, val] = full_v[:, cid]
+                full_v_re_ordered[:, order] = full_v
 
                 full_v = full_v_re_ordered
 
@@ -346,20 +322,14 @@ class DataTransformer:
                 stds = np.sqrt(self.model[id_][1].covariances_).reshape([-1]) 
                 p_argmax = np.argmax(v, axis=1)
 
-                result = np.zeros_like(u)
+                # Rows whose argmax is a modal indicator take the modal value; the rest are decoded with the
+                # mean and std of their GMM mode.
+                is_modal = p_argmax < len(info['modal'])
+                gmm_mode = np.maximum(p_argmax - len(info['modal']), 0)
+                result = u * 4 * stds[gmm_mode] + means[gmm_mode]
+                result[is_modal] = np.asarray(info['modal'], dtype=float)[p_argmax[is_modal]]
 
-                for idx in range(len(data)):
-                    if p_argmax[idx] < len(info['modal']):
-                        argmax_value = p_argmax[idx]
-                        result[idx] = float(list(map(info['modal'].__getitem__, [argmax_value]))[0])
-                    else:
-                        std_t = stds[(p_argmax[idx]-len(info['modal']))]
-                        mean_t = means[(p_argmax[idx]-len(info['modal']))]
-                        result[idx] = u[idx] * 4 * std_t + mean_t
-
-                for idx, val in enumerate(result):
-                    if (val < info["min"]) | (val > info['max']):
-                        invalid_ids.append(idx)
+                invalid |= (result < info["min"]) | (result > info['max'])
 
                 data_t[:, id_] = result
 
@@ -367,13 +337,9 @@ class DataTransformer:
                 current = data[:, st:st + info['size']]
                 st += info['size']
                 idx = np.argmax(current, axis=1)
-                data_t[:, id_] = list(map(info['i2s'].__getitem__, idx))
-
-        invalid_ids = np.unique(np.array(invalid_ids)) 
-        all_ids = np.arange(0, len(data))
-        valid_ids = list(set(all_ids) - set(invalid_ids))
+                data_t[:, id_] = np.asarray(info['i2s'], dtype=object)[idx]
 
-        return data_t[valid_ids], len(invalid_ids)
+        return data_t[~invalid], int(invalid.sum())
 
 
 class ImageTransformer:
@@ -4,19 +4,17 @@ from sklearn.ensemble import IsolationForest
 
 from sklearn.cluster import KMeans, AgglomerativeClustering
 
-from kmodes.kprototypes import KPrototypes
-from kmodes.kmodes import KModes
-
 from sklearn.metrics import adjusted_rand_score
 from sklearn.mixture import GaussianMixture
 from sklearn.preprocessing import MinMaxScaler, OneHotEncoder
 from sklearn.compose import ColumnTransformer
 
-import gower
-
-from joblib import Parallel, delayed
+from joblib import delayed
 
-from DeepCoreML.generators.ctd_cluster import ctdCluster
+from artsyn.generators.ctd_cluster import ctdCluster
+from artsyn.instrumentation import count, instrumented, span
+from artsyn.shared_arrays import SharedArray
+from artsyn.thread_budget import run_parallel
 from sklearn.utils import resample
 
 
@@ -66,14 +64,17 @@ class ctdClusterer:
         self._continuous_columns = continuous_columns
         self._categorical_columns = categorical_columns
         self._random_state = random_state
+        self._rng = np.random.default_rng(random_state)
 
         self.num_clusters_ = 0
         self.clusters_ = []
         self.cluster_labels_ = None
         self.probability_matrix_ = None
         self.imbalance_matrix_ = None
+        self.shared_ = None
 
-    def perform_clustering(self, x_train, y_train, num_classes, pac):
+    @instrumented('clusterer.perform_clustering')
+    def perform_clustering(self, x_train, y_train, num_classes, pac, shared=None):
         """
 
         Args:
@@ -81,6 +82,9 @@ class ctdClusterer:
             y_train: The classes of the training samples
             num_classes: The number of distinct classes of the training data
             pac (int): The number of samples to group together as input to the Critic.
+            shared: If 'shm' or 'npy', the transformed data are written into a new shared buffer (named shared memory
+                or memory-mapped `.npy` file) that worker processes can attach to by name. The descriptor of the buffer
+                is stored in `shared_`.
 
         Returns:
             Transformed data
@@ -98,9 +102,8 @@ class ctdClusterer:
 
             # Find the optimal number of clusters (best_k).
             # Perform multiple executions and pick the one that produces the minimum scaled inertia.
-            # jobs = 0.2 * multiprocessing.cpu_count()
-            jobs = -1
-            scores = Parallel(n_jobs=jobs)(delayed(self._scaled_inertia)(x_scaled, k) for k in k_range)
+            with span('clusterer.k_search'):
+                scores = run_parallel(delayed(self._scaled_inertia)(x_scaled, k) for k in k_range)
             best = min(scores, key=lambda score_tuple: score_tuple[1])
             self.num_clusters_ = best[0]
             best_cov_type = best[2]
@@ -127,6 +130,7 @@ class ctdClusterer:
             #stability_scores = self.stability_curve_optimized(x_train, categorical_mask, k_range=k_range, b=10, sample_fraction=0.6)
             #self.num_clusters_ = k_range[np.argmax(stability_scores)]
             print("\t\tEstimated number of clusters:", self.num_clusters_, "- Categorical columns:", np.array(self._categorical_columns).astype(int))
+            import gower
             gower_distance_matrix = gower.gower_matrix(x_train.astype(float), cat_features=categorical_mask)
 
             cluster_method = AgglomerativeClustering(n_clusters=self.num_clusters_, metric="precomputed", linkage="average")
@@ -162,6 +166,7 @@ class ctdClusterer:
                                                                       n_runs=num_runs, sample_frac=sample_fraction,
                                                                       random_state=self._random_state)
 
+                from kmodes.kprototypes import KPrototypes
                 cluster_method = KPrototypes(n_clusters=self.num_clusters_, init='Cao', n_init=10, gamma=None,
                                              verbose=0, random_state=self._random_state)
                 self.cluster_labels_ = cluster_method.fit_predict(x_scaled, categorical=self._categorical_columns)
@@ -177,6 +182,7 @@ class ctdClusterer:
                                                                       n_runs=num_runs, sample_frac=sample_fraction,
                                                                       random_state=self._random_state)
 
+                from kmodes.kmodes import KModes
                 cluster_method = KModes(n_clusters=self.num_clusters_, init='Cao', n_init=10, verbose=0,
                                         random_state=self._random_state)
                 self.cluster_labels_ = cluster_method.fit_predict(x_train)
@@ -203,55 +209,60 @@ class ctdClusterer:
             self.cluster_labels_ = np.zeros(x_train.shape[0])
 
         # STEP 2: POST-CLUSTERING PROCESSING
-        # Partition the dataset and create the appropriate Cluster objects.
-        transformed_data = None
-        for u in range(self.num_clusters_):
-            x_u = x_train[self.cluster_labels_ == u, :]
-            y_u = y_train[self.cluster_labels_ == u]
-
-            cluster = ctdCluster(label=u, scaler=self._scaler,
-                                 clip=False, embedding_dim=self._embedding_dim,
-                                 continuous_columns=self._continuous_columns, categorical_columns=self._categorical_columns,
-                                 random_state=self._random_state)
-            cluster.fit(x_u, y_u, len(self._samples_per_class))
-
-            # Transform the data in a cluster-wise manner.
-            x_transformed = cluster.transform(x_u)
-            # print("transformed:", x_transformed[0:10, :])
-            # exit()
-            cluster_labels = (u * np.ones(y_u.shape[0])).reshape(-1, 1)
-            class_labels = np.array(y_u).reshape(-1, 1)
-
-            if u == 0:
-                transformed_data = np.concatenate((x_transformed, cluster_labels, class_labels), axis=1)
-            else:
-                concat = np.concatenate((x_transformed, cluster_labels, class_labels), axis=1)
-                transformed_data = np.concatenate((transformed_data, concat))
+        # Partition the dataset and create the appropriate Cluster objects. The transformed blocks of the clusters are
+        # written (in cluster order) into a single preallocated matrix that also reserves the rows of the pac padding.
+        self.cluster_labels_ = np.asarray(self.cluster_labels_).astype(int)
+        cluster_sizes = np.bincount(self.cluster_labels_, minlength=self.num_clusters_)
+
+        dataset_rows = x_train.shape[0]
+        padded_rows = dataset_rows
+        if dataset_rows % pac != 0:
+            padded_rows = pac * (dataset_rows // pac + 1)
 
-            self.clusters_.append(cluster)
+        if shared is None:
+            transformed_data = np.empty((padded_rows, x_train.shape[1] + 2))
+        else:
+            self.shared_ = SharedArray.create((padded_rows, x_train.shape[1] + 2), float, backend=shared)
+            transformed_data = self.shared_.attach()
+        count('clusters', self.num_clusters_)
+        with span('clusterer.cluster_transform'):
+            st = 0
+            for u in range(self.num_clusters_):
+                x_u = x_train[self.cluster_labels_ == u, :]
+                y_u = y_train[self.cluster_labels_ == u]
+
+                cluster = ctdCluster(label=u, scaler=self._scaler,
+                                     clip=False, embedding_dim=self._embedding_dim,
+                                     continuous_columns=self._continuous_columns, categorical_columns=self._categorical_columns,
+                                     random_state=self._random_state)
+                cluster.fit(x_u, y_u, len(self._samples_per_class))
+
+                # Transform the data in a cluster-wise manner.
+                ed = st + cluster_sizes[u]
+                transformed_data[st:ed, :-2] = cluster.transform(x_u)
+                transformed_data[st:ed, -2] = u
+                transformed_data[st:ed, -1] = y_u
+                st = ed
+
+                self.clusters_.append(cluster)
 
         # Construct the probability matrix; Each element (i,j) stores the conditional probability
         # P(cluster==u | class=y) = P( (class==y) AND (cluster==u) ) / P(class==y)
+        # The (cluster, class) counts are obtained with a single bincount over the combined cluster-class codes.
         if num_classes > 1:
-            self.probability_matrix_ = np.zeros((num_classes, self.num_clusters_))
-            self.imbalance_matrix_ = np.zeros((num_classes, self.num_clusters_))
-            for c in range(num_classes):
-                for u in range(self.num_clusters_):
-                    cluster = self.clusters_[u]
-                    # print("\t Cluster:", comp, "- Samples:", cluster.get_num_samples(),
-                    #      "(", cluster.get_num_samples(c), "from class", c, ")")
-                    self.probability_matrix_[c][u] = cluster.get_num_samples(c) / self._samples_per_class[c]
-                    self.imbalance_matrix_[c][u] = cluster.get_num_samples(c)
+            codes = self.cluster_labels_ * num_classes + np.asarray(y_train).astype(int)
+            counts = np.bincount(codes, minlength=self.num_clusters_ * num_classes)
+            self.imbalance_matrix_ = counts.reshape(self.num_clusters_, num_classes).T.astype(float)
+            self.probability_matrix_ = (self.imbalance_matrix_ /
+                                        np.asarray(self._samples_per_class, dtype=float).reshape(-1, 1))
 
         # Pad the dataset to align with the pac parameter (Create integral number of groups of pac samples).
-        dataset_rows = transformed_data.shape[0]
-        if dataset_rows % pac != 0:
-            required_samples = pac * (dataset_rows // pac + 1) - dataset_rows
-            random_samples = transformed_data[np.random.randint(0, dataset_rows, (required_samples,))]
-            transformed_data = np.vstack((transformed_data, random_samples))
+        if padded_rows > dataset_rows:
+            required_samples = padded_rows - dataset_rows
+            transformed_data[dataset_rows:] = transformed_data[self._rng.integers(0, dataset_rows, (required_samples,))]
 
         # Shuffle the dataset
-        np.random.shuffle(transformed_data)
+        self._rng.shuffle(transformed_data)
 
         return transformed_data
 
@@ -317,6 +328,9 @@ class ctdClusterer:
         return num_clusters, ret_val, cov_type
 
     def _fit_single_run(self, scaled_data, num_clusters, gamma, indices, random_state):
+        from kmodes.kprototypes import KPrototypes
+        from kmodes.kmodes import KModes
+
         if len(self._categorical_columns) > 0 and len(self._continuous_columns) > 0:
             model = KPrototypes(n_clusters=num_clusters, init='Cao', n_init=2, gamma=None, verbose=0, random_state=random_state)
             labels = model.fit_predict(scaled_data[indices], categorical=self._categorical_columns)
@@ -331,8 +345,8 @@ class ctdClusterer:
 
         return indices, labels
 
+    @instrumented('clusterer.k_search')
     def stability_analysis_parallel(self, scaled_data, k_values=range(2, 11), gamma=0, n_runs=5, sample_frac=0.7, random_state=0):
-        np.random.seed(random_state)
         results = {}
         n = scaled_data.shape[0]
         sample_size = int(sample_frac * n)
@@ -346,7 +360,7 @@ class ctdClusterer:
             ]
 
             # Parallel model fitting
-            runs = Parallel(n_jobs=-1)(delayed(self._fit_single_run)(scaled_data, k, gamma, indices, seed)
+            runs = run_parallel(delayed(self._fit_single_run)(scaled_data, k, gamma, indices, seed)
                 for indices, seed in zip(subsamples, seeds)
             )
 
@@ -3,9 +3,12 @@ import numpy as np
 class ctdDataSampler(object):
     """DataSampler samples the conditional vector and corresponding data for CTGAN."""
 
-    def __init__(self, data, output_info, log_frequency):
+    def __init__(self, data, output_info, log_frequency, rng=None):
         self._data = data
 
+        # The NumPy random Generator of the conditional vectors and the data samples (normally, the one of the model)
+        self._rng = np.random.default_rng() if rng is None else rng
+
         def is_discrete_column(column_info):
             return len(column_info) == 1 and column_info[0].activation_fn == 'softmax'
 
@@ -64,7 +67,7 @@ class ctdDataSampler(object):
 
     def _random_choice_prob_index(self, discrete_column_id):
         probs = self._discrete_column_category_prob[discrete_column_id]
-        r = np.expand_dims(np.random.rand(probs.shape[0]), axis=1)
+        r = np.expand_dims(self._rng.random(probs.shape[0]), axis=1)
         return (probs.cumsum(axis=1) > r).argmax(axis=1)
 
     def sample_condvec(self, batch_size):
@@ -79,7 +82,7 @@ class ctdDataSampler(object):
         if self._n_discrete_columns == 0:
             return None
 
-        discrete_column_id = np.random.choice(np.arange(self._n_discrete_columns), batch_size)
+        discrete_column_id = self._rng.choice(np.arange(self._n_discrete_columns), batch_size)
         # print("self._n_discrete_columns = ", self._n_discrete_columns, "discrete_column_id = ", discrete_column_id)
 
         cond = np.zeros((batch_size, self._n_categories), dtype='float32')
@@ -101,8 +104,8 @@ class ctdDataSampler(object):
         cond = np.zeros((batch, self._n_categories), dtype='float32')
 
         for i in range(batch):
-            row_idx = np.random.randint(0, len(self._data))
-            col_idx = np.random.randint(0, self._n_discrete_columns)
+            row_idx = self._rng.integers(0, len(self._data))
+            col_idx = self._rng.integers(0, self._n_discrete_columns)
             matrix_st = self._discrete_column_matrix_st[col_idx]
             matrix_ed = matrix_st + self._discrete_column_n_category[col_idx]
             pick = np.argmax(self._data[row_idx, matrix_st:matrix_ed])
@@ -117,12 +120,12 @@ class ctdDataSampler(object):
             n rows of matrix data.
         """
         if col is None:
-            idx = np.random.randint(len(self._data), size=n)
+            idx = self._rng.integers(len(self._data), size=n)
             return self._data[idx]
 
         idx = []
         for c, o in zip(col, opt):
-            idx.append(np.random.choice(self._rid_by_cat_cols[c][o]))
+            idx.append(self._rng.choice(self._rid_by_cat_cols[c][o]))
 
         return self._data[idx]
 
@@ -181,6 +181,7 @@ class CAIMD(BaseEstimator, TransformerMixin):
         yj = self._class_data[new_index]
 
         all_splits = np.unique(xj)[1:-1].tolist()  # potential split points
+        rng = np.random.default_rng(self._random_state)
 
         global_caim = -1
         main_scheme = [xj[0], xj[-1]]
@@ -188,7 +189,7 @@ class CAIMD(BaseEstimator, TransformerMixin):
         k = 1
 
         while (k <= min_splits) or ((global_caim < best_caim) and all_splits):
-            split_points = np.random.permutation(all_splits).tolist()
+            split_points = rng.permutation(all_splits).tolist()
             best_scheme = None
             best_point = None
             best_caim = 0
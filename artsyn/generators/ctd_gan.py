@@ -3,19 +3,24 @@ import pandas as pd
 
 import torch
 import torch.nn as nn
-import torch.utils.data as data_utils
 
 from tqdm import tqdm
 
-from DeepCoreML.TabularTransformer import TabularTransformer
-from DeepCoreML.generators.gan_discriminators import Critic
-from DeepCoreML.generators.gan_generators import ctGenerator
-from DeepCoreML.generators.GAN_Synthesizer import GANSynthesizer
-from DeepCoreML.generators.ctd_clusterer import ctdClusterer
-from DeepCoreML.generators.ctd_classifier import ctdClassifier
-from DeepCoreML.generators.ctd_datasampler import ctdDataSampler
-
-# import DeepCoreML.paths as paths
+from artsyn.TabularTransformer import TabularTransformer
+from artsyn.generators.gan_discriminators import Critic
+from artsyn.generators.gan_generators import ctGenerator
+from artsyn.generators.output_spans import OutputSpans
+from artsyn.generators.training_batches import TrainingBatches, training_tensor
+from artsyn.generators.GAN_Synthesizer import GANSynthesizer
+from artsyn.generators.gan_distributed import run_data_parallel
+from artsyn.generators.ctd_clusterer import ctdClusterer
+from artsyn.generators.ctd_classifier import ctdClassifier
+from artsyn.generators.ctd_datasampler import ctdDataSampler
+from artsyn.generators.gan_export import transformer_columns, spans_of, save_exported_model, scaler_decoder
+from artsyn.Tools import seeded_training, init_weights
+from artsyn.instrumentation import count, instrumented, span
+
+# import artsyn.paths as paths
 torch.set_printoptions(threshold=20000)
 
 class ctdGAN(GANSynthesizer):
@@ -30,7 +35,9 @@ class ctdGAN(GANSynthesizer):
 
     def __init__(self, discriminator=(128, 128), generator=(256, 256), embedding_dim=128, epochs=300, batch_size=32,
                  pac=1, lr=2e-4, decay=1e-6, sampling_strategy='auto', use_classifier=True,
-                 scaler='stds', cluster_method='kmeans', max_clusters=20, random_state=0):
+                 scaler='stds', cluster_method='kmeans', max_clusters=20, random_state=0, quantize=None,
+                 metrics=None, metrics_every=100, penalty='gp', penalty_every=1, world_size=1,
+                 amp=None, compile=False, penalty_weight=None):
         """
         ctdGAN initializer
 
@@ -62,9 +69,35 @@ class ctdGAN(GANSynthesizer):
                * '`yeo`':  Yeo-Johnson Power Transformer
             max_clusters (int): The maximum number of clusters to create.
             random_state (int): Seed the random number generators. Use the same value for reproducible results.
+            quantize (string): Reduced precision for the Generator during sampling: 'int8' (dynamic quantization,
+                CPU only) or 'bf16' (bfloat16 autocast). `None` samples in float32.
+            metrics: The receivers of the per-step training metrics: the path of a `.jsonl` or `.parquet` file, a
+                `training_metrics.MetricsCallback`, a function `hook(step, metrics)`, or a list of them. Each step
+                reports the losses `loss_d`, `loss_g`, the Critic `penalty`, `mis_clustered` (the number of samples
+                of the batch whose generated cluster differs from the one of their latent vector) and `acceptance`
+                (the fraction of the batch whose generated cluster and class match their latent vector, i.e. that
+                `sample` would accept). The metrics stay on the device until they are flushed.
+            metrics_every (int): Flush the buffered metrics to their receivers every `metrics_every` Generator steps.
+            penalty (string): The regularization of the Critic: 'gp' (WGAN gradient penalty) or 'r1' (R1 penalty on
+                the real samples).
+            penalty_every (int): Apply the penalty on one of every `penalty_every` Critic steps, with its weight scaled
+                accordingly (lazy regularization).
+            penalty_weight (real): The weight of the penalty (lambda of 'gp', gamma of 'r1'). `None` (default) uses
+                `pac` for 'gp', as in the original implementation, and 10 for 'r1'.
+            world_size (int): The number of processes for data-parallel training on the CPU cores of a single host
+                (`torch.distributed`, gloo backend). The clustering, the transformations and the classifier are
+                fitted once; then each process trains on `batch_size / world_size` samples per step and the gradients
+                are averaged across the processes. The metrics are then reported by the (forked) first process,
+                so they should go to a file or a logger rather than modify objects of the calling process.
+            amp (string): Mixed precision training: 'bf16' runs the forward passes of the Generator and the Critic under
+                bfloat16 autocast; the activations, the losses and the gradient penalty stay in float32. `None`
+                (default) trains in float32.
+            compile (bool): Compile the Generator, the Critic and the output activations with `torch.compile` during
+                training, with a fallback to eager mode. The compilation time is stored in `compile_time_`.
         """
         super().__init__("ctdGAN", embedding_dim, discriminator, generator, pac, epochs, batch_size,
-                         lr, lr, decay, decay, sampling_strategy, random_state)
+                         lr, lr, decay, decay, sampling_strategy, random_state, quantize, metrics, metrics_every,
+                         amp, compile)
 
         self._cluster_method = cluster_method
         if scaler not in ('None', 'none', 'stds', 'mms01', 'mms11', 'yeo'):
@@ -79,6 +112,7 @@ class ctdGAN(GANSynthesizer):
         self._discrete_transformer = None
 
         self._data_sampler = None
+        self._spans = None
 
         self._max_clusters = max_clusters
         self._use_classifier = use_classifier
@@ -90,51 +124,22 @@ class ctdGAN(GANSynthesizer):
         self.cluster_col_start_index = 0
         self.cluster_col_end_index = 0
 
-    @staticmethod
-    def _gumbel_softmax(logits, tau=1.0, hard=False, eps=1e-10, dim=-1):
-        """Deals with the instability of the gumbel_softmax for older versions of torch.
-
-        For more details about the issue:
-        https://drive.google.com/file/d/1AA5wPfZ1kquaRtVruCd6BiYZGcDeNxyP/view?usp=sharing
-
-        Args:
-            logits (array(…, num_features)): Un-normalized log probabilities
-            tau: Non-negative scalar temperature/
-            hard (bool): If True, the returned samples will be transformed to one-hot vectors,
-                but will be differentiated as if it is the soft sample in autograd.
-            dim (int): A dimension along which softmax will be computed. Default: -1.
-
-        Returns:
-            Sampled tensor of same shape as logits from the Gumbel-Softmax distribution.
-        """
-        for _ in range(10):
-            transformed = nn.functional.gumbel_softmax(logits, tau=tau, hard=hard, eps=eps, dim=dim)
-            if not torch.isnan(transformed).any():
-                return transformed
+        if penalty not in ('gp', 'r1'):
+            raise ValueError(f"Unsupported penalty {penalty}. Use 'gp' or 'r1'.")
+        self._penalty = penalty
+        self._penalty_every = penalty_every
+        self._penalty_weight = penalty_weight if penalty_weight is not None else self.pac_ if penalty == 'gp' else 10
+        self._train_world_size = world_size
 
-        raise ValueError('gumbel_softmax returning NaN.')
+        self._collect_metrics = False
+        self._step_metrics = {}
 
     def _apply_activate(self, data):
         """Apply proper activation function to the output of the generator."""
-        data_t = []
-        st = 0
-        for column_info in self._discrete_transformer.output_info_list:
-            for span_info in column_info:
-                if span_info.activation_fn == 'tanh':
-                    ed = st + span_info.dim
-                    data_t.append(torch.tanh(data[:, st:ed]))
-                    st = ed
-                elif span_info.activation_fn == 'softmax':
-                    ed = st + span_info.dim
-                    # transformed = torch.softmax(data[:, st:ed], dim=1)
-                    transformed = self._gumbel_softmax(data[:, st:ed], tau=0.2)
-                    data_t.append(transformed)
-                    st = ed
-                else:
-                    raise ValueError(f'Unexpected activation function {span_info.activation_fn}.')
-
-        return torch.cat(data_t, dim=1)
+        noise = self._spans.exponential_noise(data, generator=self._torch_rng)
+        return self._call(self._spans.activate_with_noise, data, noise)
 
+    @instrumented('gan.prepare')
     def cluster_transform(self, x_train, y_train, categorical_columns):
         """
         Perform clustering and (optionally) transform the data in the generated clusters.
@@ -178,7 +183,8 @@ class ctdGAN(GANSynthesizer):
         self._discrete_transformer.fit(train_data, self._categorical_columns)
         ret_data = self._discrete_transformer.transform(train_data)
 
-        self._data_sampler = ctdDataSampler(ret_data, self._discrete_transformer.output_info_list, True)
+        self._data_sampler = ctdDataSampler(ret_data, self._discrete_transformer.output_info_list, True, rng=self._rng)
+        self._spans = OutputSpans(self._discrete_transformer.output_info_list, self._device)
 
         # Return the data for ctdGAN training
         return ret_data, train_classes
@@ -203,13 +209,13 @@ class ctdGAN(GANSynthesizer):
 
         # If no specific class is requested, select random class labels.
         if y is None:
-            latent_classes = np.random.randint(low=0, high=self._n_classes, size=num_samples)
+            latent_classes = self._rng.integers(low=0, high=self._n_classes, size=num_samples)
         # Otherwise, fill the classes tensor with the requested class (y) value
         else:
             latent_classes = np.full(shape=num_samples, fill_value=y)
 
         # We will determine the appropriate clusters later, according to the classes of the samples
-        latent_clusters = np.random.randint(low=0, high=self._n_clusters, size=num_samples)
+        latent_clusters = self._rng.integers(low=0, high=self._n_clusters, size=num_samples)
 
         # Select random values for the discrete variables. These values will be later one-hot-encoded.
         latent_disc = []
@@ -224,7 +230,7 @@ class ctdGAN(GANSynthesizer):
                     # Discrete variables excluding the two last columns (i.e. the cluster and class labels)
                     if col < num_columns - 1:
                         col_length = span_info.dim
-                        random_discrete_vals = np.random.randint(low=0, high=col_length, size=num_samples)
+                        random_discrete_vals = self._rng.integers(low=0, high=col_length, size=num_samples)
                         latent_disc.append(random_discrete_vals)
 
         # Put all discrete variables together into the same matrix (including the class and cluster labels)
@@ -249,74 +255,44 @@ class ctdGAN(GANSynthesizer):
         # print("Latent Discrete Data (One-Hot):\n", latent_disc_ohe)
 
         # Tensor for continuous variables
-        mean = torch.zeros(num_samples, self.embedding_dim_)
+        mean = torch.zeros(num_samples, self.embedding_dim_, device=self._device)
         std = mean + 1
-        latent_cont = torch.normal(mean=mean, std=std).to(self._device)
+        latent_cont = torch.normal(mean=mean, std=std, generator=self._torch_rng)
 
         return latent_cont, latent_disc_ohe, latent_classes
 
     def cond_loss(self, generated_data, generated_data_after_act, c, m):
-        """Compute the cross entropy loss on the fixed discrete column."""
-        num_generated_samples = generated_data.size()[0]
-
-        discrete_loss = []
+        """Compute the cross entropy loss on the fixed discrete column. If `use_classifier` is set, the loss of the
+        class column is increased by the loss of the classifier on the generated samples."""
         lamda = 0.2
 
-        st = 0
-        st_c = 0
-        for column_info in self._discrete_transformer.output_info_list:
-            for span_info in column_info:
-                if len(column_info) != 1 or span_info.activation_fn != 'softmax':
-                    # not discrete column
-                    st += span_info.dim
-                else:
-                    ed = st + span_info.dim
-                    ed_c = st_c + span_info.dim
-                    # print("Start:", st, ", End: ", ed, ", Generated Data:", generated_data[:, st:ed])
-                    # print("Start_Col:", st_c, ", End_Col: ", ed_c, ", CondVec:", c[:, st_c:ed_c])
-                    gen = generated_data[:, st:ed]
-                    gen_c = torch.argmax(gen, dim=1)
-
-                    lat = torch.argmax(c[:, st_c:ed_c], dim=1)
-
-                    # Penalize the incorrect cluster generation
-                    if st == self.cluster_col_start_index and ed == self.cluster_col_end_index:
-                        mis_clustered = np.sum([1 for s in range(num_generated_samples) if gen_c[s] != lat[s]])
-                        #print("Lat Clusters:\n", lat, "\nGen Clusters:\n", gen, "(", gen_c, ")")
-                        #print("\tMisclustered samples: ", mis_clustered)
-                        #beta = 1.0 + mis_clustered / num_generated_samples
-                        beta = 1.0
-                        tmp = beta * nn.functional.cross_entropy(gen, lat, reduction='none')
-
-                    # Penalize the incorrect cluster generation
-                    elif st == self.class_col_start_index and ed == self.class_col_end_index:
-                        #print("latent classes:", lat)
-                        #print("generated classes:", gen_c)
-
-                        if self._use_classifier:
-                            predicted_classes = self.C_(generated_data_after_act[:, :self.class_col_start_index])
-                            #print("predicted classes:", torch.argmax(predicted_classes, axis=1))
-                            classifier_loss = nn.CrossEntropyLoss()(predicted_classes, lat)
-
-                            tmp = nn.functional.cross_entropy(gen, lat, reduction='none') + lamda * classifier_loss
-                        else:
-                            tmp = nn.functional.cross_entropy(gen, lat, reduction='none')
-                    else:
-                        tmp = nn.functional.cross_entropy(gen, lat, reduction='none')
-                    # print("Temp=", tmp)
-                    # a = input('').split(" ")[0]
-                    # print("Original: ")
-                    discrete_loss.append(tmp)
-                    st = ed
-                    st_c = ed_c
-
-        loss = torch.stack(discrete_loss, dim=1)  # noqa: PD013
-        ret_loss = (loss * m).sum() / generated_data.size()[0]
-
-        #print(ret_loss)
-        return ret_loss
-
-    def _train(self, x_train, y_train, categorical_columns=(), store_losses=None):
+        target = self._spans.cond_targets(c)
+        loss = self._spans.cond_cross_entropy(generated_data, target)
+
+        # Penalize the generation of samples from incorrect classes
+        if self._use_classifier:
+            k = self._spans.cond_starts.index(self.class_col_start_index)
+            predicted_classes = self.C_(generated_data_after_act[:, :self.class_col_start_index])
+            classifier_loss = nn.CrossEntropyLoss()(predicted_classes, target[:, k])
+            loss[:, k] += lamda * classifier_loss
+
+        # Count the samples with incorrect clusters and classes; the counts stay on the device until they are flushed.
+        if self._collect_metrics:
+            k = self._spans.cond_starts.index(self.cluster_col_start_index)
+            gen_c = torch.argmax(generated_data[:, self.cluster_col_start_index:self.cluster_col_end_index], dim=1)
+            correct_cluster = gen_c == target[:, k]
+
+            k = self._spans.cond_starts.index(self.class_col_start_index)
+            gen_y = torch.argmax(generated_data[:, self.class_col_start_index:self.class_col_end_index], dim=1)
+
+            self._step_metrics['mis_clustered'] = (~correct_cluster).sum()
+            self._step_metrics['acceptance'] = (correct_cluster & (gen_y == target[:, k])).float().mean()
+
+        return (loss * m).sum() / generated_data.size()[0]
+
+    @instrumented('gan.fit')
+    @seeded_training
+    def _train(self, x_train, y_train, categorical_columns=()):
         """
         ctdGAN training process. The Generator and the Critic are trained jointly in the traditional adversarial
         fashion by optimizing `loss_function`.
@@ -325,7 +301,6 @@ class ctdGAN(GANSynthesizer):
             x_train (NumPy array): The training data instances.
             y_train (NumPy array): The classes of the training data instances.
             categorical_columns: The columns to be considered as categorical
-            store_losses: The file path where the values of the Discriminator and Generator loss functions are stored.
         """
 
         # Modify the size of the batch to align with self.pac_
@@ -334,7 +309,6 @@ class ctdGAN(GANSynthesizer):
 
         # Prepare the data for training (Clustering, Computation of Probability Distributions, Transformations, etc.)
         training_data, training_classes = self.cluster_transform(x_train, y_train, categorical_columns=categorical_columns)
-        train_dataloader = data_utils.DataLoader(training_data, batch_size=batch_size, shuffle=True, num_workers=0)
 
         self.class_col_start_index = self._discrete_transformer.output_dimensions - self._n_classes
         self.class_col_end_index = self.class_col_start_index + self._n_classes
@@ -347,103 +321,97 @@ class ctdGAN(GANSynthesizer):
         latent_space_dimensions = self.embedding_dim_ + self._discrete_transformer.ohe_dimensions
 
         # Discriminator & Optimizer
-        self.D_ = Critic(input_dim=real_space_dimensions, discriminator_dim=self.D_Arch_, pac=self.pac_).to(self._device)
+        self.D_ = Critic(input_dim=real_space_dimensions, discriminator_dim=self.D_Arch_, pac=self.pac_,
+                         generator=self._torch_rng).to(self._device)
+        init_weights(self.D_, self._torch_rng)
         self.D_optimizer_ = torch.optim.Adam(self.D_.parameters(), lr=self._disc_lr, weight_decay=self._disc_decay, betas=(0.5, 0.9))
 
         # Generator & Optimizer
         self.G_ = ctGenerator(embedding_dim=latent_space_dimensions, architecture=self.G_Arch_, data_dim=real_space_dimensions).to(self._device)
+        init_weights(self.G_, self._torch_rng)
         self.G_optimizer_ = torch.optim.Adam(self.G_.parameters(), lr=self._gen_lr, weight_decay=self._gen_decay, betas=(0.5, 0.9))
 
+        # One float32 copy of the training data on the device, shared by the data-parallel ranks.
+        real_data = training_tensor(training_data, self._device, shared=self._train_world_size > 1)
+
         # Classifier & Optimizer
         if self._use_classifier:
             self.C_ = ctdClassifier(input_dim=self.class_col_start_index, num_classes=self._n_classes).to(self._device)
+            init_weights(self.C_, self._torch_rng)
             self.C_optimizer_ = torch.optim.Adam(self.C_.parameters(), lr=2e-4)
 
-            # Train the classifier
-            for epoch in range(200):
-                for real_data in train_dataloader:
-                    x_cl_train = real_data[:, :self.class_col_start_index].to(dtype=torch.float32).to(device=self._device)
-                    y_cl_train = torch.argmax(real_data[:, self.class_col_start_index:], axis=1).long().to(device=self._device)
-
-                    predicted_classes = self.C_(x_cl_train)
-                    loss_c = nn.CrossEntropyLoss()(predicted_classes, y_cl_train)
-                    self.C_optimizer_.zero_grad()
-                    loss_c.backward()
-                    self.C_optimizer_.step()
+            # Train the classifier on shuffled mini-batches of the training data, on the device.
+            with span('gan.classifier_pretraining'):
+                x_cl = real_data[:, :self.class_col_start_index]
+                y_cl = torch.argmax(real_data[:, self.class_col_start_index:], dim=1)
+                for epoch in range(200):
+                    perm = torch.randperm(len(real_data), device=self._device, generator=self._torch_rng)
+                    for batch in perm.split(batch_size):
+                        x_cl_train, y_cl_train = x_cl.index_select(0, batch), y_cl.index_select(0, batch)
+
+                        predicted_classes = self.C_(x_cl_train)
+                        loss_c = nn.CrossEntropyLoss()(predicted_classes, y_cl_train)
+                        self.C_optimizer_.zero_grad()
+                        loss_c.backward()
+                        self.C_optimizer_.step()
 
             # Freeze the classifier gradients
             for p in self.C_.parameters():
                 p.requires_grad = False
 
         # Start ctdGAN training loop
-        losses = []
-        it = 0
         steps_per_epoch = max(len(training_data) // self._batch_size, 1)
-        mean = torch.zeros(self._batch_size, self.embedding_dim_, device=self._device)
-        std = mean + 1
-
-        for epoch in tqdm(range(self._epochs), desc="ctdGAN Training     "):
+        if self._train_world_size > 1:
+            run_data_parallel(self, self._train_loop, (steps_per_epoch, real_data), self._train_world_size)
+        else:
+            self._train_loop(steps_per_epoch, real_data)
+
+    @instrumented('gan.training')
+    def _train_loop(self, steps_per_epoch, real_data):
+        """The adversarial training loop of the Generator and the Critic on the training data tensor `real_data`. In
+        data-parallel training, each rank runs this loop on its share of the batch."""
+        batch_size = self._local_batch_size()
+        metrics = self._training_metrics()
+        self._collect_metrics = metrics.enabled
+        self._compile_training(self.G_, self.D_, self._spans.activate_with_noise)
+
+        batches = TrainingBatches(self._data_sampler, real_data, batch_size, self.embedding_dim_, self._device,
+                                  self._torch_rng)
+
+        step = 0
+        for epoch in tqdm(range(self._epochs), desc="ctdGAN Training     ", disable=self._rank > 0):
             for id_ in range(steps_per_epoch):
-                fakez = torch.normal(mean=mean, std=std)
+                step += 1
+                fakez, c1, _ = batches.sample_latent()
+                real_cat = batches.sample_real()
 
-                condvec = self._data_sampler.sample_condvec(self._batch_size)
-                if condvec is None:
-                    c1, c2, col, opt = None, None, None, None
-                    real = self._data_sampler.sample_data(self._batch_size, col, opt)
-                else:
-                    c1, m1, col, opt = condvec
-                    c1 = torch.from_numpy(c1).to(self._device)
-                    fakez = torch.cat([fakez, c1], dim=1)
-
-                    # print("c1=", c1, ", col=", col, "opt=", opt)
-                    perm = np.arange(self._batch_size)
-                    np.random.shuffle(perm)
-                    real = self._data_sampler.sample_data(self._batch_size, col[perm], opt[perm])
-                    c2 = c1[perm]
-
-                fake = self.G_(fakez)
+                fake = self._forward(self.G_, fakez)
                 fakeact = self._apply_activate(fake)
+                fake_cat = fakeact if c1 is None else torch.cat([fakeact, c1], dim=1)
 
-                real = torch.from_numpy(real.astype('float32')).to(self._device)
-
-                if c1 is not None:
-                    fake_cat = torch.cat([fakeact, c1], dim=1)
-                    real_cat = torch.cat([real, c2], dim=1)
-                else:
-                    real_cat = real
-                    fake_cat = fakeact
+                y_fake = self._forward(self.D_, fake_cat)
+                y_real = self._forward(self.D_, real_cat)
 
-                y_fake = self.D_(fake_cat)
-                y_real = self.D_(real_cat)
-
-                pen = self.D_.calc_gradient_penalty(real_cat, fake_cat, self._device, self.pac_)
+                pen = self.D_.calc_penalty(real_cat, fake_cat, step, self._device, self._penalty_weight,
+                                           self._penalty, self._penalty_every, self._torch_rng)
                 loss_d = -(torch.mean(y_real) - torch.mean(y_fake))
 
                 self.D_optimizer_.zero_grad(set_to_none=False)
-                pen.backward(retain_graph=True)
-                loss_d.backward()
+                (loss_d if pen is None else loss_d + pen).backward()
+                self._sync_gradients(self.D_)
                 self.D_optimizer_.step()
 
-                fakez = torch.normal(mean=mean, std=std)
-                condvec = self._data_sampler.sample_condvec(self._batch_size)
+                fakez, c1, m1 = batches.sample_latent()
 
-                if condvec is None:
-                    c1, m1, col, opt = None, None, None, None
-                else:
-                    c1, m1, col, opt = condvec
-                    c1 = torch.from_numpy(c1).to(self._device)
-                    m1 = torch.from_numpy(m1).to(self._device)
-                    fakez = torch.cat([fakez, c1], dim=1)
-
-                fake = self.G_(fakez)
+                fake = self._forward(self.G_, fakez)
                 fakeact = self._apply_activate(fake)
 
                 if c1 is not None:
-                    y_fake = self.D_(torch.cat([fakeact, c1], dim=1))
+                    y_fake = self._forward(self.D_, torch.cat([fakeact, c1], dim=1))
                 else:
-                    y_fake = self.D_(fakeact)
+                    y_fake = self._forward(self.D_, fakeact)
 
-                if condvec is None:
+                if c1 is None:
                     cross_entropy = 0
                 else:
                     cross_entropy = self.cond_loss(fake, fakeact, c1, m1)
@@ -452,25 +420,17 @@ class ctdGAN(GANSynthesizer):
 
                 self.G_optimizer_.zero_grad(set_to_none=False)
                 loss_g.backward()
+                self._sync_gradients(self.G_)
                 self.G_optimizer_.step()
 
-            if store_losses is not None:
-                losses.append((it, epoch + 1, loss_d.detach().cpu(), loss_g.detach().cpu()))
-
-            if store_losses is not None:
-                self.plot_losses(losses, store_losses)
-
-            '''
-            for real_data in train_dataloader:
-                if real_data.shape[0] > 1:
-                    disc_loss, gen_loss = self.train_batch(real_data, y=None)
+                if self._collect_metrics:
+                    metrics.record(step, epoch + 1, loss_d=loss_d, loss_g=loss_g, penalty=pen, **self._step_metrics)
+                    self._step_metrics = {}
 
-                    if store_losses is not None:
-                        it += 1
-                        losses.append((it, epoch + 1, disc_loss.item(), gen_loss.item()))
-            '''
-        if store_losses is not None:
-            self.plot_losses(losses, store_losses)
+        self._collect_metrics = False
+        metrics.close()
+        self._release_compiled()
+        count('steps', step)
 
     def fit(self, x_train, y_train):
         """Invokes the GAN training process.
@@ -486,146 +446,229 @@ class ctdGAN(GANSynthesizer):
 
         Args:
             num_samples (int): The number of samples to generate.
-            y (int): A condition on the class of the generated samples.
+            y (int): A condition on the class of the generated samples, or a (class, cluster) pair.
             u (int): A condition on the cluster of the generated samples.
 
         Returns:
             Artificial data instances created by the Generator.
         """
+        if isinstance(y, tuple):
+            y, u = y
+
+        if y is not None:
+            return self.sample_by_class({y if u is None else (y, u): num_samples})[0]
+
+        # If no specific class is requested, select random class labels and shuffle the generated samples.
+        latent_classes = self._rng.integers(low=0, high=self._n_classes, size=num_samples)
+        class_counts = np.bincount(latent_classes, minlength=self._n_classes)
+        generated_samples = self.sample_by_class({(cls, u) if u is not None else cls: class_counts[cls]
+                                                  for cls in range(self._n_classes)})[0]
+        return generated_samples[self._rng.permutation(generated_samples.shape[0])]
+
+    def _latent_data(self, latent_classes, latent_clusters):
+        """Build the latent vectors of the Generator for the given class and cluster labels: random normal vectors
+        concatenated with the one-hot-encoded discrete variables (random values, except for the cluster and class
+        labels)."""
+        num_samples = latent_classes.shape[0]
         num_columns = len(self._discrete_transformer.output_info_list)
         column_transform_info_list = self._discrete_transformer.get_column_transform_info_list()
 
-        num_generated_samples, num_rejected_samples, num_retries, max_retries = 0, 0, 0, 100
-        reconstructed_samples = []
+        # Select random values for the discrete variables. These values will be later one-hot-encoded.
+        latent_disc = []
+        col = 0
+        column_labels = []
+        for column_metadata in self._discrete_transformer.output_info_list:
+            col = col + 1
+            for span_info in column_metadata:
+                if span_info.activation_fn == 'softmax':
+                    column_labels.append(str(col - 1))
+
+                    # Discrete variables excluding the two last columns (i.e. the cluster and class labels)
+                    if col < num_columns - 1:
+                        col_length = span_info.dim
+                        random_discrete_vals = self._rng.integers(low=0, high=col_length, size=num_samples)
+                        latent_disc.append(random_discrete_vals)
 
-        # Keep generating samples, until we reach the requested number of num_samples
-        while num_generated_samples < num_samples:
-            num_retries += 1
+        # Put all discrete variables together into the same matrix (including the class and cluster labels)
+        latent_disc.append(latent_clusters)
+        latent_disc.append(latent_classes)
+        latent_disc = pd.DataFrame(np.stack(latent_disc, axis=1), columns=column_labels)
 
-            # If no specific class is requested, select random class labels.
-            if y is None:
-                latent_classes = np.random.randint(low=0, high=self._n_classes, size=num_samples)
-            # Otherwise, fill the classes tensor with the requested class (y) value
-            else:
-                latent_classes = np.full(shape=num_samples, fill_value=y)
-
-            # We will determine the appropriate clusters later, according to the classes of the samples
-            latent_clusters = np.zeros(shape=num_samples)
-
-            # Select random values for the discrete variables. These values will be later one-hot-encoded.
-            latent_disc = []
-            col = 0
-            column_labels = []
-            for column_metadata in self._discrete_transformer.output_info_list:
-                col = col + 1
-                for span_info in column_metadata:
-                    if span_info.activation_fn == 'softmax':
-                        column_labels.append(str(col - 1))
-
-                        # Discrete variables excluding the two last columns (i.e. the cluster and class labels)
-                        if col < num_columns - 1:
-                            col_length = span_info.dim
-                            random_discrete_vals = np.random.randint(low=0, high=col_length, size=num_samples)
-                            latent_disc.append(random_discrete_vals)
-
-            # For each sample with a specific class, pick a random cluster with probability determined by the
-            # corresponding p_matrix. In the same time, sample the probability distribution of each cluster to
-            # get the latent representation of the continuous variables.
-            latent_clusters_objs = []
-            for s in range(num_samples):
-                lat_class = int(latent_classes[s])
-                p_matrix = self._clustered_transformer.probability_matrix_[lat_class]
-
-                # Select the cluster with probability coming from the probability matrix of ctdClusterer
-                if u is None:
-                    # print("\t\tProbability Matrix:", p_matrix)
-                    if self._sampling_strategy == 'unisam':
-                        latent_clusters[s] = np.random.choice(a=np.arange(self._n_clusters, dtype=int), size=None, replace=True)
-                    else:
-                        latent_clusters[s] = np.random.choice(
-                            a=np.arange(self._n_clusters, dtype=int), size=None, replace=True, p=p_matrix)
+        # Now one-hot-encode the discrete variables by using the OneHotEncoders that were used during training
+        latent_disc_ohe = []
+        for column_transform_info in column_transform_info_list:
+            if column_transform_info.column_type != 'continuous':
+                column_name = column_transform_info.column_name
+                data = latent_disc[[column_name]]
+                one_hot_data = self._discrete_transformer.transform_discrete(column_transform_info, data)
+                latent_disc_ohe.append(one_hot_data)
+
+        latent_disc_ohe = torch.tensor(np.hstack(latent_disc_ohe), dtype=torch.float32)
+
+        # Concatenate the continuous with the discrete variables
+        latent_cont = torch.randn((num_samples, self.embedding_dim_), generator=self._torch_rng, device=self._device)
+        return torch.cat((latent_cont, latent_disc_ohe.to(self._device)), dim=1)
+
+    @instrumented('gan.sampling')
+    def sample_by_class(self, counts, chunk_size=10000):
+        """Generate samples of several classes, or of several (class, cluster) pairs, in one pass.
+
+        A generated sample is accepted only if its generated class and cluster match the ones of its latent vector.
+        In each round, the latent vectors of the missing samples of all the targets are built as one batch and are
+        passed to the Generator in chunks of `chunk_size` rows; the discrete columns are inverse-transformed once,
+        and the accepted samples are written into a preallocated array, in the order of `counts`. After 100 rounds,
+        the incomplete targets keep fewer samples (or, if none of their samples was accepted, the samples of the
+        last round).
+
+        Args:
+            counts (dict): The number of samples to generate from each target: `{class: number of samples}`, or
+                `{(class, cluster): number of samples}` to condition on a cluster, too.
+            chunk_size (int): The number of latent vectors per Generator pass.
+
+        Returns:
+            The generated samples and their classes, ordered by target.
+        """
+        targets, requested = [], []
+        for key, n in counts.items():
+            if n > 0:
+                targets.append(key if isinstance(key, tuple) else (key, None))
+                requested.append(int(n))
+
+        requested = np.asarray(requested, dtype=int)
+        classes = np.asarray([cls for cls, _ in targets])
+        offsets = np.cumsum(requested) - requested
+        filled = np.zeros(len(targets), dtype=int)
+        reconstructed_samples = np.empty((requested.sum(), self._input_dim))
+
+        num_rejected_samples, num_retries, max_retries = 0, 0, 100
+
+        # Keep generating the missing samples of all the targets, until every target is complete.
+        while np.any(filled < requested):
+            num_retries += 1
+            missing = requested - filled
+            active = np.flatnonzero(missing)
+            target_index = np.repeat(active, missing[active])
+            latent_classes = classes[target_index]
+
+            # For each sample of a target without a cluster, pick a random cluster with probability determined by the
+            # probability matrix of ctdClusterer (or uniformly, in the 'unisam' ablation).
+            latent_clusters = []
+            for t in active:
+                cls, u = targets[t]
+                if u is not None:
+                    latent_clusters.append(np.full(missing[t], u))
+                elif self._sampling_strategy == 'unisam':
+                    latent_clusters.append(self._rng.choice(self._n_clusters, size=missing[t]))
                 else:
-                    latent_clusters[s] = u
-
-                latent_cluster_object = self._clustered_transformer.get_cluster(int(latent_clusters[s]))
-                latent_clusters_objs.append(latent_cluster_object)
-
-            # Put all discrete variables together into the same matrix (including the class and cluster labels)
-            latent_disc.append(latent_clusters)
-            latent_disc.append(latent_classes)
-            latent_disc = pd.DataFrame(np.stack(latent_disc, axis=1), columns=column_labels)
-            #print("Latent clusters:\n", latent_clusters)
-            #print("Latent classes:\n", latent_classes)
-            #print("Latent Discrete Data:\n", latent_disc)
-
-            # Now one-hot-encode the discrete variables by using the OneHotEncoders that were used during training
-            latent_disc_ohe = []
-            for column_transform_info in column_transform_info_list:
-                if column_transform_info.column_type != 'continuous':
-                    column_name = column_transform_info.column_name
-                    data = latent_disc[[column_name]]
-                    one_hot_data = self._discrete_transformer.transform_discrete(column_transform_info, data)
-                    latent_disc_ohe.append(one_hot_data)
-
-            # Create the discrete and continuous tensors.
-            latent_disc_ohe = torch.tensor(np.hstack(latent_disc_ohe))
-            #print("Latent Discrete Data (One-Hot):\n", latent_disc_ohe)
-
-            # Tensor for continuous variables
-            mean = torch.zeros(num_samples, self.embedding_dim_)
-            std = mean + 1
-            latent_cont = torch.normal(mean=mean, std=std)
-
-            # Concatenate the continuous with the discrete variables
-            latent_data = torch.cat((latent_cont, latent_disc_ohe), dim=1).to(self._device)
-            #print("Final Latent (Before the Generator): ", latent_data.shape, "\n", latent_data)
+                    p_matrix = self._clustered_transformer.probability_matrix_[int(cls)]
+                    latent_clusters.append(self._rng.choice(self._n_clusters, size=missing[t], p=p_matrix))
+            latent_clusters = np.concatenate(latent_clusters)
 
             # Generate samples by passing the latent data to Generator
-            # print("Generator latent data (before activation):\n", self.G_(latent_data))
-            generated_data = self._apply_activate(self.G_(latent_data)).cpu().detach().numpy()
+            with self.generation_mode():
+                generated_data = self._generate(self._latent_data(latent_classes, latent_clusters), chunk_size)
             generated_samples = self._discrete_transformer.inverse_transform(generated_data)
 
-            #print("\n\nLatent Data:\n", latent_data)
-            #print("\n\nGenerated Data:\n", generated_data)
-            #print("\n\nGenerated Samples:\n", generated_samples)
-
-            # Inverse the transformation of the generated samples. First inverse the transformation of the
-            # continuous variables that have been encoded according to the cluster the sample belongs.
-            for s in range(num_samples):
-                z = generated_samples[s].reshape(1, -1)
-                generated_class = z[0, z.shape[1] - 1]
-                generated_cluster = z[0, z.shape[1] - 2]
-
-                # print("Latent-Generated class:", latent_classes[s] , "- ", generated_class)
-                # print("Latent-Generated clusters:", latent_clusters[s], "- ", generated_cluster)
-                #if generated_class == latent_classes[s]:
-                if generated_class == latent_classes[s] and generated_cluster == latent_clusters[s]:
-                    num_generated_samples += 1
-                    if num_generated_samples > num_samples:
-                        return_samples = np.vstack(reconstructed_samples)
-                        print("\t\t\tPerfectly created ", return_samples.shape, "samples from class", y, ", rejected:", num_rejected_samples)
-                        return return_samples
-                    reconstructed_sample = latent_clusters_objs[s].inverse_transform(z)
-                    reconstructed_samples.append(reconstructed_sample)
-                    #print("Sample", s, "- Gen:", z, " ===>", reconstructed_sample)
-                else:
-                    num_rejected_samples += 1
+            accepted = (generated_samples[:, -1] == latent_classes) & (generated_samples[:, -2] == latent_clusters)
+            num_rejected_samples += int(np.sum(~accepted))
+
+            # If the maximum number of attempts has been exhausted, the targets without any accepted sample keep the
+            # samples of this round. The other incomplete targets will have fewer than the requested samples.
+            if num_retries > max_retries:
+                empty = (filled == 0) & (np.bincount(target_index[accepted], minlength=len(targets)) == 0)
+                accepted |= empty[target_index]
+
+            # The position of each accepted sample in the output: after the samples already accepted for its target.
+            num_accepted = np.cumsum(accepted) - accepted
+            block_start = np.cumsum(missing[active]) - missing[active]
+            rank = num_accepted - np.repeat(num_accepted[block_start], missing[active])
+            destination = offsets[target_index] + filled[target_index] + rank
+
+            # Inverse the transformation of the continuous variables that have been encoded according to the
+            # cluster the sample belongs.
+            for u in np.unique(latent_clusters[accepted]):
+                rows = accepted & (latent_clusters == u)
+                cluster = self._clustered_transformer.get_cluster(int(u))
+                reconstructed_samples[destination[rows]] = cluster.inverse_transform(generated_samples[rows])
+
+            filled += np.bincount(target_index[accepted], minlength=len(targets))
 
-            # If the maximum number of attempts has been exhausted, then exit the loop.
-            # We will be generating fewer than the requested samples.
             if num_retries > max_retries:
-                # If no sample has been retrieved, keep the last num samples
-                if len(reconstructed_samples) == 0:
-                    # print("\t\t\tI did not retrieve any results from class", y)
-                    for s in range(num_samples):
-                        z = generated_samples[s].reshape(1, -1)
-                        reconstructed_sample = latent_clusters_objs[s].inverse_transform(z)
-                        reconstructed_samples.append(reconstructed_sample)
                 break
 
-        return_samples = np.vstack(reconstructed_samples)
-        print("\t\t\tIncompletely Created ", return_samples.shape, "samples from class", y, ", rejected:", num_rejected_samples)
-        return return_samples
+        num_samples = int(filled.sum())
+        self._count_sampling(num_samples, num_rejected_samples, num_retries)
+
+        if num_samples == requested.sum():
+            print("\t\t\tPerfectly created", num_samples, "samples, rejected:", num_rejected_samples)
+        else:
+            print("\t\t\tIncompletely created", num_samples, "of", requested.sum(), "samples, rejected:",
+                  num_rejected_samples)
+            reconstructed_samples = np.concatenate([reconstructed_samples[o:o + f] for o, f in zip(offsets, filled)])
+
+        return reconstructed_samples, np.repeat(classes, filled)
+
+    @staticmethod
+    def _count_sampling(num_samples, num_rejected_samples, num_retries):
+        count('rows', num_samples)
+        count('rejected', num_rejected_samples)
+        count('retries', num_retries)
+
+    def export(self, path):
+        """Export the trained model for production sampling with `artsyn.runtime`. The artifact contains the traced
+        Generator (with the activations of `_apply_activate`), the construction of the latent vectors (discrete values,
+        cluster probability matrix, class labels) and the parameters of the cluster-level inverse transformations.
+
+        Args:
+            path (str): The output directory.
+
+        Returns:
+            The path of the artifact directory.
+        """
+        arrays = {}
+        columns = transformer_columns(self._discrete_transformer, arrays)
+        clusters = [self._clustered_transformer.get_cluster(u) for u in range(self._n_clusters)]
+
+        # The continuous columns are scaled at cluster level: store one set of inverse parameters per cluster.
+        for k, j in enumerate(clusters[0]._continuous_columns):
+            decoders = [scaler_decoder(cluster._scaler, k) for cluster in clusters]
+            columns[j]['decoder'] = decoders[0][0]
+            columns[j]['per_cluster'] = True
+            for name in decoders[0][1]:
+                arrays['col%d.%s' % (j, name)] = np.asarray([params[name] for _, params in decoders], dtype=float)
+
+            if clusters[0]._clip:
+                columns[j]['clip'] = True
+                arrays['col%d.min' % j] = np.asarray([cluster._min[k] for cluster in clusters], dtype=float)
+                arrays['col%d.max' % j] = np.asarray([cluster._max[k] for cluster in clusters], dtype=float)
+
+        # The positions of the latent one-hot vectors, as computed by the encoders of the discrete transformer.
+        blocks = []
+        discrete = [cti for cti in self._discrete_transformer.get_column_transform_info_list()
+                    if cti.column_type != 'continuous']
+        for b, cti in enumerate(discrete):
+            if b == len(discrete) - 2:
+                kind, values = 'cluster', np.arange(self._n_clusters, dtype=float)
+            elif b == len(discrete) - 1:
+                kind, values = 'class', np.arange(self._n_classes)
+            else:
+                kind, values = 'uniform', np.arange(cti.output_dimensions)
+
+            one_hot = self._discrete_transformer.transform_discrete(cti, pd.DataFrame({cti.column_name: values}))
+            positions = np.where(one_hot.sum(axis=1) > 0, np.argmax(one_hot, axis=1), -1)
+            arrays['latent%d.positions' % b] = positions
+            arrays['latent_%s_positions' % kind] = positions
+            blocks.append({'kind': kind, 'dim': int(cti.output_dimensions)})
+
+        arrays['cluster_probs'] = np.asarray(self._clustered_transformer.probability_matrix_, dtype=float)
+
+        spec = {'embedding_dim': self.embedding_dim_, 'n_columns': self._input_dim, 'columns': columns,
+                'n_classes': self._n_classes, 'n_clusters': self._n_clusters, 'latent_blocks': blocks,
+                'cluster_column': self._input_dim, 'class_column': self._input_dim + 1,
+                'uniform_clusters': self._sampling_strategy == 'unisam'}
+
+        return save_exported_model(path, 'ctdGAN', self.G_, self.embedding_dim_ + self._discrete_transformer.ohe_dimensions,
+                                   spans_of(self._discrete_transformer.output_info_list), spec, arrays)
 
     def fit_resample(self, x_train, y_train, categorical_columns=()):
         """`fit_resample` alleviates the problem of class imbalance in imbalanced datasets. The function renders ctdGAN
@@ -650,117 +693,49 @@ class ctdGAN(GANSynthesizer):
         """
 
         # Train ctdGAN with the input data
-        # self.train(x_train, y_train, categorical_columns=categorical_columns, store_losses=paths.output_path_loss)
-        self._train(x_train, y_train, categorical_columns=categorical_columns, store_losses=None)
-
-        x_resampled = np.copy(x_train)
-        y_resampled = np.copy(y_train)
-
-        # auto mode: Use ctdGAN to equalize the number of samples per class. This is achieved by generating samples
-        # of the minority classes (i.e. we perform oversampling).
-        if self._sampling_strategy == 'auto':
-            majority_class = np.array(self._samples_per_class).argmax()
-            num_majority_samples = np.max(np.array(self._samples_per_class))
-
-            # Perform oversampling
-            for cls in tqdm(range(self._n_classes), desc="ctdGAN Sampling     "):
-                if cls != majority_class:
-                    samples_to_generate = num_majority_samples - self._samples_per_class[cls]
+        self._train(x_train, y_train, categorical_columns=categorical_columns)
 
-                    if samples_to_generate > 1:
-                        # Generate the appropriate number of samples to equalize cls with the majority class.
-                        generated_samples = self.sample(num_samples=samples_to_generate, y=cls)
-                        generated_classes = np.full(generated_samples.shape[0], cls)
+        # Generate the samples of all the targets of the sampling plan with batched Generator passes.
+        plan, keep_real = self._sampling_plan(y_train)
+        return self._resample(x_train, y_train, plan, keep_real)
 
-                        x_resampled = np.vstack((x_resampled, generated_samples))
-                        y_resampled = np.hstack((y_resampled, generated_classes))
+    def _sampling_plan(self, y_train):
+        """Determine the number of samples to generate from each class according to `self._sampling_strategy`. With
+        the 'balance-clusters' strategy, the plan is keyed by (class, cluster) pairs.
 
-        elif self._sampling_strategy == 'unisam':
-            majority_class = np.array(self._samples_per_class).argmax()
-            num_majority_samples = np.max(np.array(self._samples_per_class))
-
-            # Perform oversampling
-            for cls in tqdm(range(self._n_classes), desc="ctdGAN Uniform Sampling (Ablation)    "):
-                if cls != majority_class:
-                    samples_to_generate = num_majority_samples - self._samples_per_class[cls]
-
-                    if samples_to_generate > 1:
-                        # Generate the appropriate number of samples to equalize cls with the majority class.
-                        generated_samples = self.sample(num_samples=samples_to_generate, y=cls)
-                        generated_classes = np.full(generated_samples.shape[0], cls)
+        Returns:
+            A dictionary {class or (class, cluster): number of samples} and a flag indicating whether the real data
+            are kept in the resampled dataset.
+        """
+        majority_class = np.array(self._samples_per_class).argmax()
+        num_majority_samples = np.max(np.array(self._samples_per_class))
 
-                        x_resampled = np.vstack((x_resampled, generated_samples))
-                        y_resampled = np.hstack((y_resampled, generated_classes))
+        # auto mode: Use ctdGAN to equalize the number of samples per class. This is achieved by generating samples
+        # of the minority classes (i.e. we perform oversampling). 'unisam' is the same with uniform cluster sampling.
+        if self._sampling_strategy in ('auto', 'unisam'):
+            plan = {cls: int(num_majority_samples - self._samples_per_class[cls]) for cls in range(self._n_classes)
+                    if cls != majority_class}
+            return {cls: n for cls, n in plan.items() if n > 1}, True
 
         elif self._sampling_strategy == 'balance-clusters':
-            majority_class = np.array(self._samples_per_class).argmax()
             imb_matrix = self._clustered_transformer.imbalance_matrix_
 
             # Perform oversampling by performing cluster-based oversampling
             majority_samples = np.max(imb_matrix, axis=0)
             majority_classes = np.argmax(imb_matrix, axis=0)
-            #print(imb_matrix)
-            #print(majority_samples)
-            #print(majority_classes)
 
-            for u in tqdm(range(self._n_clusters), desc="ctdGAN Sampling     "):
-                # print("Cluster", u)
+            plan = {}
+            for u in range(self._n_clusters):
                 for cls in range(self._n_classes):
                     ir = imb_matrix[cls][u] / majority_samples[u]
 
                     if cls != majority_classes[u] and cls != majority_class and ir > 0.01:
                         samples_to_generate = int(majority_samples[u] - imb_matrix[cls][u])
-                        # print("\tI will create", samples_to_generate, "samples from Class", cls)
-
                         if samples_to_generate > 1:
-                            # Generate the appropriate number of samples to equalize cls with the majority class.
-                            generated_samples = self.sample(num_samples=samples_to_generate, y=cls, u=u)
-
-                            if generated_samples is not None and generated_samples.shape[0] > 0:
-                                # print("\t\tCreated", generated_samples.shape[0], "samples")
-                                generated_classes = np.full(generated_samples.shape[0], cls)
-
-                                x_resampled = np.vstack((x_resampled, generated_samples))
-                                y_resampled = np.hstack((y_resampled, generated_classes))
-
-        # dictionary mode: the keys correspond to the targeted classes. The values correspond to the desired number of
-        # samples for each targeted class.
-        elif isinstance(self._sampling_strategy, dict):
-            for cls in tqdm(self._sampling_strategy, desc="ctdGAN Sampling     "):
-                # In imblearn sampling strategy stores the class distribution of the output dataset. So we have to
-                # create the half number of samples, and we divide by 2.
-                samples_to_generate = int(self._sampling_strategy[cls] / 2)
-
-                # Generate the appropriate number of samples to equalize cls with the majority class.
-                generated_samples = self.sample(num_samples=samples_to_generate, y=cls)
-
-                if generated_samples is not None and generated_samples.shape[0] > 0:
-                    # print("\t\tCreated", generated_samples.shape[0], "samples")
-                    generated_classes = np.full(generated_samples.shape[0], cls)
-
-                    x_resampled = np.vstack((x_resampled, generated_samples))
-                    y_resampled = np.hstack((y_resampled, generated_classes))
+                            plan[(cls, u)] = samples_to_generate
+            return plan, True
 
         elif self._sampling_strategy == 'create-new':
-            x_resampled = None
-            y_resampled = None
-
-            s = 0
-            for cls in tqdm(range(self._n_classes), desc="ctdGAN Sampling     "):
-                # Generate as many samples, as the corresponding class cls
-                samples_to_generate = int(self._samples_per_class[cls])
-                generated_samples = self.sample(num_samples=samples_to_generate, y=cls)
-
-                if generated_samples is not None and generated_samples.shape[0] > 0:
-                    # print("\t\tCreated", generated_samples.shape[0], "samples")
-                    generated_classes = np.full(generated_samples.shape[0], cls)
-
-                    if s == 0:
-                        x_resampled = generated_samples
-                        y_resampled = generated_classes
-                        s = 1
-                    else:
-                        x_resampled = np.vstack((x_resampled, generated_samples))
-                        y_resampled = np.hstack((y_resampled, generated_classes))
-
-        return x_resampled, y_resampled
+            return {cls: int(self._samples_per_class[cls]) for cls in range(self._n_classes)}, False
+
+        return super()._sampling_plan(y_train)
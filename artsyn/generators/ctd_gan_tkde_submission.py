@@ -362,7 +362,7 @@ class ctdGAN(GANSynthesizer):
 
         return disc_loss, gen_loss
 
-    def _train(self, x_train, y_train, categorical_columns=(), store_losses=None):
+    def _train(self, x_train, y_train, categorical_columns=()):
         """
         ctdGAN training process. The Generator and the Critic are trained jointly in the traditional adversarial
         fashion by optimizing `loss_function`.
@@ -371,7 +371,6 @@ class ctdGAN(GANSynthesizer):
             x_train (NumPy array): The training data instances.
             y_train (NumPy array): The classes of the training data instances.
             categorical_columns: The columns to be considered as categorical
-            store_losses: The file path where the values of the Discriminator and Generator loss functions are stored.
         """
 
         # Modify the size of the batch to align with self._pac
@@ -397,19 +396,17 @@ class ctdGAN(GANSynthesizer):
         self.G_optimizer_ = torch.optim.Adam(self.G_.parameters(),
                                              lr=self._gen_lr, weight_decay=self._gen_decay, betas=(0.5, 0.9))
 
-        losses = []
+        metrics = self._training_metrics()
         it = 0
         for epoch in tqdm(range(self._epochs), desc="ctdGAN Training     "):
             for real_data in train_dataloader:
                 if real_data.shape[0] > 1:
                     disc_loss, gen_loss = self.train_batch(real_data)
 
-                    if store_losses is not None:
-                        it += 1
-                        losses.append((it, epoch + 1, disc_loss.item(), gen_loss.item()))
+                    it += 1
+                    metrics.record(it, epoch + 1, loss_d=disc_loss, loss_g=gen_loss)
 
-        if store_losses is not None:
-            self.plot_losses(losses, store_losses)
+        metrics.close()
 
     def fit(self, x_train, y_train):
         """Invokes the GAN training process.
@@ -572,8 +569,7 @@ class ctdGAN(GANSynthesizer):
         """
 
         # Train ctdGAN with the input data
-        # self.train(x_train, y_train, categorical_columns=categorical_columns, store_losses=paths.output_path_loss)
-        self._train(x_train, y_train, categorical_columns=categorical_columns, store_losses=None)
+        self._train(x_train, y_train, categorical_columns=categorical_columns)
 
         x_resampled = np.copy(x_train)
         y_resampled = np.copy(y_train)
@@ -8,6 +8,7 @@ from torch.nn import functional as F
 from torch.nn import (Dropout, LeakyReLU, Linear, Module, ReLU, Sequential, Conv2d, ConvTranspose2d, Sigmoid,
                       init, BCELoss, CrossEntropyLoss, SmoothL1Loss, GELU, LayerNorm, Identity, ModuleList, Parameter)
 from artsyn.generators.fctgan_transformer import ImageTransformer, DataTransformer
+from artsyn.generators.ctabgan_sampler import Cond, Sampler
 from artsyn.generators.fno import FNO1d
 
 from tqdm import tqdm
@@ -90,102 +91,6 @@ def get_st_ed(target_col_index, output_info):
     return st, ed
 
 
-def random_choice_prob_index_sampling(probs, col_idx):
-    option_list = []
-    for i in col_idx:
-        pp = probs[i]
-        option_list.append(np.random.choice(np.arange(len(probs[i])), p=pp))
-
-    return np.array(option_list).reshape(col_idx.shape)
-
-
-def random_choice_prob_index(a, axis=1):
-    r = np.expand_dims(np.random.rand(a.shape[1 - axis]), axis=axis)
-    return (a.cumsum(axis=axis) > r).argmax(axis=axis)
-
-
-def maximum_interval(output_info):
-    max_interval = 0
-    for item in output_info:
-        max_interval = max(max_interval, item[0])
-    return max_interval
-
-
-class Cond(object):
-    def __init__(self, data, output_info):
-
-        self.model = []
-        st = 0
-        counter = 0
-        for item in output_info:
-
-            if item[1] == 'tanh':
-                st += item[0]
-                continue
-            elif item[1] == 'softmax':
-                ed = st + item[0]
-                counter += 1
-                self.model.append(np.argmax(data[:, st:ed], axis=-1))
-                st = ed
-
-        self.interval = []
-        self.n_col = 0
-        self.n_opt = 0
-        st = 0
-        self.p = np.zeros((counter, maximum_interval(output_info)))
-        self.p_sampling = []
-        for item in output_info:
-            if item[1] == 'tanh':
-                st += item[0]
-                continue
-            elif item[1] == 'softmax':
-                ed = st + item[0]
-                tmp = np.sum(data[:, st:ed], axis=0)
-                tmp_sampling = np.sum(data[:, st:ed], axis=0)
-                tmp = np.log(tmp + 1)
-                tmp = tmp / np.sum(tmp)
-                tmp_sampling = tmp_sampling / np.sum(tmp_sampling)
-                self.p_sampling.append(tmp_sampling)
-                self.p[self.n_col, :item[0]] = tmp
-                self.interval.append((self.n_opt, item[0]))
-                self.n_opt += item[0]
-                self.n_col += 1
-                st = ed
-
-        self.interval = np.asarray(self.interval)
-
-    def sample_train(self, batch):
-        if self.n_col == 0:
-            return None
-        batch = batch
-
-        idx = np.random.choice(np.arange(self.n_col), batch)
-
-        vec = np.zeros((batch, self.n_opt), dtype='float32')
-        mask = np.zeros((batch, self.n_col), dtype='float32')
-        mask[np.arange(batch), idx] = 1
-        opt1prime = random_choice_prob_index(self.p[idx])
-        for i in np.arange(batch):
-            vec[i, self.interval[idx[i], 0] + opt1prime[i]] = 1
-
-        return vec, mask, idx, opt1prime
-
-    def sample(self, batch):
-        if self.n_col == 0:
-            return None
-        batch = batch
-
-        idx = np.random.choice(np.arange(self.n_col), batch)
-
-        vec = np.zeros((batch, self.n_opt), dtype='float32')
-        opt1prime = random_choice_prob_index_sampling(self.p_sampling, idx)
-
-        for i in np.arange(batch):
-            vec[i, self.interval[idx[i], 0] + opt1prime[i]] = 1
-
-        return vec
-
-
 def cond_loss(data, output_info, c, m):
     loss = []
     st = 0
@@ -210,35 +115,6 @@ def cond_loss(data, output_info, c, m):
     return (loss * m).sum() / data.size()[0]
 
 
-class Sampler(object):
-    def __init__(self, data, output_info):
-        super(Sampler, self).__init__()
-        self.data = data
-        self.model = []
-        self.n = len(data)
-        st = 0
-        for item in output_info:
-            if item[1] == 'tanh':
-                st += item[0]
-                continue
-            elif item[1] == 'softmax':
-                ed = st + item[0]
-                tmp = []
-                for j in range(item[0]):
-                    tmp.append(np.nonzero(data[:, st + j])[0])
-                self.model.append(tmp)
-                st = ed
-
-    def sample(self, n, col, opt):
-        if col is None:
-            idx = np.random.choice(np.arange(self.n), n)
-            return self.data[idx]
-        idx = []
-        for c, o in zip(col, opt):
-            idx.append(np.random.choice(self.model[c][o]))
-        return self.data[idx]
-
-
 class Discriminator(Module):
     def __init__(self, side, layers, fno: int):
         super(Discriminator, self).__init__()
@@ -4,6 +4,32 @@ import torch
 import torch.nn as nn
 
 
+class SeededDropout(nn.Module):
+    """`nn.Dropout` that draws its masks from a torch `Generator` (the global generator if `None`), so that the
+    training of a model depends only on its own random number generators.
+
+    Args:
+        p: The probability that an element is zeroed.
+        generator: The torch `Generator` of the masks, on the device of the inputs.
+    """
+    def __init__(self, p=0.5, generator=None):
+        super().__init__()
+        self.p = p
+        self.generator = generator
+
+    def forward(self, x):
+        if not self.training or self.p == 0:
+            return x
+        if self.generator is None or self.p == 1:
+            return nn.functional.dropout(x, self.p, True)
+
+        mask = torch.empty_like(x).bernoulli_(1 - self.p, generator=self.generator)
+        return x * mask / (1 - self.p)
+
+    def extra_repr(self):
+        return 'p=' + str(self.p)
+
+
 class Discriminator(nn.Module):
     """
     A typical GAN Discriminator is a binary classifier that outputs 0/1 (real/fake) values. It
@@ -11,7 +37,7 @@ class Discriminator(nn.Module):
     As its performance improves during training, the Generator's performance also improves.
     """
 
-    def __init__(self, architecture=(128, 128), input_dim=2, p=0.5, negative_slope=0.2):
+    def __init__(self, architecture=(128, 128), input_dim=2, p=0.5, negative_slope=0.2, generator=None):
         """
         A simple Discriminator, implemented as a typical fully-connected feed-forward network. As a binary
         classifier, it includes only one neuron in the output layer; its activation is the `Sigmoid` function.
@@ -23,6 +49,7 @@ class Discriminator(nn.Module):
             input_dim: The dimensionality of the input (i.e. training) data.
             p: The probability that a weight is dropped at each training epoch - Passed to the Dropout layer.
             negative_slope: Controls the angle of the negative slope (used for negative inputs) - Passed to LeakyReLU.
+            generator: The torch `Generator` of the Dropout masks (the global generator if `None`).
         """
         super().__init__()
 
@@ -32,7 +59,7 @@ class Discriminator(nn.Module):
         # The hidden layers:
         for features in architecture:
             seq += [nn.Linear(in_features=dim, out_features=features),
-                    nn.Dropout(p=p),
+                    SeededDropout(p=p, generator=generator),
                     nn.LeakyReLU(negative_slope=negative_slope)]
 
             dim = features
@@ -61,7 +88,7 @@ class PackedDiscriminator(nn.Module):
     In this way it alleviates the problem of mode collapse in GANs. The Generator remains the same.
     """
 
-    def __init__(self, architecture=(128, 128), input_dim=2, pac=10, p=0.5, negative_slope=0.2):
+    def __init__(self, architecture=(128, 128), input_dim=2, pac=10, p=0.5, negative_slope=0.2, generator=None):
         """
         A packed Discriminator, implemented as a typical fully-connected feed-forward network. As a binary
         classifier, it includes only one neuron in the output layer; its activation is the `Sigmoid` function.
@@ -77,18 +104,19 @@ class PackedDiscriminator(nn.Module):
             pac: Number of samples to group together when applying the discriminator. Defaults to 10.
             p: The probability that a weight is dropped at each training epoch. Defaults to 0.3.
             negative_slope: Controls the angle of the negative slope (used for negative inputs). Defaults to 0.01.
+            generator: The torch `Generator` of the Dropout masks (the global generator if `None`).
         """
         super().__init__()
 
         seq = []
-        dim = pac * input_dim
+        dim = pac * int(input_dim)
         self._pac = pac
         self._pac_dim = dim
 
         for lay in list(architecture):
             seq += [nn.Linear(dim, lay),
                     nn.LeakyReLU(negative_slope=negative_slope),
-                    nn.Dropout(p=p)]
+                    SeededDropout(p=p, generator=generator)]
             dim = lay
 
         seq += [nn.Linear(dim, 1),
@@ -109,24 +137,26 @@ class PackedDiscriminator(nn.Module):
 
 
 class Critic(nn.Module):
-    """Discriminator for ctGAN."""
+    """Discriminator for ctGAN. The Dropout masks are drawn from the torch `generator` (the global generator if
+    `None`)."""
 
-    def __init__(self, input_dim, discriminator_dim, pac=10):
+    def __init__(self, input_dim, discriminator_dim, pac=10, generator=None):
         super().__init__()
-        dim = input_dim * pac
+        dim = int(input_dim) * pac
         self._pac = pac
         self._pac_dim = dim
         seq = []
         for item in list(discriminator_dim):
-            seq += [nn.Linear(dim, item), nn.LeakyReLU(0.2), nn.Dropout(0.5)]
+            seq += [nn.Linear(dim, item), nn.LeakyReLU(0.2), SeededDropout(0.5, generator)]
             dim = item
 
         seq += [nn.Linear(dim, 1)]
         self._seq = nn.Sequential(*seq)
 
-    def calc_gradient_penalty(self, real_data, fake_data, device='cpu', lambda_=10):
-        """Compute the gradient penalty. From the paper on improved WGAN training."""
-        alpha = torch.rand(real_data.size(0) // self._pac, 1, 1, device=device)
+    def calc_gradient_penalty(self, real_data, fake_data, device='cpu', lambda_=10, generator=None):
+        """Compute the gradient penalty. From the paper on improved WGAN training. The interpolation weights are
+        drawn from the torch `generator` (the global generator if `None`)."""
+        alpha = torch.rand(real_data.size(0) // self._pac, 1, 1, device=device, generator=generator)
         alpha = alpha.repeat(1, self._pac, real_data.size(1))
         alpha = alpha.view(-1, real_data.size(1))
 
@@ -145,6 +175,57 @@ class Critic(nn.Module):
 
         return gradient_penalty
 
+    def calc_r1_penalty(self, real_data, device='cpu', gamma=10):
+        """Compute the R1 penalty: the squared norm of the gradients of the Critic on the real data. From the paper
+        "Which Training Methods for GANs do actually Converge?" (Mescheder et al., 2018)."""
+        real_data = real_data.detach().requires_grad_(True)
+        disc_real = self(real_data)
+
+        gradients = torch.autograd.grad(
+            outputs=disc_real, inputs=real_data,
+            grad_outputs=torch.ones(disc_real.size(), device=device),
+            create_graph=True, retain_graph=True, only_inputs=True
+        )[0]
+
+        gradients_view = gradients.view(-1, self._pac * real_data.size(1))
+        r1_penalty = gradients_view.pow(2).sum(dim=1).mean() * gamma / 2
+
+        return r1_penalty
+
+    def calc_penalty(self, real_data, fake_data, step, device='cpu', lambda_=10, penalty='gp', every=1,
+                     generator=None):
+        """Compute the regularization term of the Critic loss according to a penalty schedule.
+
+        With `every` > 1, lazy regularization is applied: the penalty is computed only on one of every `every` steps
+        and its weight is multiplied by `every`, so that its average contribution remains the same. The double
+        backward pass of the penalty is skipped on all the other steps.
+
+        Args:
+            real_data: The (conditioned) real samples of the batch.
+            fake_data: The (conditioned) generated samples of the batch.
+            step (int): The number of the current Critic step.
+            device: The torch device.
+            lambda_: The weight of the penalty.
+            penalty (string): 'gp' for the WGAN gradient penalty on interpolated samples, 'r1' for the R1 penalty on
+                the real samples.
+            every (int): Apply the penalty every `every` steps.
+            generator: The torch `Generator` of the interpolation weights of 'gp'.
+
+        Returns:
+            The weighted penalty, or `None` if the penalty is skipped at this step.
+        """
+        if every > 1 and step % every != 0:
+            return None
+
+        if penalty == 'gp':
+            pen = self.calc_gradient_penalty(real_data, fake_data, device, lambda_, generator)
+        elif penalty == 'r1':
+            pen = self.calc_r1_penalty(real_data, device, lambda_)
+        else:
+            raise ValueError(f"Unsupported penalty {penalty}. Use 'gp' or 'r1'.")
+
+        return pen * every if every > 1 else pen
+
     def forward(self, x):
         """Apply the Discriminator to the `input_`."""
         assert x.size()[0] % self._pac == 0
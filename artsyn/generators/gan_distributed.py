@@ -0,0 +1,87 @@
+# Single-host data-parallel training of the GAN models with `torch.distributed` (gloo backend, CPU).
+#
+# The training data are preprocessed and the networks are built once, in the calling process. The training loop is
+# then run in `world_size` forked processes (ranks). The forked ranks share the preprocessed data with the caller
+# (copy-on-write pages that are only read), start from identical network weights and draw their own conditional
+# batches. After each backward pass the gradients are averaged across the ranks, so all ranks perform identical
+# optimizer steps. When rank 0 completes, its trained networks and optimizer states are copied back to the caller.
+
+import os
+import shutil
+import socket
+import tempfile
+
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+
+from artsyn.thread_budget import thread_budget, total_threads
+
+
+def _free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _trained_state(model):
+    """The state that rank 0 returns to the caller: the networks and their optimizers."""
+    state = {}
+    for name in ('G_', 'D_', 'C_', 'G_optimizer_', 'D_optimizer_', 'C_optimizer_'):
+        obj = getattr(model, name, None)
+        if obj is not None:
+            state[name] = obj.state_dict()
+    return state
+
+
+def _worker(rank, model, train_loop, args, world_size, port, threads, output):
+    os.environ['MASTER_ADDR'] = '127.0.0.1'
+    os.environ['MASTER_PORT'] = str(port)
+    dist.init_process_group('gloo', rank=rank, world_size=world_size)
+
+    try:
+        # Each rank draws different latent vectors, conditional batches and Dropout masks.
+        model._seed_random_generators((0 if model._random_state is None else model._random_state) + rank)
+
+        model._rank, model._world_size = rank, world_size
+        with thread_budget(threads):
+            train_loop(*args)
+
+        if rank == 0:
+            torch.save(_trained_state(model), output)
+    finally:
+        dist.destroy_process_group()
+
+
+def run_data_parallel(model, train_loop, args, world_size, threads_per_rank=None):
+    """Run `train_loop(*args)`, a bound training loop method of `model`, on `world_size` data-parallel ranks.
+
+    The loop must call `model._sync_gradients(module)` between each backward pass and optimizer step, and use
+    `model._local_batch_size()` as its batch size.
+
+    Args:
+        model: A `GANSynthesizer` whose training data and networks have been prepared.
+        train_loop: The training loop (a bound method of `model`).
+        args: The positional arguments of `train_loop`.
+        world_size (int): The number of ranks (processes).
+        threads_per_rank (int): The number of intra-op threads of each rank. By default, the thread budget of the
+            package (`artsyn.thread_budget`) is divided evenly among the ranks.
+    """
+    if model._device.type != 'cpu':
+        raise ValueError("Data-parallel training is supported on CPU only.")
+
+    if threads_per_rank is None:
+        threads_per_rank = max(1, total_threads() // world_size)
+
+    tmp_dir = tempfile.mkdtemp(prefix='artsyn_ddp_')
+    output = os.path.join(tmp_dir, 'rank0.pt')
+    try:
+        mp.start_processes(_worker, args=(model, train_loop, args, world_size, _free_port(), threads_per_rank, output),
+                           nprocs=world_size, join=True, start_method='fork')
+
+        state = torch.load(output, weights_only=True)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    for name, value in state.items():
+        getattr(model, name).load_state_dict(value)
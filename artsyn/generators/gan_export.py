@@ -0,0 +1,181 @@
+# Export of trained GAN synthesizers to a self-contained artifact for production sampling.
+#
+# An exported model is a directory with three files:
+#
+# * `generator.pt`: the Generator followed by its output activations, traced with TorchScript.
+# * `spec.json`: the construction of the latent vectors and the decoding rules of each output column.
+# * `params.npz`: the numeric parameters of the inverse transformation (scalers, Gaussian mixtures, etc.).
+#
+# The artifact is loaded by `artsyn.runtime`, which depends only on NumPy and torch.
+
+import copy
+import json
+import os
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler, MinMaxScaler, PowerTransformer
+from sklearn.decomposition import PCA
+
+EXPORT_FORMAT_VERSION = 1
+
+
+class ActivatedGenerator(nn.Module):
+    """A Generator followed by the activation functions that `_apply_activate` applies to its output spans.
+
+    Args:
+        generator: The trained Generator.
+        spans: A list of `(dimension, activation)` pairs, with activation in 'tanh', 'softmax' or 'none'. The
+            'softmax' spans are sampled with Gumbel-Softmax (temperature `tau`), exactly as during training.
+        tau: The Gumbel-Softmax temperature.
+    """
+    def __init__(self, generator, spans, tau=0.2):
+        super().__init__()
+        self.generator = generator
+        self.spans = [(int(dim), fn) for dim, fn in spans]
+        self.tau = tau
+
+    def forward(self, z):
+        data = self.generator(z)
+
+        data_t = []
+        st = 0
+        for dim, fn in self.spans:
+            ed = st + dim
+            if fn == 'tanh':
+                data_t.append(torch.tanh(data[:, st:ed]))
+            elif fn == 'softmax':
+                data_t.append(nn.functional.gumbel_softmax(data[:, st:ed], tau=self.tau))
+            else:
+                data_t.append(data[:, st:ed])
+            st = ed
+
+        return torch.cat(data_t, dim=1)
+
+
+def spans_of(output_info_list):
+    """Flatten the `output_info_list` of a `TabularTransformer` into `(dimension, activation)` pairs."""
+    return [(span_info.dim, span_info.activation_fn) for column_info in output_info_list for span_info in column_info]
+
+
+def _python_values(values):
+    """Convert NumPy scalars to the Python types that JSON can serialize."""
+    return [v.item() if isinstance(v, np.generic) else v for v in values]
+
+
+def scaler_decoder(scaler, column):
+    """Express the inverse transformation of a fitted scikit-learn scaler on `column` with plain arrays.
+
+    Standard/Min-Max scalers (and a Standard scaler followed by PCA on a single column) are affine maps. The Yeo-Johnson
+    transformer is described by its lambda and the parameters of its inner standardization.
+
+    Returns:
+        A decoder name and a dictionary of scalar parameters.
+    """
+    if scaler is None:
+        return 'identity', {}
+
+    if isinstance(scaler, StandardScaler):
+        scale = 1.0 if scaler.scale_ is None else scaler.scale_[column]
+        shift = 0.0 if scaler.mean_ is None else scaler.mean_[column]
+        return 'affine', {'scale': scale, 'shift': shift}
+
+    if isinstance(scaler, MinMaxScaler):
+        return 'affine', {'scale': 1.0 / scaler.scale_[column], 'shift': -scaler.min_[column] / scaler.scale_[column]}
+
+    if isinstance(scaler, Pipeline) and isinstance(scaler.steps[-1][1], PCA) and scaler.steps[-1][1].n_components_ == 1:
+        _, inner = scaler_decoder(scaler.steps[0][1], column)
+        pca = scaler.steps[-1][1]
+        scale = pca.components_[0, 0] * inner['scale']
+        shift = pca.mean_[0] * inner['scale'] + inner['shift']
+        return 'affine', {'scale': scale, 'shift': shift}
+
+    if isinstance(scaler, PowerTransformer) and scaler.method == 'yeo-johnson':
+        params = {'lambda': scaler.lambdas_[column], 'scale': 1.0, 'shift': 0.0}
+        if scaler.standardize:
+            params['scale'] = scaler._scaler.scale_[column]
+            params['shift'] = scaler._scaler.mean_[column]
+        return 'yeo', params
+
+    raise ValueError("Cannot export a transformer of type " + type(scaler).__name__)
+
+
+def transformer_columns(transformer, arrays):
+    """Describe the inverse transformation of a fitted `TabularTransformer`, column by column.
+
+    Args:
+        transformer: The fitted `TabularTransformer`.
+        arrays: A dictionary that receives the numeric parameters (stored in `params.npz`).
+
+    Returns:
+        A list with one decoding rule (dictionary) per column.
+    """
+    columns = []
+    st = 0
+    for j, cti in enumerate(transformer.get_column_transform_info_list()):
+        key = 'col%d' % j
+        col = {'name': str(cti.column_name), 'start': int(st), 'dim': int(cti.output_dimensions),
+               'dtype': str(transformer._column_raw_dtypes.iloc[j])}
+
+        if cti.column_type == 'discrete':
+            col['decoder'] = 'categories'
+            col['categories'] = _python_values(cti.transform.dummies)
+
+        elif transformer._cont_normalizer == 'vgm':
+            gm = cti.transform
+            valid = np.asarray(gm.valid_component_indicator, dtype=bool)
+            col['decoder'] = 'vgm'
+            arrays[key + '.means'] = gm._bgm_transformer.means_.reshape(-1)[valid]
+            arrays[key + '.stds'] = np.sqrt(gm._bgm_transformer.covariances_).reshape(-1)[valid]
+            col['std_multiplier'] = float(getattr(gm, 'STD_MULTIPLIER', 4))
+
+        else:
+            col['decoder'], params = scaler_decoder(cti.transform, 0)
+            for name, value in params.items():
+                arrays[key + '.' + name] = np.asarray([value], dtype=float)
+
+        if transformer._clip and cti.column_type == 'continuous':
+            arrays[key + '.min'] = np.asarray([cti.column_min], dtype=float)
+            arrays[key + '.max'] = np.asarray([cti.column_max], dtype=float)
+            col['clip'] = True
+
+        columns.append(col)
+        st += cti.output_dimensions
+
+    return columns
+
+
+def save_exported_model(path, model, generator, latent_dim, spans, spec, arrays):
+    """Trace the Generator with its output activations and write the artifact files into the directory `path`.
+
+    Args:
+        path: The output directory.
+        model: The name of the exported model (it selects the latent vector construction of the runtime).
+        generator: The trained Generator.
+        latent_dim: The dimensionality of the Generator's input.
+        spans: The `(dimension, activation)` pairs of the Generator's output.
+        spec: The model-specific part of `spec.json` (latent vector construction, column decoding).
+        arrays: The numeric parameters that are stored in `params.npz`.
+
+    Returns:
+        The path of the artifact directory.
+    """
+    os.makedirs(path, exist_ok=True)
+
+    # Trace a CPU copy in evaluation mode; the trained Generator is left untouched.
+    activated = ActivatedGenerator(copy.deepcopy(generator).cpu().eval(), spans)
+    with torch.no_grad():
+        traced = torch.jit.trace(activated, torch.randn(2, latent_dim), check_trace=False)
+
+    torch.jit.save(traced, os.path.join(path, 'generator.pt'))
+    np.savez(os.path.join(path, 'params.npz'), **arrays)
+
+    spec = dict(spec, format_version=EXPORT_FORMAT_VERSION, model=model, latent_dim=int(latent_dim),
+                spans=[[int(dim), fn] for dim, fn in spans])
+    with open(os.path.join(path, 'spec.json'), 'w') as f:
+        json.dump(spec, f, indent=1)
+
+    return path
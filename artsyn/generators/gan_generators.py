@@ -1,5 +1,7 @@
 # Generator models for GANs
 
+import copy
+
 import torch
 import torch.nn as nn
 
@@ -98,3 +100,43 @@ class ctGenerator(nn.Module):
         """Apply the Generator to the `input_`."""
         data = self.seq(input_)
         return data
+
+
+class AutocastGenerator(nn.Module):
+    """Run the forward pass of a Generator under bfloat16 autocast. The output is cast back to float32."""
+
+    def __init__(self, generator, device_type='cpu'):
+        super().__init__()
+        self.generator = generator
+        self.device_type = device_type
+
+    def forward(self, input_):
+        with torch.autocast(device_type=self.device_type, dtype=torch.bfloat16):
+            data = self.generator(input_)
+        return data.float()
+
+
+def quantize_generator(generator, mode, device_type='cpu'):
+    """Create a reduced-precision version of a trained Generator for sampling.
+
+    Args:
+        generator: The trained Generator (`Generator` or `ctGenerator`).
+        mode: The reduced precision mode:
+
+          * 'int8': dynamic quantization of the Linear layers (weights are stored in int8, activations are quantized
+            on the fly). CPU only. The returned module is a copy; the input Generator is not modified.
+          * 'bf16': bfloat16 autocast of the forward pass.
+        device_type: The type of the device that runs the Generator ('cpu' or 'cuda').
+
+    Returns:
+        A module with the same interface as the Generator.
+    """
+    if mode == 'int8':
+        if device_type != 'cpu':
+            raise ValueError("int8 dynamic quantization is supported only on CPU.")
+        return torch.ao.quantization.quantize_dynamic(copy.deepcopy(generator).eval(), {nn.Linear}, dtype=torch.qint8)
+
+    elif mode == 'bf16':
+        return AutocastGenerator(generator, device_type)
+
+    raise ValueError(f"Unsupported quantization mode {mode}. Use 'int8' or 'bf16'.")
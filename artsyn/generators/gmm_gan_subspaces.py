@@ -16,9 +16,9 @@ from sklearn.preprocessing import StandardScaler
 # from sklearn.pipeline import Pipeline
 from sklearn.ensemble import IsolationForest
 
-from DeepCoreML.generators.gan_discriminators import PackedDiscriminator
-from DeepCoreML.generators.gan_generators import Generator
-from DeepCoreML.generators.GAN_Synthesizer import GANSynthesizer
+from artsyn.generators.gan_discriminators import PackedDiscriminator
+from artsyn.generators.gan_generators import Generator
+from artsyn.generators.GAN_Synthesizer import GANSynthesizer
 
 
 class GMMComponent:
@@ -581,7 +581,8 @@ class GMM_GAN(GANSynthesizer):
         # Generate data from the model's Generator - The feature values of the generated samples fall into the range:
         # [-1,1]: if the activation function of the output layer of the Generator is nn.Tanh().
         # [0,1]: if the activation function of the output layer of the Generator is nn.Sigmoid().
-        generated_samples = self.G_(latent_data).cpu().detach().numpy()
+        with self.generation_mode():
+            generated_samples = self.G_(latent_data).cpu().numpy()
         # print("Generated Samples:\n", generated_samples)
 
         # Inverse the transformation of the generated samples
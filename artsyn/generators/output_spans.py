@@ -0,0 +1,125 @@
+import torch
+import torch.nn as nn
+
+
+class OutputSpans(object):
+    """The span layout of a `TabularTransformer` output, precomputed into index tensors.
+
+    The Generators of ctGAN and ctdGAN produce one block of columns (span) per transformed feature: `tanh` spans for
+    the continuous values and `softmax` spans for the one-hot encoded categories. Instead of slicing the output span by
+    span on every forward pass, the layout is computed once:
+
+    * a boolean mask of the `tanh` columns, so that tanh is applied with a single masked operation;
+    * a padded `(spans x max span width)` index matrix of the `softmax` columns, so that the Gumbel-Softmax of all the
+      discrete spans is computed with one batched softmax (padded entries are masked with -inf);
+    * a similar index matrix for the discrete columns of the conditional vector, so that the conditional
+      cross-entropy of all the discrete columns is computed with one `cross_entropy` call.
+
+    Args:
+        output_info_list: The `output_info_list` of a fitted `TabularTransformer`.
+        device: The torch device of the Generator.
+    """
+    def __init__(self, output_info_list, device='cpu'):
+        tanh_columns, softmax_spans, cond_spans = [], [], []
+        st, st_c = 0, 0
+        for column_info in output_info_list:
+            for span_info in column_info:
+                ed = st + int(span_info.dim)
+                if span_info.activation_fn == 'tanh':
+                    tanh_columns.extend(range(st, ed))
+                elif span_info.activation_fn == 'softmax':
+                    softmax_spans.append((st, span_info.dim))
+                    # Only the single-span discrete columns participate in the conditional vector.
+                    if len(column_info) == 1:
+                        cond_spans.append((st, st_c, span_info.dim))
+                        st_c += span_info.dim
+                else:
+                    raise ValueError(f'Unexpected activation function {span_info.activation_fn}.')
+                st = ed
+
+        self.dim = st
+        self.cond_starts = [s for s, _, _ in cond_spans]
+
+        self._tanh_mask = torch.zeros(self.dim, dtype=torch.bool)
+        self._tanh_mask[tanh_columns] = True
+
+        self._softmax_index, self._softmax_valid = self._padded_index([(s, d) for s, d in softmax_spans])
+        self._softmax_columns = self._softmax_index[self._softmax_valid]
+        self._softmax_positions = torch.nonzero(self._softmax_valid.reshape(-1)).reshape(-1)
+
+        self._data_cond_index, self._cond_valid = self._padded_index([(s, d) for s, _, d in cond_spans])
+        self._cond_index, _ = self._padded_index([(s_c, d) for _, s_c, d in cond_spans])
+
+        self.to(device)
+
+    @staticmethod
+    def _padded_index(spans):
+        """Build a `(spans x max width)` matrix with the column indices of each span, and the mask of its valid
+        entries. The padded entries point to the first column of their span."""
+        width = max([d for _, d in spans], default=0)
+        offsets = torch.arange(width)
+        starts = torch.tensor([s for s, _ in spans], dtype=torch.long).reshape(-1, 1)
+        dims = torch.tensor([d for _, d in spans], dtype=torch.long).reshape(-1, 1)
+
+        valid = offsets < dims
+        index = torch.where(valid, starts + offsets, starts)
+        return index, valid
+
+    def to(self, device):
+        """Move the index tensors to `device`."""
+        for attr in ('_tanh_mask', '_softmax_index', '_softmax_valid', '_softmax_columns', '_softmax_positions',
+                     '_data_cond_index', '_cond_valid', '_cond_index'):
+            setattr(self, attr, getattr(self, attr).to(device))
+        return self
+
+    def activate(self, data, tau=0.2, eps=1e-10, generator=None):
+        """Apply tanh to the continuous spans and Gumbel-Softmax to the discrete spans of the Generator's output.
+
+        The Gumbel noise is drawn from a clamped exponential sample, so it is always finite. This removes the need to
+        check the output for NaNs (a device-to-host synchronization) and to repeat the sampling.
+
+        Args:
+            data: The raw output of the Generator. Any columns beyond the spans of the layout are dropped.
+            tau: The Gumbel-Softmax temperature.
+            eps: The lower bound of the exponential sample.
+            generator: The torch `Generator` of the Gumbel noise (the global generator if `None`).
+        """
+        return self.activate_with_noise(data, self.exponential_noise(data, generator), tau, eps)
+
+    def exponential_noise(self, data, generator=None):
+        """Draw the exponential sample of the Gumbel noise of `activate` for a batch of Generator outputs `data`
+        (`None` if the layout has no discrete spans)."""
+        if self._softmax_columns.shape[0] == 0:
+            return None
+
+        shape = (data.shape[0],) + tuple(self._softmax_index.shape)
+        return torch.empty(shape, dtype=data.dtype, device=data.device).exponential_(generator=generator)
+
+    def activate_with_noise(self, data, noise, tau=0.2, eps=1e-10):
+        """The deterministic part of `activate`, given the exponential sample `noise` of `exponential_noise`. It has
+        no random draws and no data-dependent control flow, so `torch.compile` captures it in a single graph."""
+        data = data[:, :self.dim]
+        out = torch.where(self._tanh_mask, torch.tanh(data), data)
+
+        if noise is not None:
+            logits = data.index_select(1, self._softmax_index.reshape(-1)).reshape(-1, *self._softmax_index.shape)
+            gumbels = -noise.clamp_min(eps).log()
+            logits = ((logits + gumbels) / tau).masked_fill(~self._softmax_valid, float('-inf'))
+            y_soft = logits.softmax(dim=-1).reshape(logits.shape[0], -1).index_select(1, self._softmax_positions)
+            out = out.index_copy(1, self._softmax_columns, y_soft)
+
+        return out
+
+    def cond_targets(self, c):
+        """Return the category that the conditional vector `c` selects in each discrete column (batch x columns)."""
+        return c[:, self._cond_index].masked_fill(~self._cond_valid, -1).argmax(dim=-1)
+
+    def cond_cross_entropy(self, data, target):
+        """Compute the cross-entropy of every discrete column of `data` against the categories `target` (the output
+        of `cond_targets`) in one call.
+
+        Returns:
+            A `(batch x discrete columns)` tensor of cross-entropy values.
+        """
+        logits = data[:, self._data_cond_index].masked_fill(~self._cond_valid, float('-inf'))
+        return nn.functional.cross_entropy(logits.transpose(1, 2), target, reduction='none')
@@ -0,0 +1,182 @@
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+
+
+def iter_chunks(sample, n, chunk_size, max_empty_calls=10):
+    """Drive a sampling function and yield its output in chunks of exactly `chunk_size` rows (the last one may be
+    smaller).
+
+    Some models reject part of the rows they generate (e.g. values out of the fitted range), so a call may return fewer
+    rows than requested. The missing rows are requested again and the partial outputs are carried over to the next
+    chunk. Only one chunk is held in memory at any time. If `sample` returns no rows in `max_empty_calls` consecutive
+    calls, the stream stops early with a warning.
+
+    Args:
+        sample: A callable that takes the number of rows to generate and returns a 2D NumPy array.
+        n (int): The total number of rows to generate.
+        chunk_size (int): The number of rows per yielded chunk.
+        max_empty_calls (int): The number of consecutive empty outputs of `sample` after which the stream stops.
+    """
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be a positive integer.")
+
+    remaining = int(n)
+    empty_calls = 0
+    while remaining > 0:
+        target = min(chunk_size, remaining)
+        parts, filled = [], 0
+        while filled < target and empty_calls < max_empty_calls:
+            part = sample(target - filled)
+            if part is None or len(part) == 0:
+                empty_calls += 1
+                continue
+
+            empty_calls = 0
+            part = part[:target - filled]
+            parts.append(part)
+            filled += len(part)
+
+        if filled > 0:
+            yield parts[0] if len(parts) == 1 else np.concatenate(parts, axis=0)
+            remaining -= filled
+
+        if filled < target:
+            warnings.warn("The sampler returned no rows in %d consecutive calls; the stream ended with %d of the %d "
+                          "requested rows." % (max_empty_calls, int(n) - remaining, int(n)))
+            return
+
+
+def write_chunks(chunks, path, file_format=None, columns=None):
+    """Write a stream of chunks to disk without materializing the whole dataset.
+
+    * `csv`: all the chunks are appended to the single file `path`.
+    * `parquet`/`npy`: each chunk is stored in its own shard `path/part-00000.<ext>`, `path/part-00001.<ext>`, ...
+      Parquet requires `pyarrow` (or `fastparquet`) to be installed.
+
+    Args:
+        chunks: An iterable of 2D NumPy arrays (e.g. the output of a `sample_iter` call).
+        path (str): The output file (CSV) or directory (Parquet/npy shards).
+        file_format (str): One of 'csv', 'parquet', 'npy'. If `None`, it is inferred from the extension of `path`.
+        columns: Optional column names for the CSV/Parquet outputs.
+
+    Returns:
+        The list of the written files.
+    """
+    if file_format is None:
+        file_format = os.path.splitext(path)[1].lstrip('.').lower() or 'npy'
+
+    if file_format not in ('csv', 'parquet', 'npy'):
+        raise ValueError("Unsupported file format: " + str(file_format))
+
+    files = []
+    if file_format == 'csv':
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        first = True
+        for chunk in chunks:
+            header = first and columns is not None
+            pd.DataFrame(chunk, columns=columns).to_csv(path, mode='w' if first else 'a', header=header, index=False)
+            first = False
+        files.append(path)
+    else:
+        os.makedirs(path, exist_ok=True)
+        for i, chunk in enumerate(chunks):
+            shard = os.path.join(path, 'part-%05d.%s' % (i, file_format))
+            if file_format == 'npy':
+                np.save(shard, np.asarray(chunk))
+            else:
+                frame = pd.DataFrame(chunk, columns=columns)
+                frame.columns = frame.columns.astype(str)
+                frame.to_parquet(shard, index=False)
+            files.append(shard)
+
+    return files
+
+
+class ConcatenatedArray(object):
+    """A read-only, lazily concatenated view of several arrays along their first axis.
+
+    `fit_resample` outputs are the real data followed by the generated data. Keeping them as separate blocks avoids
+    copying the (possibly large) real data into a new array. Rows are gathered from the blocks on indexing, and the
+    whole array is only materialized when NumPy requests it (e.g. `np.asarray(view)`).
+
+    Args:
+        blocks: A list of NumPy arrays with identical trailing dimensions.
+    """
+    def __init__(self, blocks):
+        self._blocks = [b for b in blocks if b is not None and len(b) > 0]
+        lengths = [len(b) for b in self._blocks]
+        self._offsets = np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+
+        if len(self._blocks) > 0:
+            self.dtype = np.result_type(*self._blocks)
+            self.shape = (int(self._offsets[-1]),) + self._blocks[0].shape[1:]
+        else:
+            self.dtype = np.dtype(float)
+            self.shape = (0,)
+
+        self.ndim = len(self.shape)
+
+    def __len__(self):
+        return self.shape[0]
+
+    @property
+    def blocks(self):
+        return self._blocks
+
+    def _take(self, rows):
+        """Gather the rows with the (non-negative) global indices `rows`."""
+        out = np.empty((len(rows),) + self.shape[1:], dtype=self.dtype)
+        block_ids = np.searchsorted(self._offsets, rows, side='right') - 1
+        for b in np.unique(block_ids):
+            sel = block_ids == b
+            out[sel] = self._blocks[b][rows[sel] - self._offsets[b]]
+        return out
+
+    def __getitem__(self, key):
+        cols = None
+        if isinstance(key, tuple):
+            key, cols = key[0], key[1:]
+
+        if isinstance(key, (int, np.integer)):
+            if key < 0:
+                key += len(self)
+            if not 0 <= key < len(self):
+                raise IndexError("Index out of range.")
+            b = int(np.searchsorted(self._offsets, key, side='right')) - 1
+            row = self._blocks[b][key - self._offsets[b]]
+            return row[cols] if cols else row
+
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                rows = np.arange(start, stop, step)
+            else:
+                parts = []
+                for b, block in enumerate(self._blocks):
+                    st, ed = max(start, self._offsets[b]), min(stop, self._offsets[b + 1])
+                    if st < ed:
+                        parts.append(block[st - self._offsets[b]:ed - self._offsets[b]])
+                out = np.concatenate(parts, axis=0) if parts else np.empty((0,) + self.shape[1:], dtype=self.dtype)
+                return out[(slice(None),) + cols] if cols else out
+        else:
+            rows = np.asarray(key)
+            if rows.dtype == bool:
+                rows = np.flatnonzero(rows)
+            rows = np.where(rows < 0, rows + len(self), rows)
+
+        out = self._take(rows.astype(np.int64))
+        return out[(slice(None),) + cols] if cols else out
+
+    def __array__(self, dtype=None, copy=None):
+        if len(self._blocks) == 0:
+            return np.empty(self.shape, dtype=dtype or self.dtype)
+        out = np.concatenate(self._blocks, axis=0)
+        return out if dtype is None else out.astype(dtype, copy=False)
+
+    def iter_chunks(self, chunk_size):
+        """Iterate over the rows of the view in consecutive chunks of `chunk_size` rows."""
+        for st in range(0, len(self), chunk_size):
+            yield self[st:st + chunk_size]
@@ -15,10 +15,12 @@ from tqdm import tqdm
 
 from sklearn.neighbors import KDTree
 
-from DeepCoreML.TabularTransformer import TabularTransformer
-from DeepCoreML.generators.gan_discriminators import PackedDiscriminator
-from DeepCoreML.generators.gan_generators import Generator
-from DeepCoreML.generators.GAN_Synthesizer import GANSynthesizer
+from artsyn.TabularTransformer import TabularTransformer
+from artsyn.Tools import seeded_training, init_weights
+from artsyn.instrumentation import count, instrumented, span
+from artsyn.generators.gan_discriminators import PackedDiscriminator
+from artsyn.generators.gan_generators import Generator
+from artsyn.generators.GAN_Synthesizer import GANSynthesizer
 
 
 class sbGAN(GANSynthesizer):
@@ -33,9 +35,11 @@ class sbGAN(GANSynthesizer):
     uses a Packed Discriminator to prevent the model from mode collapsing.
     """
 
+    _batched_sampling = True
+
     def __init__(self, embedding_dim=128, discriminator=(128, 128), generator=(256, 256), epochs=300, batch_size=32,
                  pac=10, lr=2e-4, decay=1e-6, g_activation='tanh', sampling_strategy='auto', method='knn', k=5, r=10,
-                 random_state=0):
+                 random_state=0, quantize=None, metrics=None, metrics_every=100, amp=None, compile=False):
         """
         Initializes a Safe-Borderline Conditional GAN.
 
@@ -56,15 +60,27 @@ class sbGAN(GANSynthesizer):
             r: The radius of the hypersphere that includes the neighboring samples; applied when `method='rad'`.
             sampling_strategy: How the model generates data.
             random_state (int): Seed the random number generators. Use the same value for reproducible results.
+            quantize (string): Reduced precision for the Generator during sampling: 'int8' (dynamic quantization,
+                CPU only) or 'bf16' (bfloat16 autocast). `None` samples in float32.
+            metrics: The receivers of the per-step training metrics `loss_d` and `loss_g`: the path of a `.jsonl` or
+                `.parquet` file, a `training_metrics.MetricsCallback`, a function `hook(step, metrics)`, or a list of
+                them. `None` disables the metrics.
+            metrics_every (int): The number of training steps that are buffered between two flushes of the metrics.
+            amp (string): Mixed precision training: 'bf16' runs the forward passes of the Generator and the
+                Discriminator under bfloat16 autocast; the losses stay in float32. `None` trains in float32.
+            compile (bool): Compile the Generator and the Discriminator with `torch.compile` during training, with a
+                fallback to eager mode. The compilation time is stored in `compile_time_`.
         """
         super().__init__("SB-GAN", embedding_dim, discriminator, generator, pac, epochs, batch_size,
-                         lr, lr, decay, decay, sampling_strategy, random_state)
+                         lr, lr, decay, decay, sampling_strategy, random_state, quantize, metrics, metrics_every,
+                         amp, compile)
 
         self.gen_activation_ = g_activation
         self._method = method
         self._n_neighbors = k
         self._radius = r
 
+    @instrumented('gan.prepare')
     def select_prepare(self, x_train, y_train):
         """
         Refine the training set with sample filtering. It invokes `prepare` to return the preprocessed data.
@@ -167,13 +183,13 @@ class sbGAN(GANSynthesizer):
         # 1. Randomly take samples from a normal distribution
         # 2. Assign one-hot-encoded random classes
         # 3. Pass the fake data (samples + classes) to the Generator
-        latent_x = torch.randn((num_samples, self.embedding_dim_))
-        latent_classes = torch.from_numpy(np.random.randint(0, self._n_classes, num_samples)).to(torch.int64)
+        latent_x = torch.randn((num_samples, self.embedding_dim_), generator=self._torch_rng, device=self._device)
+        latent_classes = torch.from_numpy(self._rng.integers(0, self._n_classes, num_samples)).to(torch.int64)
         latent_y = nn.functional.one_hot(latent_classes, num_classes=self._n_classes)
-        latent_data = torch.cat((latent_x, latent_y), dim=1)
+        latent_data = torch.cat((latent_x, latent_y.to(self._device)), dim=1)
 
         # 4. The Generator produces fake samples (their labels are 0)
-        fake_x = self.G_(latent_data.to(self._device))
+        fake_x = self._forward(self.G_, latent_data.to(self._device))
         fake_labels = torch.zeros((num_samples // self.pac_, 1))
 
         # 5. The real samples (coming from the dataset) with their one-hot-encoded classes are assigned labels eq. to 1.
@@ -189,7 +205,7 @@ class sbGAN(GANSynthesizer):
 
         # 7. Pass the mixed data to the Discriminator and train the Discriminator (update its weights with backprop).
         # The loss function quantifies the Discriminator's ability to classify a real/fake sample as real/fake.
-        d_predictions = self.D_(all_data)
+        d_predictions = self._forward(self.D_, all_data)
         disc_loss = loss_function(d_predictions, all_labels)
         disc_loss.backward()
         self.D_optimizer_.step()
@@ -197,16 +213,16 @@ class sbGAN(GANSynthesizer):
         # GENERATOR TRAINING
         self.G_optimizer_.zero_grad()
 
-        latent_x = torch.randn((num_samples, self.embedding_dim_))
-        latent_classes = torch.from_numpy(np.random.randint(0, self._n_classes, num_samples)).to(torch.int64)
+        latent_x = torch.randn((num_samples, self.embedding_dim_), generator=self._torch_rng, device=self._device)
+        latent_classes = torch.from_numpy(self._rng.integers(0, self._n_classes, num_samples)).to(torch.int64)
         latent_y = nn.functional.one_hot(latent_classes, num_classes=self._n_classes)
-        latent_data = torch.cat((latent_x, latent_y), dim=1)
+        latent_data = torch.cat((latent_x, latent_y.to(self._device)), dim=1)
 
-        fake_x = self.G_(latent_data.to(self._device))
+        fake_x = self._forward(self.G_, latent_data.to(self._device))
 
         all_data = torch.cat((fake_x, latent_y.to(self._device)), dim=1)
 
-        d_predictions = self.D_(all_data)
+        d_predictions = self._forward(self.D_, all_data)
 
         gen_loss = loss_function(d_predictions, real_labels.to(self._device))
         gen_loss.backward()
@@ -214,6 +230,8 @@ class sbGAN(GANSynthesizer):
 
         return disc_loss, gen_loss
 
+    @instrumented('gan.fit')
+    @seeded_training
     def train(self, x_train, y_train):
         """
         Conventional training process of a Packed sbGAN. The Generator and the Discriminator are trained
@@ -235,12 +253,15 @@ class sbGAN(GANSynthesizer):
         # select_prepare: implemented in GAN_Synthesizer.py
         training_data = self.select_prepare(x_train, y_train)
 
-        train_dataloader = DataLoader(training_data, batch_size=batch_size, shuffle=True)
+        train_dataloader = DataLoader(training_data, batch_size=batch_size, shuffle=True,
+                                      generator=self._loader_generator())
 
         self.D_ = PackedDiscriminator(self.D_Arch_, input_dim=self._input_dim + self._n_classes,
-                                      pac=self.pac_).to(self._device)
+                                      pac=self.pac_, generator=self._torch_rng).to(self._device)
         self.G_ = Generator(self.G_Arch_, input_dim=self.embedding_dim_ + self._n_classes, output_dim=self._input_dim,
                             activation=self.gen_activation_, normalize=self.batch_norm_).to(self._device)
+        init_weights(self.D_, self._torch_rng)
+        init_weights(self.G_, self._torch_rng)
 
         self.D_optimizer_ = torch.optim.Adam(self.D_.parameters(),
                                              lr=self._disc_lr, weight_decay=self._disc_decay, betas=(0.5, 0.9))
@@ -248,13 +269,22 @@ class sbGAN(GANSynthesizer):
                                              lr=self._gen_lr, weight_decay=self._gen_decay, betas=(0.5, 0.9))
 
         disc_loss, gen_loss = 0, 0
-        for _ in tqdm(range(self._epochs), desc="SB-GAN Training     "):
-            for real_data in train_dataloader:
-                if real_data.shape[0] > 1:
-                    disc_loss, gen_loss = self.train_batch(real_data)
-
-                # if epoch % 10 == 0 and n >= x_train.shape[0] // batch_size:
-                #    print(f"Epoch: {epoch} Loss D.: {disc_loss} Loss G.: {gen_loss}")
+        metrics = self._training_metrics()
+        self._compile_training(self.G_, self.D_)
+        step = 0
+        with span('gan.training'):
+            for epoch in tqdm(range(self._epochs), desc="SB-GAN Training     "):
+                for real_data in train_dataloader:
+                    if real_data.shape[0] > 1:
+                        disc_loss, gen_loss = self.train_batch(real_data)
+                        step += 1
+                        metrics.record(step, epoch + 1, loss_d=disc_loss, loss_g=gen_loss)
+
+                    # if epoch % 10 == 0 and n >= x_train.shape[0] // batch_size:
+                    #    print(f"Epoch: {epoch} Loss D.: {disc_loss} Loss G.: {gen_loss}")
+            count('steps', step)
+        metrics.close()
+        self._release_compiled()
 
         return disc_loss, gen_loss
 
@@ -269,6 +299,7 @@ class sbGAN(GANSynthesizer):
         self.train(x_train, y_train)
 
     # Use GAN's Generator to create artificial samples i) either from a specific class, ii) or from a random class.
+    @instrumented('gan.sampling')
     def sample(self, num_samples, y=None):
         """ Create artificial samples using the sbGAN's Generator.
 
@@ -280,25 +311,19 @@ class sbGAN(GANSynthesizer):
             Artificial data instances created by the Generator.
         """
         if y is None:
-            latent_classes = torch.from_numpy(np.random.randint(0, self._n_classes, num_samples)).to(torch.int64)
-            latent_y = nn.functional.one_hot(latent_classes, num_classes=self._n_classes)
+            latent_classes = self._rng.integers(0, self._n_classes, num_samples)
         else:
-            # print("requested class:", y, "Num samples:", num_samples, "Num classes:", self._n_classes)
-            latent_y = nn.functional.one_hot(torch.full(size=(num_samples,), fill_value=y), num_classes=self._n_classes)
-
-        latent_x = torch.randn((num_samples, self.embedding_dim_))
-
-        # concatenate, copy to device, and pass to generator
-        latent_data = torch.cat((latent_x, latent_y), dim=1).to(self._device)
+            latent_classes = np.full(num_samples, y)
 
         # Generate data from the model's Generator - The feature values of the generated samples fall into the range:
         # [-1,1]: if the activation function of the output layer of the Generator is nn.Tanh().
         # [0,1]: if the activation function of the output layer of the Generator is nn.Sigmoid().
-
-        generated_samples = self.G_(latent_data).cpu().detach().numpy()
+        with self.generation_mode():
+            generated_samples = self.G_(self._class_latent(latent_classes)).cpu().numpy()
         # print("Generated Samples:\n", generated_samples)
 
         reconstructed_samples = self._transformer.inverse_transform(generated_samples)
+        count('rows', num_samples)
         # print("Reconstructed samples\n", reconstructed_samples)
         return reconstructed_samples
 
@@ -324,64 +349,10 @@ class sbGAN(GANSynthesizer):
         # Train the GAN with the input data
         self.train(x_train, y_train)
 
-        x_resampled = np.copy(x_train)
-        y_resampled = np.copy(y_train)
-
-        # auto mode: Use sbGAN to equalize the number of samples per class. This is achieved by generating samples
-        # of the minority classes (i.e. we perform oversampling).
+        # Generate the samples of all the classes of the sampling plan with batched Generator passes.
+        plan, keep_real = self._sampling_plan(y_train)
         if self._sampling_strategy == 'auto':
-            majority_class = np.array(self._gen_samples_ratio).argmax()
-            num_majority_samples = np.max(np.array(self._gen_samples_ratio))
-
-            # Perform oversampling
-            for cls in tqdm(range(self._n_classes), desc="SB-GAN Sampling     "):
-                if cls != majority_class:
-                    samples_to_generate = num_majority_samples - self._gen_samples_ratio[cls]
-
-                    if samples_to_generate > 1:
-                        # Generate the appropriate number of samples to equalize cls with the majority class.
-                        # print("\tSampling Class y:", cls, " Gen Samples ratio:", gen_samples_ratio[cls])
-                        generated_samples = self.sample(samples_to_generate, cls)
-                        generated_classes = np.full(samples_to_generate, cls)
-
-                        x_resampled = np.vstack((x_resampled, generated_samples))
-                        y_resampled = np.hstack((y_resampled, generated_classes))
-
-        # dictionary mode: the keys correspond to the targeted classes. The values correspond to the desired number of
-        # samples for each targeted class.
-        elif isinstance(self._sampling_strategy, dict):
-            for cls in tqdm(self._sampling_strategy, desc="SB-GAN Sampling     "):
-                # In imblearn sampling strategy stores the class distribution of the output dataset. So we have to
-                # create the half number of samples, and we divide by 2.
-                samples_to_generate = int(self._sampling_strategy[cls] / 2)
-
-                # Generate the appropriate number of samples to equalize cls with the majority class.
-                # print("\tSampling Class y:", cls, " Gen Samples ratio:", gen_samples_ratio[cls])
-                generated_samples = self.sample(samples_to_generate, cls)
-                generated_classes = np.full(samples_to_generate, cls)
-
-                x_resampled = np.vstack((x_resampled, generated_samples))
-                y_resampled = np.hstack((y_resampled, generated_classes))
-
-        elif self._sampling_strategy == 'create-new':
-            x_resampled = None
-            y_resampled = None
-
-            s = 0
-            for cls in tqdm(range(self._n_classes), desc="SB-GAN Sampling     "):
-                # Generate as many samples, as the corresponding class cls
-                samples_to_generate = int(self._gen_samples_ratio[cls])
-                generated_samples = self.sample(num_samples=samples_to_generate, y=cls)
-
-                if generated_samples is not None and generated_samples.shape[0] > 0:
-                    # print("\t\tCreated", generated_samples.shape[0], "samples")
-                    generated_classes = np.full(generated_samples.shape[0], cls)
-
-                    if s == 0:
-                        x_resampled = generated_samples
-                        y_resampled = generated_classes
-                        s = 1
-                    else:
-                        x_resampled = np.vstack((x_resampled, generated_samples))
-                        y_resampled = np.hstack((y_resampled, generated_classes))
-        return x_resampled, y_resampled
+            # sbGAN does not oversample the classes that lack a single sample.
+            plan = {cls: n for cls, n in plan.items() if n > 1}
+
+        return self._resample(x_train, y_train, plan, keep_real)
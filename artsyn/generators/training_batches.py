@@ -0,0 +1,141 @@
+# Device-resident training batches of ctGAN and ctdGAN.
+#
+# `TrainingBatches` reads the transformed training data from a torch tensor on the device of the model and draws the
+# conditional vectors and the real rows of each training step with torch operations and the torch generator of the
+# model. All the batch tensors (latent vectors, conditional vectors, masks, real rows) are allocated once and are
+# refilled in place at every step, so the training steps do not allocate new batches or copy data from the host.
+#
+# The data tensor is built once by `training_tensor`, before the data-parallel ranks are started; in shared memory, so
+# that all the ranks read the same copy.
+
+import numpy as np
+import torch
+
+
+def training_tensor(data, device, shared=False):
+    """The transformed training data `data` as one float32 tensor on `device`. With `shared`, the tensor is moved to
+    shared memory, so that the data-parallel ranks (forked processes) read it instead of copying it."""
+    tensor = torch.as_tensor(data, dtype=torch.float32).to(device)
+    return tensor.share_memory_() if shared else tensor
+
+
+class TrainingBatches(object):
+    """The training batches of a conditional tabular GAN.
+
+    The conditional vectors are drawn like the ones of `DataSampler.sample_condvec` (a discrete column uniformly at
+    random, then one of its categories according to its (log-)frequency) and the real rows like the ones of
+    `DataSampler.sample_data` (uniformly among the rows of the drawn category).
+
+    Args:
+        sampler: The `DataSampler` (ctGAN) or `ctdDataSampler` (ctdGAN) of the transformed training data.
+        data: The transformed training data (the rows of `sampler`) as a float32 tensor on `device` (see
+            `training_tensor`). It is read only.
+        batch_size (int): The number of samples per batch.
+        embedding_dim (int): The dimensionality of the noise part of the latent vectors.
+        device: The torch device of the model.
+        generator: The torch `Generator` of the draws (on `device`).
+
+    Attributes:
+        latent: The Generator input, `batch_size x (embedding_dim + categories)`: the noise and the conditional vector.
+        cond: The conditional vectors (a view of the last columns of `latent`), or `None` without discrete columns.
+        mask: One-hot vectors of the discrete column of each conditional vector, or `None` without discrete columns.
+        real: The real rows, `batch_size x (data dimensions + categories)`: the transformed rows and the conditional
+            vectors of their categories.
+    """
+    def __init__(self, sampler, data, batch_size, embedding_dim, device, generator):
+        self._generator = generator
+        self._embedding_dim = embedding_dim
+        self._n_categories = sampler.dim_cond_vec()
+
+        self._data = data
+        data_dim = self._data.shape[1]
+
+        self.latent = torch.empty(batch_size, embedding_dim + self._n_categories, device=device)
+        self.real = torch.empty(batch_size, data_dim + self._n_categories, device=device)
+        self._row_index = torch.empty(batch_size, dtype=torch.long, device=device)
+
+        if self._n_categories == 0:
+            self.cond, self.mask = None, None
+            return
+
+        n_columns = sampler._n_discrete_columns
+        self.cond = self.latent[:, embedding_dim:]
+        self.mask = torch.empty(batch_size, n_columns, device=device)
+        self._real_rows = torch.empty(batch_size, data_dim, device=device)
+        self._real_cond = self.real[:, data_dim:]
+
+        # The cumulative category probabilities of each discrete column. The last category of each column is set to
+        # infinity, so that the search of a uniform draw always returns a valid category.
+        cum_prob = torch.as_tensor(sampler._discrete_column_category_prob).cumsum(dim=1)
+        for c, n_category in enumerate(sampler._discrete_column_n_category):
+            cum_prob[c, n_category - 1:] = float('inf')
+        self._cum_prob = cum_prob.to(device)
+        self._cond_st = torch.as_tensor(sampler._discrete_column_cond_st, dtype=torch.long).to(device)
+
+        # The rows of each category (in the order of the conditional vector), concatenated.
+        rows = [r for rid_by_cat in sampler._rid_by_cat_cols for r in rid_by_cat]
+        counts = torch.tensor([len(r) for r in rows], dtype=torch.float64)
+        self._rows_by_category = torch.as_tensor(np.concatenate(rows), dtype=torch.long).to(device)
+        self._category_offset = (counts.cumsum(dim=0) - counts).long().to(device)
+        self._category_count = counts.to(device)
+
+        self._column = torch.empty(batch_size, dtype=torch.long, device=device)
+        self._column_st = torch.empty(batch_size, dtype=torch.long, device=device)
+        self._cum_rows = torch.empty(batch_size, cum_prob.shape[1], dtype=cum_prob.dtype, device=device)
+        self._uniform = torch.empty(batch_size, 1, dtype=cum_prob.dtype, device=device)
+        self._category = torch.empty(batch_size, 1, dtype=torch.long, device=device)
+
+        self._perm = torch.empty(batch_size, dtype=torch.long, device=device)
+        self._category_real = torch.empty(batch_size, dtype=torch.long, device=device)
+        self._row_draw = torch.empty(batch_size, dtype=torch.float64, device=device)
+        self._row_count = torch.empty(batch_size, dtype=torch.float64, device=device)
+        self._row_slot = torch.empty(batch_size, dtype=torch.long, device=device)
+
+    def sample_latent(self):
+        """Draw new noise and new conditional vectors into `latent` (and `mask`).
+
+        Returns:
+            The latent vectors, the conditional vectors and the masks (`None` without discrete columns).
+        """
+        self.latent[:, :self._embedding_dim].normal_(generator=self._generator)
+        if self.cond is None:
+            return self.latent, None, None
+
+        batch_size = self._column.shape[0]
+        torch.randint(self._cum_prob.shape[0], (batch_size,), generator=self._generator, out=self._column)
+        torch.index_select(self._cum_prob, 0, self._column, out=self._cum_rows)
+        self._uniform.uniform_(generator=self._generator)
+        torch.searchsorted(self._cum_rows, self._uniform, right=True, out=self._category)
+
+        torch.index_select(self._cond_st, 0, self._column, out=self._column_st)
+        self._category.add_(self._column_st.unsqueeze(1))
+        self.cond.zero_().scatter_(1, self._category, 1.0)
+        self.mask.zero_().scatter_(1, self._column.unsqueeze(1), 1.0)
+        return self.latent, self.cond, self.mask
+
+    def sample_real(self):
+        """Draw real rows into `real`. With discrete columns, the rows match the conditional vectors of the last
+        `sample_latent` call in a random order, and each row is followed by the conditional vector of its category.
+
+        Returns:
+            The real rows.
+        """
+        batch_size = self._row_index.shape[0]
+        if self.cond is None:
+            torch.randint(self._data.shape[0], (batch_size,), generator=self._generator, out=self._row_index)
+            return torch.index_select(self._data, 0, self._row_index, out=self.real)
+
+        torch.randperm(batch_size, generator=self._generator, out=self._perm)
+        torch.index_select(self._category.view(-1), 0, self._perm, out=self._category_real)
+
+        # A uniform row of each category: the row at position offset + floor(u * count) of `_rows_by_category`.
+        torch.index_select(self._category_count, 0, self._category_real, out=self._row_count)
+        self._row_draw.uniform_(generator=self._generator).mul_(self._row_count).floor_()
+        torch.index_select(self._category_offset, 0, self._category_real, out=self._row_slot)
+        self._row_slot.add_(self._row_index.copy_(self._row_draw))
+        torch.index_select(self._rows_by_category, 0, self._row_slot, out=self._row_index)
+
+        torch.index_select(self._data, 0, self._row_index, out=self._real_rows)
+        self.real[:, :self._real_rows.shape[1]].copy_(self._real_rows)
+        self._real_cond.zero_().scatter_(1, self._category_real.unsqueeze(1), 1.0)
+        return self.real
@@ -0,0 +1,248 @@
+# Training telemetry of the GAN synthesizers.
+#
+# The training loops record the scalars of each step (Critic and Generator losses, penalty, model-specific diagnostics)
+# into a `TrainingMetrics` buffer. The recorded values are detached tensors that stay on the device of the model, so
+# recording a step does not synchronize with the device. Every `flush_every` steps the buffered steps are stacked into
+# one tensor, and a background thread copies it to the host and hands the records to the callbacks, while training
+# continues.
+#
+# A callback is a `MetricsCallback` (e.g. `JsonlSink`, `ParquetSink`) or a plain function `hook(step, metrics)`.
+# `plot_metrics` plots a stored metrics file offline.
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import torch
+
+
+class MetricsCallback(object):
+    """The interface of the receivers of the training metrics.
+
+    `on_flush` receives a list of records, one per training step, in step order. Each record is a dictionary with the
+    keys `step`, `epoch` and the names of the recorded metrics. `close` is called once, at the end of training.
+    """
+    def on_flush(self, records):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class HookCallback(MetricsCallback):
+    """Adapts a function `hook(step, metrics)` to the callback interface. It is called once per recorded step."""
+    def __init__(self, hook):
+        self._hook = hook
+
+    def on_flush(self, records):
+        for record in records:
+            metrics = {k: v for k, v in record.items() if k not in ('step', 'epoch')}
+            self._hook(record['step'], metrics)
+
+
+class JsonlSink(MetricsCallback):
+    """Appends the records to a JSON Lines file, one JSON object per training step.
+
+    Args:
+        path (str): The output file. Its directory is created if it does not exist; an existing file is overwritten.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def on_flush(self, records):
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._file = open(self.path, 'w')
+
+        self._file.write(''.join(json.dumps(record) + '\n' for record in records))
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class ParquetSink(MetricsCallback):
+    """Writes the records to a Parquet file, one row group per flush. Requires `pyarrow`.
+
+    Args:
+        path (str): The output file. Its directory is created if it does not exist; an existing file is overwritten.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._writer = None
+
+    def on_flush(self, records):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pylist(records)
+        if self._writer is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._writer = pq.ParquetWriter(self.path, table.schema)
+        else:
+            table = table.cast(self._writer.schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+def make_callbacks(metrics):
+    """Build the list of callbacks from the `metrics` argument of a synthesizer: `None`, the path of a `.jsonl` or
+    `.parquet` file, a `MetricsCallback`, a function `hook(step, metrics)`, or a list of them."""
+    if metrics is None:
+        return []
+
+    if isinstance(metrics, (list, tuple)):
+        return [callback for m in metrics for callback in make_callbacks(m)]
+
+    if isinstance(metrics, str):
+        extension = os.path.splitext(metrics)[1].lower()
+        if extension == '.jsonl':
+            return [JsonlSink(metrics)]
+        if extension == '.parquet':
+            return [ParquetSink(metrics)]
+        raise ValueError("Unsupported metrics file " + metrics + ". Use a .jsonl or .parquet file.")
+
+    if isinstance(metrics, MetricsCallback):
+        return [metrics]
+
+    if callable(metrics):
+        return [HookCallback(metrics)]
+
+    raise ValueError("Unsupported metrics argument: " + str(metrics))
+
+
+class TrainingMetrics(object):
+    """The buffer of the per-step training metrics of a training run.
+
+    Args:
+        callbacks: The `MetricsCallback` objects that receive the records.
+        flush_every (int): The number of steps between two flushes.
+        device: The device of the recorded tensors.
+    """
+    def __init__(self, callbacks, flush_every=100, device='cpu'):
+        if flush_every < 1:
+            raise ValueError("metrics_every must be a positive integer, not " + str(flush_every))
+
+        self._callbacks = list(callbacks)
+        self._flush_every = flush_every
+        self._device = device
+
+        self._names = None
+        self._steps = []
+        self._values = []
+        self._pending = None
+        self._executor = ThreadPoolExecutor(max_workers=1) if self._callbacks else None
+
+    @property
+    def enabled(self):
+        """Whether there is any callback; if not, `record` does nothing and the callers may skip computing metrics."""
+        return self._executor is not None
+
+    def record(self, step, epoch, **values):
+        """Buffer the metrics of a step. The values may be tensors (kept on their device) or numbers; `None` values
+        are recorded as NaN."""
+        if self._executor is None:
+            return
+
+        names = tuple(values)
+        if names != self._names:
+            self.flush()
+            self._names = names
+
+        row = [torch.full((), float('nan') if v is None else v, device=self._device) if not torch.is_tensor(v)
+               else v.detach().reshape(()).float() for v in values.values()]
+        self._steps.append((step, epoch))
+        self._values.append(torch.stack(row))
+
+        if len(self._steps) >= self._flush_every:
+            self.flush()
+
+    def flush(self):
+        """Stack the buffered steps and pass them to the callbacks in the background thread."""
+        if self._executor is None or not self._steps:
+            return
+
+        # One flush at a time: the callbacks receive the records in step order.
+        if self._pending is not None:
+            self._pending.result()
+
+        values = torch.stack(self._values)
+        self._pending = self._executor.submit(self._deliver, self._names, self._steps, values)
+        self._steps, self._values = [], []
+
+    def _deliver(self, names, steps, values):
+        values = values.cpu().tolist()
+        records = []
+        for (step, epoch), row in zip(steps, values):
+            record = {'step': step, 'epoch': epoch}
+            record.update(zip(names, row))
+            records.append(record)
+
+        for callback in self._callbacks:
+            callback.on_flush(records)
+
+    def close(self):
+        """Flush the remaining steps, wait for the background thread and close the callbacks."""
+        if self._executor is None:
+            return
+
+        try:
+            self.flush()
+            if self._pending is not None:
+                self._pending.result()
+        finally:
+            self._executor.shutdown()
+            self._executor = None
+            for callback in self._callbacks:
+                callback.close()
+
+
+def read_metrics(path):
+    """Load a metrics file written by `JsonlSink` or `ParquetSink` into a `pd.DataFrame`."""
+    if path.lower().endswith('.parquet'):
+        return pd.read_parquet(path)
+    return pd.read_json(path, lines=True)
+
+
+def plot_metrics(path, output=None, metrics=('loss_d', 'loss_g'), title=None):
+    """Plot the per-epoch means of training metrics that were stored by a `JsonlSink` or a `ParquetSink`. This is an
+    offline tool; it does not run during training.
+
+    Args:
+        path (str): The metrics file.
+        output (str): The file of the figure (e.g. `losses.pdf`). If `None`, the figure is only returned.
+        metrics: The columns to plot.
+        title (str): The title of the plot. By default, the name of the metrics file.
+
+    Returns:
+        The `matplotlib` figure and the per-epoch means (`pd.DataFrame`).
+    """
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    custom_params = {'axes.facecolor': '#f0f0f0', 'axes.edgecolor': 'black', 'grid.color': '#ffffff',
+                     'legend.labelspacing': 0.5, 'legend.fontsize': 15.0,
+                     'axes.spines.right': False, 'axes.spines.top': False}
+    sns.set_theme(rc=custom_params, font_scale=1.6)
+
+    df = read_metrics(path)
+    df_mean = df.groupby('epoch')[list(metrics)].mean().reset_index()
+
+    colors = ['#0072b0', '#ffa868', '#5c9e3a', '#b3345e']
+    plot = df_mean.plot(x='epoch', y=list(metrics), kind='line', color=colors[:len(metrics)], xlabel='Epoch',
+                        ylabel='Value', title=os.path.basename(path) if title is None else title)
+
+    fig = plot.get_figure()
+    if output is not None:
+        fig.savefig(output, format=os.path.splitext(output)[1].lstrip('.') or 'pdf', bbox_inches='tight')
+    plt.close(fig)
+
+    return fig, df_mean
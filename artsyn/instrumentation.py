@@ -0,0 +1,194 @@
+# Lightweight instrumentation of the synthesizer lifecycle: named spans (timed phases) and counters.
+#
+# The code of the models is divided into phases, e.g. 'transformer.fit', 'clusterer.perform_clustering',
+# 'gan.classifier_pretraining', 'gan.training', 'gan.sampling', 'transformer.inverse_transform'. A span that starts
+# inside another one is recorded under its path, e.g. 'gan.sampling/transformer.inverse_transform', and its time is
+# included in the time of its parent. Counters record the events of the current phase, e.g. the training steps, or
+# the generated and the rejected samples.
+#
+# Instrumentation is off by default; then `span` returns a shared no-op context manager and `count` returns at once.
+# It is enabled for a block of code with `recording`:
+#
+#   with recording() as recorder:
+#       model.fit_resample(x, y)
+#   recorder.breakdown()        # {'gan.training': 10.2, 'gan.training/steps': 300, ...}
+#
+# A profiler can be attached to any phase: with `recording(profile={'gan.training': 'torch'})`, every span named
+# 'gan.training' (or whose path is 'gan.training') runs under `torch.profiler`; 'cprofile' runs it under `cProfile`.
+# The profiles are kept in `recorder.profiles_` and, if `profile_dir` is given, written there (`.prof` files for
+# cProfile, Chrome traces for torch).
+#
+# The recorder is process-wide and is meant to be used from one thread; the workers of `run_parallel` are recorded
+# as the span that encloses the parallel call.
+
+import cProfile
+import contextlib
+import functools
+import os
+import time
+from collections import defaultdict
+
+# The recorder of the innermost `recording` context (`None` when instrumentation is off).
+_recorder = None
+
+
+class _NullSpan(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span(object):
+    def __init__(self, recorder, name):
+        self._recorder = recorder
+        self._name = name
+        self._path = None
+        self._profiler = None
+        self._start = 0.0
+
+    def __enter__(self):
+        recorder = self._recorder
+        self._path = self._name if not recorder.stack_ else recorder.stack_[-1] + '/' + self._name
+        recorder.stack_.append(self._path)
+
+        kind = recorder.profile.get(self._path, recorder.profile.get(self._name))
+        if kind is not None:
+            self._profiler = recorder.start_profiler(kind)
+
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self._start
+        recorder = self._recorder
+        if self._profiler is not None:
+            recorder.stop_profiler(self._path, self._profiler)
+
+        recorder.stack_.pop()
+        recorder.times_[self._path] += elapsed
+        recorder.calls_[self._path] += 1
+        return False
+
+
+class Recorder(object):
+    """The spans and counters of a `recording` context.
+
+    Args:
+        profile: A dictionary that maps span names (or paths) to the profiler to attach: 'torch' or 'cprofile'.
+        profile_dir: If given, the directory where each profile is written when its span ends.
+
+    Attributes:
+        times_: The total time (in seconds) of each span path.
+        calls_: The number of times that each span path was entered.
+        counts_: The value of each counter, under '<span path>/<counter name>'.
+        profiles_: The `cProfile.Profile` or `torch.profiler.profile` objects of each profiled span path.
+    """
+    def __init__(self, profile=None, profile_dir=None):
+        self.profile = dict(profile or {})
+        self._profile_dir = profile_dir
+
+        for kind in self.profile.values():
+            if kind not in ('torch', 'cprofile'):
+                raise ValueError("Unsupported profiler " + str(kind) + ". Use 'torch' or 'cprofile'.")
+
+        self.stack_ = []
+        self.times_ = defaultdict(float)
+        self.calls_ = defaultdict(int)
+        self.counts_ = defaultdict(int)
+        self.profiles_ = defaultdict(list)
+
+    def span(self, name):
+        return _Span(self, name)
+
+    def count(self, name, value=1):
+        path = name if not self.stack_ else self.stack_[-1] + '/' + name
+        self.counts_[path] += value
+
+    @staticmethod
+    def start_profiler(kind):
+        if kind == 'cprofile':
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            import torch.profiler
+            profiler = torch.profiler.profile(activities=[torch.profiler.ProfilerActivity.CPU], record_shapes=True)
+            profiler.start()
+        return profiler
+
+    def stop_profiler(self, path, profiler):
+        if isinstance(profiler, cProfile.Profile):
+            profiler.disable()
+        else:
+            profiler.stop()
+        self.profiles_[path].append(profiler)
+
+        if self._profile_dir is not None:
+            os.makedirs(self._profile_dir, exist_ok=True)
+            file = os.path.join(self._profile_dir, path.replace('/', '__') + '_' + str(len(self.profiles_[path])))
+            if isinstance(profiler, cProfile.Profile):
+                profiler.dump_stats(file + '.prof')
+            else:
+                profiler.export_chrome_trace(file + '.json')
+
+    def breakdown(self):
+        """Return the times (in seconds) and the counters of all the recorded phases in a single dictionary."""
+        return dict(self.times_, **self.counts_)
+
+    def ledger_rows(self, prefix):
+        """Return the breakdown as rows for the result ledger: `prefix + ['Time: <phase>', seconds]` and
+        `prefix + ['Count: <phase>/<counter>', value]`, in the order the phases were first entered."""
+        rows = [prefix + ['Time: ' + path, seconds] for path, seconds in self.times_.items()]
+        rows += [prefix + ['Count: ' + path, value] for path, value in self.counts_.items()]
+        return rows
+
+
+def span(name):
+    """A context manager that records the time of the phase `name`, if instrumentation is on."""
+    return _NULL_SPAN if _recorder is None else _recorder.span(name)
+
+
+def count(name, value=1):
+    """Add `value` to the counter `name` of the current phase, if instrumentation is on."""
+    if _recorder is not None:
+        _recorder.count(name, value)
+
+
+def instrumented(name):
+    """Decorator that records each call of the decorated function as a span named `name`."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _recorder is None:
+                return function(*args, **kwargs)
+            with _recorder.span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextlib.contextmanager
+def recording(enabled=True, profile=None, profile_dir=None):
+    """Context manager that turns instrumentation on and yields its `Recorder`. If `enabled` is False, it yields
+    `None` and instrumentation stays off, so that the callers can make it optional without branching.
+
+    Args:
+        enabled: Whether to record.
+        profile: A dictionary that maps span names (or paths) to the profiler to attach: 'torch' or 'cprofile'.
+        profile_dir: If given, the directory where each profile is written when its span ends.
+    """
+    global _recorder
+
+    if not enabled:
+        yield None
+        return
+
+    previous, _recorder = _recorder, Recorder(profile, profile_dir)
+    try:
+        yield _recorder
+    finally:
+        _recorder = previous
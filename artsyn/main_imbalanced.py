@@ -1,13 +1,14 @@
-import os
 import sys
 
 import numpy as np
 
-import DeepCoreML.eval as eval_methods
-import DeepCoreML.paths as paths
+import artsyn.eval as eval_methods
+import artsyn.paths as paths
+from artsyn.thread_budget import thread_budget
 
+# The number of threads of the experiments. One thread, as in the published experiments (and their "Fit Time" values);
+# `None` uses ARTSYN_NUM_THREADS or all the usable cores.
 num_threads = 1
-os.environ['OMP_NUM_THREADS'] = str(num_threads)
 np.set_printoptions(linewidth=400, threshold=sys.maxsize)
 
 seed = 42
@@ -74,11 +75,12 @@ datasets_problematic = {
 }
 
 if __name__ == '__main__':
-    # eval_methods.test_model('CTDGAN', datasets['ecoli1'], seed)
+    with thread_budget(num_threads) as budget:
+        # eval_methods.test_model('CTDGAN', datasets['ecoli1'], seed)
 
-    eval_methods.eval_resampling(datasets=datasets, transformer='standardizer', num_folds=5, random_state=seed)
-    #eval_methods.eval_fidelity(datasets=datasets, transformer=None, num_folds=5, random_state=seed)
-    #eval_methods.eval_detectability(datasets=datasets, transformer='standardizer', num_folds=5, random_state=seed)
+        eval_methods.eval_resampling(datasets=datasets, transformer='standardizer', num_folds=5, random_state=seed)
+        #eval_methods.eval_fidelity(datasets=datasets, transformer=None, num_folds=5, random_state=seed)
+        #eval_methods.eval_detectability(datasets=datasets, transformer='standardizer', num_folds=5, random_state=seed)
 
-    # Experiments performed in the Information Sciences 2024 paper
-    # eval_methods.eval_oversampling_efficacy(datasets_imb, num_threads, seed)
+        # Experiments performed in the Information Sciences 2024 paper
+        # eval_methods.eval_oversampling_efficacy(datasets_imb, budget, seed)
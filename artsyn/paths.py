@@ -25,3 +25,6 @@ bin_mix = base_path + 'datasets/Imbalanced/bin_mixed/'
 multi_cont = base_path + 'datasets/Imbalanced/multiclass_continuous/'
 multi_disc = base_path + 'datasets/Imbalanced/multiclass_discrete/'
 multi_mix = base_path + 'datasets/Imbalanced/multiclass_mixed/'
+
+# The preprocessed datasets (see TabularDataset.load_from_csv)
+dataset_cache = base_path + 'datasets/cache/'
@@ -0,0 +1,224 @@
+# Lightweight sampling runtime for exported GAN synthesizers.
+#
+# The models of `artsyn.generators` (ctGAN, ctdGAN, cGAN) can be exported with their `export(path)` method. The
+# exported artifact contains a TorchScript Generator, the construction of the latent vectors and the parameters of the
+# inverse data transformation. This module samples from such an artifact by importing NumPy and torch only; neither
+# scikit-learn, RDT, SDV nor the training code of the models are required.
+#
+# Usage:
+#   model = artsyn.runtime.load('exported_model_dir')
+#   x = model.sample(1000, y=1)
+
+import json
+import os
+
+import numpy as np
+import torch
+
+SUPPORTED_FORMAT_VERSION = 1
+
+
+def _yeo_johnson_inverse(x, lmbda):
+    """Inverse of the Yeo-Johnson transformation (vectorized, `lmbda` may vary per row)."""
+    x, lmbda = np.broadcast_arrays(np.asarray(x, dtype=float), np.asarray(lmbda, dtype=float))
+    out = np.empty_like(x)
+    eps = np.spacing(1.0)
+
+    pos = x >= 0
+    lz = np.abs(lmbda) < eps
+    l2 = np.abs(lmbda - 2) <= eps
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        m = pos & lz
+        out[m] = np.expm1(x[m])
+        m = pos & ~lz
+        out[m] = np.power(x[m] * lmbda[m] + 1, 1 / lmbda[m]) - 1
+        m = ~pos & ~l2
+        out[m] = 1 - np.power(-(2 - lmbda[m]) * x[m] + 1, 1 / (2 - lmbda[m]))
+        m = ~pos & l2
+        out[m] = -np.expm1(-x[m])
+
+    return out
+
+
+class ExportedSynthesizer(object):
+    """A synthesizer restored from an exported artifact.
+
+    Args:
+        path: The directory of the exported artifact.
+        device: The torch device for the Generator.
+        random_state: Seeds the NumPy random Generator that the latent vectors are drawn from.
+    """
+    def __init__(self, path, device='cpu', random_state=None):
+        with open(os.path.join(path, 'spec.json')) as f:
+            self.spec_ = json.load(f)
+
+        if self.spec_.get('format_version', 0) > SUPPORTED_FORMAT_VERSION:
+            raise ValueError("Unsupported export format version: " + str(self.spec_.get('format_version')))
+
+        with np.load(os.path.join(path, 'params.npz'), allow_pickle=False) as params:
+            self._params = {k: params[k] for k in params.files}
+
+        self._device = torch.device(device)
+        self._rng = np.random.default_rng(random_state)
+        self._generator = torch.jit.load(os.path.join(path, 'generator.pt'), map_location=self._device)
+        self._generator.eval()
+
+        self.model_ = self.spec_['model']
+        self._columns = self.spec_['columns']
+
+    def _generate(self, latent):
+        """Pass the latent vectors through the (activated) Generator."""
+        with torch.inference_mode():
+            z = torch.from_numpy(np.ascontiguousarray(latent, dtype=np.float32)).to(self._device)
+            return self._generator(z).cpu().numpy()
+
+    def _noise(self, n):
+        return self._rng.standard_normal((n, self.spec_['embedding_dim']), dtype=np.float32)
+
+    @staticmethod
+    def _one_hot(positions, dim):
+        """One-hot encode `positions`; rows with a negative position remain zero."""
+        out = np.zeros((positions.shape[0], dim), dtype=np.float32)
+        valid = positions >= 0
+        out[np.flatnonzero(valid), positions[valid]] = 1
+        return out
+
+    def _param(self, key, clusters):
+        value = self._params[key]
+        return value[clusters] if clusters is not None and value.shape[0] > 1 else value[0]
+
+    def _decode_column(self, j, col, block, clusters):
+        """Invert the transformation of one column. `clusters` selects per-cluster parameters (ctdGAN)."""
+        key = 'col%d' % j
+        decoder = col['decoder']
+        per_cluster = clusters if col.get('per_cluster', False) else None
+
+        if decoder == 'categories':
+            values = np.asarray(col['categories'], dtype=object)[np.argmax(block, axis=1)]
+        elif decoder == 'vgm':
+            component = np.argmax(block[:, 1:], axis=1)
+            std_t = self._params[key + '.stds'][component]
+            mean_t = self._params[key + '.means'][component]
+            values = np.clip(block[:, 0], -1, 1) * col['std_multiplier'] * std_t + mean_t
+        elif decoder == 'affine':
+            values = block[:, 0] * self._param(key + '.scale', per_cluster) + self._param(key + '.shift', per_cluster)
+        elif decoder == 'yeo':
+            values = block[:, 0] * self._param(key + '.scale', per_cluster) + self._param(key + '.shift', per_cluster)
+            values = _yeo_johnson_inverse(values, self._param(key + '.lambda', per_cluster))
+        else:
+            values = block[:, 0].astype(float)
+
+        if col.get('clip', False):
+            values = np.clip(values, self._param(key + '.min', per_cluster), self._param(key + '.max', per_cluster))
+
+        if decoder != 'categories' or all(isinstance(v, (int, float, bool)) for v in col['categories']):
+            values = values.astype(float)
+            if col['dtype'].startswith(('int', 'uint')):
+                values = values.astype(np.int64)
+        return values
+
+    def _decode(self, data, clusters=None):
+        """Invert the data transformation of the generated (activated) data."""
+        columns = []
+        for j, col in enumerate(self._columns[:self.spec_['n_columns']]):
+            block = data[:, col['start']:col['start'] + col['dim']]
+            columns.append(self._decode_column(j, col, block, clusters))
+
+        if any(c.dtype == object for c in columns):
+            out = np.empty((data.shape[0], len(columns)), dtype=object)
+            for j, c in enumerate(columns):
+                out[:, j] = c
+            return out
+
+        return np.column_stack(columns)
+
+    def _sample_cgan(self, n, y):
+        n_classes = self.spec_['n_classes']
+        classes = self._rng.integers(0, n_classes, n) if y is None else np.full(n, y)
+        latent = np.hstack((self._noise(n), self._one_hot(classes, n_classes)))
+        return self._decode(self._generate(latent))
+
+    def _sample_ctgan(self, n, y):
+        cond_dim = self.spec_['cond_dim']
+        latent = [self._noise(n)]
+        if cond_dim > 0:
+            if y is not None:
+                positions = [idx for value, idx in self.spec_['class_cond'] if value == y]
+                if len(positions) == 0:
+                    raise ValueError("The class " + str(y) + " was not seen during training.")
+                positions = np.full(n, positions[0])
+            else:
+                # Pick a discrete column per row, then a category according to its frequency in the training data.
+                cond_columns = self.spec_['cond_columns']
+                col = self._rng.integers(0, len(cond_columns), n)
+                positions = np.empty(n, dtype=int)
+                for c in np.unique(col):
+                    rows = np.flatnonzero(col == c)
+                    probs = self._params['cond%d.probs' % c]
+                    positions[rows] = cond_columns[c] + self._rng.choice(probs.shape[0], rows.shape[0], p=probs)
+            latent.append(self._one_hot(positions, cond_dim))
+
+        return self._decode(self._generate(np.hstack(latent)))
+
+    def _sample_ctdgan(self, n, y):
+        n_classes, n_clusters = self.spec_['n_classes'], self.spec_['n_clusters']
+        cluster_col, class_col = self._columns[self.spec_['cluster_column']], self._columns[self.spec_['class_column']]
+        cluster_probs = np.cumsum(self._params['cluster_probs'], axis=1)
+
+        accepted, num_accepted, max_retries = [], 0, 100
+        data, clusters = None, None
+        for _ in range(max_retries + 1):
+            classes = self._rng.integers(0, n_classes, n) if y is None else np.full(n, y)
+
+            # Pick a cluster per sample with the cluster probabilities of its class (or uniformly for 'unisam').
+            if self.spec_['uniform_clusters']:
+                clusters = self._rng.integers(0, n_clusters, n)
+            else:
+                cdf = cluster_probs[classes]
+                clusters = (cdf < self._rng.random((n, 1)) * cdf[:, -1:]).sum(axis=1)
+                clusters = np.minimum(clusters, n_clusters - 1)
+
+            latent = [self._noise(n)]
+            for b, block in enumerate(self.spec_['latent_blocks']):
+                if block['kind'] == 'cluster':
+                    values = clusters
+                elif block['kind'] == 'class':
+                    values = classes
+                else:
+                    values = self._rng.integers(0, block['dim'], n)
+                latent.append(self._one_hot(self._params['latent%d.positions' % b][values], block['dim']))
+
+            data = self._generate(np.hstack(latent))
+
+            # Keep the samples whose generated cluster and class match the requested ones.
+            gen_cluster = np.argmax(data[:, cluster_col['start']:cluster_col['start'] + cluster_col['dim']], axis=1)
+            gen_class = np.argmax(data[:, class_col['start']:class_col['start'] + class_col['dim']], axis=1)
+            keep = ((gen_cluster == self._params['latent_cluster_positions'][clusters]) &
+                    (gen_class == self._params['latent_class_positions'][classes]))
+
+            if keep.any():
+                accepted.append(self._decode(data[keep], clusters[keep]))
+                num_accepted += int(keep.sum())
+            if num_accepted >= n:
+                break
+
+        if num_accepted == 0:
+            return self._decode(data, clusters)
+        return np.concatenate(accepted, axis=0)[:n]
+
+    def sample(self, n, y=None):
+        """Generate `n` samples, optionally from the class `y`."""
+        if self.model_ == 'cGAN':
+            return self._sample_cgan(n, y)
+        elif self.model_ == 'ctGAN':
+            return self._sample_ctgan(n, y)
+        elif self.model_ == 'ctdGAN':
+            return self._sample_ctdgan(n, y)
+
+        raise ValueError("Unsupported exported model: " + str(self.model_))
+
+
+def load(path, device='cpu', random_state=None):
+    """Load an exported synthesizer from the directory `path`."""
+    return ExportedSynthesizer(path, device=device, random_state=random_state)
@@ -0,0 +1,190 @@
+# Zero-copy sharing of large NumPy arrays between processes.
+#
+# An array is published once, either in a named shared memory block (`backend='shm'`) or in a memory-mapped `.npy`
+# file (`backend='npy'`). The returned `SharedArray` is a small picklable descriptor: a worker process that receives it
+# attaches to the same buffer by name, instead of receiving a pickled copy of the data.
+#
+# Usage:
+#   handle = SharedArray.publish(x)              # in the parent process
+#   x = handle.attach()                          # in any process (zero-copy)
+#   handle.unlink()                              # in the parent process, when all the workers are done
+
+import os
+import tempfile
+import uuid
+
+import numpy as np
+
+from multiprocessing import shared_memory, resource_tracker
+
+# The shared memory blocks that are attached in this process. They must stay referenced while their arrays are in use.
+_segments = {}
+
+
+def _attach_segment(name):
+    """Attach to an existing shared memory block without making this process responsible for its removal."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13: the attaching process registers the block with its resource tracker, which would remove it
+        # when the process exits.
+        segment = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(segment._name, 'shared_memory')
+        return segment
+
+
+class SharedArray(object):
+    """A picklable reference to an array in a named shared memory block or a memory-mapped `.npy` file.
+
+    Args:
+        backend (str): 'shm' (named shared memory) or 'npy' (memory-mapped `.npy` file).
+        name (str): The name of the shared memory block, or the path of the `.npy` file.
+        shape (tuple): The shape of the array.
+        dtype: The data type of the array.
+    """
+    def __init__(self, backend, name, shape, dtype):
+        if backend not in ('shm', 'npy'):
+            raise ValueError("Unsupported backend " + str(backend) + ". Use 'shm' or 'npy'.")
+
+        self.backend = backend
+        self.name = name
+        self.shape = tuple(int(s) for s in shape)
+        self.dtype = np.dtype(dtype)
+        self._array = None
+
+    def __getstate__(self):
+        return {'backend': self.backend, 'name': self.name, 'shape': self.shape, 'dtype': self.dtype.str}
+
+    def __setstate__(self, state):
+        self.__init__(state['backend'], state['name'], state['shape'], state['dtype'])
+
+    def __repr__(self):
+        return "SharedArray(%s, %s, shape=%s, dtype=%s)" % (self.backend, self.name, self.shape, self.dtype)
+
+    @classmethod
+    def create(cls, shape, dtype=float, backend='shm', name=None, directory=None):
+        """Allocate a new shared buffer and return its descriptor. Write into the buffer via `attach()`.
+
+        Args:
+            shape (tuple): The shape of the array.
+            dtype: The data type of the array.
+            backend (str): 'shm' (named shared memory) or 'npy' (memory-mapped `.npy` file).
+            name (str): The name of the shared memory block, or the file name of the `.npy` file. A unique name is
+                generated if `None`.
+            directory (str): The directory of the `.npy` file (backend 'npy'). Defaults to the temporary directory.
+        """
+        dtype = np.dtype(dtype)
+        size = int(np.prod(shape)) * dtype.itemsize
+        name = name or 'artsyn_' + uuid.uuid4().hex[:16]
+
+        if backend == 'shm':
+            segment = shared_memory.SharedMemory(name=name, create=True, size=max(size, 1))
+            _segments[name] = segment
+            handle = cls(backend, name, shape, dtype)
+            handle._array = np.ndarray(handle.shape, dtype=dtype, buffer=segment.buf)
+        elif backend == 'npy':
+            path = os.path.join(directory or tempfile.gettempdir(), name if name.endswith('.npy') else name + '.npy')
+            handle = cls(backend, path, shape, dtype)
+            handle._array = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=handle.shape)
+        else:
+            raise ValueError("Unsupported backend " + str(backend) + ". Use 'shm' or 'npy'.")
+
+        return handle
+
+    @classmethod
+    def publish(cls, array, backend='shm', name=None, directory=None):
+        """Copy `array` into a new shared buffer and return its descriptor."""
+        array = np.asarray(array)
+        if array.dtype == object:
+            raise ValueError("Arrays of Python objects cannot be shared; encode them to a numeric dtype first.")
+
+        handle = cls.create(array.shape, array.dtype, backend=backend, name=name, directory=directory)
+        handle._array[...] = array
+        return handle
+
+    def attach(self):
+        """Return the shared array (zero-copy). The array is writable in the process that created it only."""
+        if self._array is None:
+            if self.backend == 'shm':
+                segment = _segments.get(self.name)
+                if segment is None:
+                    segment = _segments[self.name] = _attach_segment(self.name)
+                self._array = np.ndarray(self.shape, dtype=self.dtype, buffer=segment.buf)
+                self._array.flags.writeable = False
+            else:
+                self._array = np.load(self.name, mmap_mode='r')
+
+        return self._array
+
+    def unlink(self):
+        """Release the shared buffer. Call it once, in the process that published the array."""
+        self._array = None
+        if self.backend == 'shm':
+            segment = _segments.pop(self.name, None) or _attach_segment(self.name)
+            segment.close()
+            try:
+                segment.unlink()
+            except FileNotFoundError:
+                pass
+        elif os.path.exists(self.name):
+            os.remove(self.name)
+
+
+class IndexedArray(object):
+    """A read-only view of the rows `index` of an array. The rows are gathered on access, so that selecting a fold
+    of a (shared) dataset does not copy it.
+
+    If `base` is a `SharedArray`, the view is pickled with the descriptor of the buffer and its row indices only, so
+    that a worker process that receives it attaches to the shared buffer instead of receiving a copy of the rows.
+
+    Args:
+        base: The underlying array, or the `SharedArray` descriptor of a shared array.
+        index: An integer array with the selected rows (or a boolean mask).
+    """
+    def __init__(self, base, index):
+        index = np.asarray(index)
+        if index.dtype == bool:
+            index = np.flatnonzero(index)
+
+        self._handle = base if isinstance(base, SharedArray) else None
+        if self._handle is not None:
+            base = self._handle.attach()
+
+        self.base = base
+        self.index = index.astype(np.int64, copy=False)
+        self.dtype = base.dtype
+        self.shape = (self.index.shape[0],) + tuple(base.shape[1:])
+        self.ndim = len(self.shape)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        if self._handle is not None:
+            state['base'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self._handle is not None:
+            self.base = self._handle.attach()
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, key):
+        cols = None
+        if isinstance(key, tuple):
+            key, cols = key[0], key[1:]
+
+        rows = self.base[self.index[key]]
+        if cols:
+            rows = rows[cols] if rows.ndim < self.ndim else rows[(slice(None),) + cols]
+        return rows
+
+    def __array__(self, dtype=None, copy=None):
+        out = np.take(self.base, self.index, axis=0)
+        return out if dtype is None else out.astype(dtype, copy=False)
+
+    def iter_chunks(self, chunk_size):
+        """Iterate over the rows of the view in consecutive chunks of `chunk_size` rows."""
+        for st in range(0, len(self), chunk_size):
+            yield self.base[self.index[st:st + chunk_size]]
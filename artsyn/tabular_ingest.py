@@ -0,0 +1,123 @@
+# Chunked, typed ingestion of CSV files into preallocated arrays.
+#
+# The schema of the file (the dtype that each column is parsed with) is inferred from a sample of its first rows. The
+# file is then read in chunks with compact dtypes: the string columns as `category`, the real-valued columns as
+# `float32`. The rows with missing values are dropped and the categorical columns are label encoded chunk by chunk, and
+# each chunk is copied into arrays that are allocated once. The peak memory is about the size of the final arrays plus
+# one chunk.
+
+import numpy as np
+import pandas as pd
+
+# The options of `pd.read_csv` that `TabularDataset.load_from_csv` reads the CSV files with.
+CSV_OPTIONS = {'skipinitialspace': True, 'encoding': 'utf-8', 'keep_default_na': True, 'na_values': '<null>'}
+
+
+def count_lines(path, block_size=1 << 20):
+    """Count the line breaks of the file `path`. This is an upper bound of the number of its rows."""
+    lines = 0
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            lines += block.count(b'\n')
+    return lines + 1
+
+
+class LabelEncoding(object):
+    """An incremental label encoder. The values of each chunk are encoded with provisional codes in the order that
+    they are first seen; `finalize` maps the provisional codes to the codes of a `LabelEncoder` that is fitted on all
+    the values (i.e. the indices of the sorted distinct values).
+
+    Args:
+        strip (bool): Strip the leading and trailing whitespace from string values.
+    """
+    def __init__(self, strip=False):
+        self._strip = strip
+        self._codes = {}
+
+    def partial_transform(self, values):
+        """Return the provisional codes (int32) of a `pd.Series` of values."""
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            codes, uniques = values.cat.codes.to_numpy(), values.cat.categories
+        else:
+            codes, uniques = pd.factorize(values)
+
+        if self._strip:
+            uniques = [u.strip() if isinstance(u, str) else u for u in uniques]
+
+        lookup = np.array([self._codes.setdefault(u, len(self._codes)) for u in uniques], dtype=np.int32)
+        return lookup[codes]
+
+    def finalize(self, encoder, codes):
+        """Set the classes of the `LabelEncoder` `encoder` and re-encode the provisional `codes` in place."""
+        classes = sorted(self._codes)
+        remap = np.empty(len(classes), dtype=np.int32)
+        remap[[self._codes[c] for c in classes]] = np.arange(len(classes), dtype=np.int32)
+
+        codes[...] = remap[codes.astype(np.intp)]
+        encoder.classes_ = np.asarray(classes)
+        return encoder
+
+
+def infer_schema(path, encoded_columns, sample_rows=10000):
+    """Infer the dtypes that the columns of a CSV file are read with from a sample of its first rows.
+
+    Args:
+        path: The location of the CSV file.
+        encoded_columns: The indices of the columns that are label encoded (the categorical and class columns).
+        sample_rows: The number of rows in the sample.
+
+    Returns:
+        The column names, and a dictionary with the dtype of each column ('category', 'float32', or `None` for the
+        integer columns, whose chunks are parsed with the default integer/float dtypes of pandas and then checked).
+    """
+    sample = pd.read_csv(path, nrows=sample_rows, **CSV_OPTIONS)
+
+    dtypes = {}
+    for j, name in enumerate(sample.columns):
+        kind = sample[name].dtype.kind
+        if j in encoded_columns:
+            dtypes[name] = 'category' if kind in 'OSU' else None
+        elif kind == 'f':
+            dtypes[name] = 'float32'
+        elif kind in 'iub':
+            dtypes[name] = None
+        else:
+            raise ValueError("Column " + str(j) + " (" + str(name) + ") contains strings; declare it as categorical.")
+
+    return list(sample.columns), dtypes
+
+
+def read_chunks(path, dtypes, chunk_size=100000, engine='c'):
+    """Read a CSV file in chunks of `chunk_size` rows, with the dtypes of `infer_schema`.
+
+    Args:
+        path: The location of the CSV file.
+        dtypes: The dtype of each column.
+        chunk_size: The number of rows per chunk.
+        engine: 'c' (the pandas parser) or 'pyarrow' (the streaming reader of `pyarrow.csv`, if installed).
+
+    Returns:
+        A generator of `pd.DataFrame` chunks.
+    """
+    if engine == 'c':
+        with pd.read_csv(path, chunksize=chunk_size, dtype={k: v for k, v in dtypes.items() if v is not None},
+                         **CSV_OPTIONS) as reader:
+            yield from reader
+
+    elif engine == 'pyarrow':
+        import pyarrow as pa
+        from pyarrow import csv
+
+        types = {k: pa.dictionary(pa.int32(), pa.string()) if v == 'category' else pa.float32()
+                 for k, v in dtypes.items() if v is not None}
+        # The block size is in bytes; assume about 64 bytes per row.
+        reader = csv.open_csv(path, read_options=csv.ReadOptions(block_size=64 * chunk_size),
+                              convert_options=csv.ConvertOptions(column_types=types, strings_can_be_null=True,
+                                                                 null_values=['', 'NA', 'NaN', 'nan', 'null', '<null>']))
+        for batch in reader:
+            chunk = batch.to_pandas()
+            chunk.columns = list(dtypes)
+            yield chunk
+
+    else:
+        raise ValueError("Unsupported engine " + str(engine) + ". Use 'c' or 'pyarrow'.")
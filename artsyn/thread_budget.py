@@ -0,0 +1,122 @@
+# Coordinated threading configuration of the package.
+#
+# The package runs joblib worker pools (outer parallelism) whose tasks call into torch, NumPy/BLAS and OpenMP code
+# that starts its own thread pools (inner parallelism). Left alone, every worker starts one inner thread per core, and
+# the machine is oversubscribed. Instead, a single budget of threads is split between the two levels: a `Parallel`
+# call site runs `min(tasks, budget)` workers, and each worker limits its inner thread pools (with threadpoolctl and
+# `torch.set_num_threads`) to its share of the budget.
+#
+# The budget is the number of usable cores, unless it is set with the environment variable ARTSYN_NUM_THREADS or,
+# for a block of code, with the `thread_budget` context manager:
+#
+#   with thread_budget(16):
+#       model.fit(x, y)
+
+import contextlib
+import os
+import sys
+
+from joblib import Parallel, delayed, parallel_config
+from threadpoolctl import threadpool_limits
+
+ENV_VARIABLE = 'ARTSYN_NUM_THREADS'
+
+# The budget set by the innermost `thread_budget` context (`None` outside any context).
+_budget = None
+
+
+def available_cores():
+    """The number of cores that this process may run on."""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def total_threads():
+    """The current thread budget: the one of the active `thread_budget` context, otherwise the value of
+    ARTSYN_NUM_THREADS, otherwise the number of usable cores."""
+    if _budget is not None:
+        return _budget
+
+    value = os.environ.get(ENV_VARIABLE, '').strip()
+    if not value:
+        return available_cores()
+
+    if not value.isdigit() or int(value) < 1:
+        raise ValueError(ENV_VARIABLE + " must be a positive integer, not " + repr(value))
+    return int(value)
+
+
+def split_budget(num_tasks):
+    """Split the thread budget between `num_tasks` parallel tasks.
+
+    Returns:
+        The number of workers and the number of inner threads of each worker.
+    """
+    total = total_threads()
+    workers = max(1, min(num_tasks, total))
+    return workers, max(1, total // workers)
+
+
+@contextlib.contextmanager
+def thread_budget(num_threads=None):
+    """Context manager that sets the thread budget of the package to `num_threads` (by default, the value of
+    `total_threads()`). Inside the context, the BLAS/OpenMP and torch thread pools of the calling process are limited
+    to the budget, and the `Parallel` call sites of the package split the budget between their workers.
+    """
+    global _budget
+
+    if num_threads is None:
+        num_threads = total_threads()
+    elif num_threads < 1:
+        raise ValueError("The thread budget must be a positive integer, not " + str(num_threads))
+
+    # torch is only limited if it has been imported; the package does not import it for this purpose.
+    torch = sys.modules.get('torch')
+    torch_threads = torch.get_num_threads() if torch is not None else None
+
+    previous, _budget = _budget, num_threads
+    try:
+        with threadpool_limits(limits=num_threads):
+            if torch is not None:
+                torch.set_num_threads(num_threads)
+            yield num_threads
+    finally:
+        _budget = previous
+        if torch is not None:
+            torch.set_num_threads(torch_threads)
+
+
+def _run_task(num_threads, function, args, kwargs):
+    with thread_budget(num_threads):
+        return function(*args, **kwargs)
+
+
+def run_parallel(tasks):
+    """Run joblib `delayed` tasks on the thread budget. The tasks are run by `min(len(tasks), budget)` workers, and
+    each task runs in a `thread_budget` of `budget // workers` threads, so that the nested call sites of a task split
+    its share further.
+
+    Args:
+        tasks: An iterable of `joblib.delayed(function)(*args, **kwargs)` tasks.
+
+    Returns:
+        The list of the results of the tasks, in order.
+    """
+    tasks = list(tasks)
+    workers, inner_threads = split_budget(len(tasks))
+    if workers == 1:
+        return [_run_task(inner_threads, *task) for task in tasks]
+
+    return Parallel(n_jobs=workers)(delayed(_run_task)(inner_threads, *task) for task in tasks)
+
+
+@contextlib.contextmanager
+def delegated_budget(num_tasks, n_jobs=None):
+    """Context manager for the code that runs its own joblib pool from an `n_jobs` argument (e.g. scikit-learn's
+    `cross_validate`). It yields the number of workers for `num_tasks` tasks (at most `n_jobs`, if given), and limits
+    the inner thread pools of the workers to their share of the budget.
+    """
+    workers, inner_threads = split_budget(num_tasks if n_jobs is None else min(n_jobs, num_tasks))
+    with parallel_config(backend='loky', inner_max_num_threads=inner_threads):
+        yield workers
@@ -0,0 +1,68 @@
+# Time per Critic step of ctGAN and ctdGAN under the available penalty schedules:
+#
+# * 'gp, separate backward': the previous path (penalty on every step, `pen.backward()` then `loss_d.backward()`).
+# * 'gp', 'r1': a single backward pass over the Critic loss plus the penalty, with lazy regularization every k steps.
+#
+# Usage:
+#   python -m benchmarks.critic_penalty [--batch 500] [--dim 100] [--steps 200]
+
+import argparse
+import time
+
+import torch
+
+from artsyn.generators.gan_discriminators import Critic
+
+
+def critic_step_time(critic, optimizer, real, fake, steps, penalty, every, separate_backward=False):
+    """Return the mean time (in milliseconds) of a Critic optimization step."""
+    t = 0.0
+    for step in range(1, steps + 1):
+        st = time.perf_counter()
+        y_fake, y_real = critic(fake), critic(real)
+        loss_d = -(torch.mean(y_real) - torch.mean(y_fake))
+        optimizer.zero_grad(set_to_none=False)
+
+        if separate_backward:
+            pen = critic.calc_gradient_penalty(real, fake, 'cpu', 10)
+            pen.backward(retain_graph=True)
+            loss_d.backward()
+        else:
+            pen = critic.calc_penalty(real, fake, step, 'cpu', 10, penalty, every)
+            (loss_d if pen is None else loss_d + pen).backward()
+
+        optimizer.step()
+        t += time.perf_counter() - st
+
+    return 1000 * t / steps
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--batch', type=int, default=500)
+    parser.add_argument('--dim', type=int, default=100, help='Dimensionality of the (conditioned) Critic input.')
+    parser.add_argument('--steps', type=int, default=200)
+    args = parser.parse_args()
+
+    # The default Critic architectures of ctGAN and ctdGAN.
+    models = {'ctGAN Critic (256, 256), pac=10': ((256, 256), 10), 'ctdGAN Critic (128, 128), pac=1': ((128, 128), 1)}
+    schedules = [('gp, separate backward', 'gp', 1, True), ('gp', 'gp', 1, False), ('gp, k=4', 'gp', 4, False),
+                 ('gp, k=16', 'gp', 16, False), ('r1', 'r1', 1, False), ('r1, k=16', 'r1', 16, False)]
+
+    print("torch %s, %d threads, batch %d, input dimensionality %d" %
+          (torch.__version__, torch.get_num_threads(), args.batch, args.dim))
+    for name, (architecture, pac) in models.items():
+        # As in training, the generated samples are part of a graph (here, a leaf that requires gradients).
+        real, fake = torch.rand(args.batch, args.dim), torch.rand(args.batch, args.dim, requires_grad=True)
+        base = None
+        for label, penalty, every, separate in schedules:
+            torch.manual_seed(0)
+            critic = Critic(args.dim, architecture, pac=pac)
+            optimizer = torch.optim.Adam(critic.parameters(), lr=2e-4, betas=(0.5, 0.9))
+            ms = critic_step_time(critic, optimizer, real, fake, args.steps, penalty, every, separate)
+            base = base or ms
+            print("%-32s %-22s %8.3f ms/step (x%.2f)" % (name, label, ms, base / ms))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+# Import time of the package entry points. Each module is imported in a fresh interpreter; the report lists the wall
+# time of the import and the heavy optional dependencies that it loaded. An entry `module:name` also accesses the
+# attribute `name` of the module (e.g. `artsyn:ctdGAN` times `import artsyn; artsyn.ctdGAN`).
+#
+# Usage:
+#   python -m benchmarks.import_time [--repeat 3] [module ...]
+
+import argparse
+import json
+import subprocess
+import sys
+
+HEAVY = ('torch', 'sdv', 'rdt', 'xgboost', 'kmodes', 'gower', 'imblearn', 'matplotlib', 'seaborn')
+
+MODULES = ('artsyn', 'artsyn:ctdGAN', 'artsyn.TabularDataset', 'artsyn.TabularTransformer',
+           'artsyn.generators.ctd_gan', 'artsyn.generators.ct_gan', 'artsyn.Resamplers')
+
+PROBE = """
+import importlib, json, sys, time
+module, _, name = %r.partition(':')
+t = time.perf_counter()
+value = importlib.import_module(module)
+if name:
+    value = getattr(value, name)
+t = time.perf_counter() - t
+print(json.dumps({'seconds': t, 'loaded': [m for m in %r if m in sys.modules]}))
+"""
+
+
+def import_time(module, repeat):
+    """Import `module` in `repeat` fresh interpreters; return the fastest time and the heavy modules it loaded."""
+    best = None
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, '-c', PROBE % (module, HEAVY)], capture_output=True, text=True)
+        if out.returncode != 0:
+            return {'error': out.stderr.strip().splitlines()[-1]}
+
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        if best is None or result['seconds'] < best['seconds']:
+            best = result
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('modules', nargs='*', default=MODULES)
+    args = parser.parse_args()
+
+    for module in args.modules:
+        result = import_time(module, args.repeat)
+        if 'error' in result:
+            print(f"{module:30s}  failed: {result['error']}")
+        else:
+            print(f"{module:30s}  {1000 * result['seconds']:8.1f} ms  loaded: {', '.join(result['loaded']) or '-'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+# Convergence parity of mixed precision (bf16 autocast) training with float32 training.
+#
+# Each GAN is trained twice on the same reference table and with the same seed: in float32 and with `amp='bf16'`.
+# The report lists the mean Critic/Generator losses of the last 20% of the training steps and the moment error of the
+# generated data: the mean absolute difference between the per-class means and standard deviations of the real and the
+# generated features, in units of the standard deviation of the real features. A model fails the check if the moment
+# error of bf16 training exceeds the one of float32 training by more than the tolerance. The step times of the two
+# modes are measured by the `gan/*` and `gan/*-bf16` cases of `benchmarks.suite`.
+#
+# Usage:
+#   python -m benchmarks.precision_parity [--models ctGAN ctdGAN cGAN sbGAN] [--rows 2000] [--epochs 30]
+
+import argparse
+import sys
+
+import numpy as np
+
+MODELS = ('ctGAN', 'ctdGAN', 'cGAN', 'sbGAN')
+
+
+def build(model, epochs, amp, hook):
+    if model == 'ctGAN':
+        from artsyn.generators.ct_gan import ctGAN as GAN
+    elif model == 'ctdGAN':
+        from artsyn.generators.ctd_gan import ctdGAN as GAN
+    elif model == 'cGAN':
+        from artsyn.generators.c_gan import cGAN as GAN
+    else:
+        from artsyn.generators.sb_gan import sbGAN as GAN
+    return GAN(epochs=epochs, batch_size=100, pac=10, random_state=0, amp=amp, metrics=hook)
+
+
+def moment_error(x, y, model):
+    """The mean absolute difference of the per-class feature means and standard deviations of the real data `x` and of
+    data generated by `model`, in units of the standard deviation of the real features."""
+    scale = x.std(axis=0) + 1e-12
+    errors = []
+    for cls in np.unique(y):
+        real = x[y == cls]
+        generated = np.asarray(model.sample(len(real), cls), dtype=float)[:, :x.shape[1]]
+        errors.append(np.abs(real.mean(axis=0) - generated.mean(axis=0)) / scale)
+        errors.append(np.abs(real.std(axis=0) - generated.std(axis=0)) / scale)
+    return float(np.mean(errors))
+
+
+def train(model, x, y, epochs, amp):
+    """Train `model` in the mixed precision mode `amp`; return its final losses and its moment error."""
+    losses = []
+    gan = build(model, epochs, amp, lambda step, metrics: losses.append((metrics['loss_d'], metrics['loss_g'])))
+    gan.fit(x, y)
+
+    tail = np.asarray(losses[-max(len(losses) // 5, 1):])
+    return {'loss_d': float(tail[:, 0].mean()), 'loss_g': float(tail[:, 1].mean()),
+            'moment_error': moment_error(x, y, gan)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--models', nargs='*', default=MODELS, choices=MODELS)
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--epochs', type=int, default=30)
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='The allowed increase of the moment error with bf16 training.')
+    args = parser.parse_args()
+
+    from benchmarks.tables import numeric_table
+    x, y = numeric_table(args.rows)
+
+    failed = []
+    print("%-8s %-6s %10s %10s %14s" % ('model', 'amp', 'loss_d', 'loss_g', 'moment_error'))
+    for model in args.models:
+        results = {amp: train(model, x, y, args.epochs, amp) for amp in (None, 'bf16')}
+        for amp, r in results.items():
+            print("%-8s %-6s %10.4f %10.4f %14.4f" % (model, amp or 'fp32', r['loss_d'], r['loss_g'], r['moment_error']))
+
+        if results['bf16']['moment_error'] > results[None]['moment_error'] + args.tolerance:
+            failed.append(model)
+
+    print("Parity:", "FAILED for " + ', '.join(failed) if failed else "OK")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+# Throughput of the GAN Generators in float32, int8 (dynamic quantization) and bfloat16 (autocast) on CPU.
+#
+# Usage:
+#   python -m benchmarks.quantized_sampling [--rows 200000] [--batch 10000] [--threads 0]
+
+import argparse
+import time
+
+import torch
+
+from artsyn.generators.gan_generators import Generator, ctGenerator, quantize_generator
+
+
+def rows_per_second(generator, latent_dim, rows, batch):
+    """Measure the number of rows per second that `generator` produces in batches of `batch` rows."""
+    with torch.inference_mode():
+        generator(torch.randn(batch, latent_dim))
+
+        t = time.perf_counter()
+        for st in range(0, rows, batch):
+            generator(torch.randn(min(batch, rows - st), latent_dim))
+        return rows / (time.perf_counter() - t)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--batch', type=int, default=10000)
+    parser.add_argument('--threads', type=int, default=0, help='Number of torch threads (0: torch default).')
+    args = parser.parse_args()
+
+    if args.threads > 0:
+        torch.set_num_threads(args.threads)
+
+    embedding_dim, data_dim = 128, 60
+    models = {
+        'Generator (cGAN, sbGAN)': (Generator((256, 256), embedding_dim + 2, data_dim, 'tanh', normalize=True),
+                                    embedding_dim + 2),
+        'ctGenerator (ctGAN, ctdGAN)': (ctGenerator(embedding_dim + 20, (256, 256), data_dim), embedding_dim + 20),
+    }
+
+    print("torch %s, %d threads, %d rows in batches of %d" %
+          (torch.__version__, torch.get_num_threads(), args.rows, args.batch))
+    for name, (generator, latent_dim) in models.items():
+        generator.eval()
+        fp32 = rows_per_second(generator, latent_dim, args.rows, args.batch)
+        print("%-28s fp32: %12.0f rows/s" % (name, fp32))
+
+        for mode in ('int8', 'bf16'):
+            quantized = quantize_generator(generator, mode)
+            speed = rows_per_second(quantized, latent_dim, args.rows, args.batch)
+            print("%-28s %s: %12.0f rows/s (x%.2f)" % (name, mode, speed, speed / fp32))
+
+
+if __name__ == '__main__':
+    main()
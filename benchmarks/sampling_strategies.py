@@ -0,0 +1,104 @@
+# Consistency of the sampling strategies of the GAN synthesizers.
+#
+# Each GAN is trained briefly on the reference mixed table for each of its sampling strategies, and it resamples the
+# table with `fit_resample` and with `fit_resample_lazy`. Both paths must return the feature columns of the table and
+# the per-class counts of the sampling plan (`_sampling_plan`) of the model: the real counts (if the plan keeps the
+# real data) plus the planned samples. ctdGAN rejects the samples whose generated class or cluster is wrong, so its
+# counts may fall short of the plan, but they must not exceed it.
+#
+# Usage:
+#   python -m benchmarks.sampling_strategies [--models ctGAN ctdGAN cGAN sbGAN] [--rows 1000] [--epochs 2]
+
+import argparse
+import contextlib
+import io
+import sys
+
+import numpy as np
+
+MODELS = ('ctGAN', 'ctdGAN', 'cGAN', 'sbGAN')
+DICT_STRATEGY = {1: 200, 2: 100}
+STRATEGIES = {
+    'ctGAN': ('auto', 'create-new', DICT_STRATEGY),
+    'ctdGAN': ('auto', 'unisam', 'balance-clusters', 'create-new', DICT_STRATEGY),
+    'cGAN': ('auto', 'create-new', DICT_STRATEGY),
+    'sbGAN': ('auto', 'create-new', DICT_STRATEGY),
+}
+
+
+def build(model, epochs, strategy):
+    if model == 'ctGAN':
+        from artsyn.generators.ct_gan import ctGAN as GAN
+    elif model == 'ctdGAN':
+        from artsyn.generators.ctd_gan import ctdGAN as GAN
+    elif model == 'cGAN':
+        from artsyn.generators.c_gan import cGAN as GAN
+    else:
+        from artsyn.generators.sb_gan import sbGAN as GAN
+    return GAN(epochs=epochs, batch_size=100, pac=10, random_state=0, sampling_strategy=strategy)
+
+
+def expected_counts(gan, y, num_classes):
+    """The per-class counts of the resampled data according to the sampling plan of a trained `gan`."""
+    plan, keep_real = gan._sampling_plan(y)
+    counts = np.bincount(y, minlength=num_classes) if keep_real else np.zeros(num_classes, dtype=int)
+    for target, n in plan.items():
+        counts[target[0] if isinstance(target, tuple) else target] += n
+    return counts
+
+
+def resample(model, strategy, x, y, epochs, lazy):
+    """Resample `x`, `y` with a new `model`; return the resampled data and the per-class counts of its plan."""
+    gan = build(model, epochs, strategy)
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        if lazy:
+            x_res, y_res = gan.fit_resample_lazy(x, y)
+        else:
+            x_res, y_res = gan.fit_resample(x, y)
+    return np.asarray(x_res), np.asarray(y_res).astype(int), expected_counts(gan, y, np.max(y) + 1)
+
+
+def check(model, x_res, y_res, expected):
+    counts = np.bincount(y_res, minlength=len(expected))
+    if x_res.shape[0] != y_res.shape[0] or len(counts) != len(expected):
+        return False
+    if model == 'ctdGAN':
+        return bool(np.all(counts <= expected))
+    return bool(np.all(counts == expected))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--models', nargs='*', default=MODELS, choices=MODELS)
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--epochs', type=int, default=2)
+    args = parser.parse_args()
+
+    from benchmarks.tables import mixed_table, encode
+    x, y = encode(*mixed_table(args.rows))
+
+    failed = []
+    print("%-8s %-18s %-6s %-20s %-20s %s" % ('model', 'strategy', 'path', 'expected', 'counts', 'status'))
+    for model in args.models:
+        for strategy in STRATEGIES[model]:
+            for lazy in (False, True):
+                name = 'dict' if isinstance(strategy, dict) else strategy
+                path = 'lazy' if lazy else 'eager'
+                try:
+                    x_res, y_res, expected = resample(model, strategy, x, y, args.epochs, lazy)
+                    ok = x_res.shape[1] == x.shape[1] and check(model, x_res, y_res, expected)
+                    counts = np.bincount(y_res, minlength=len(expected)).tolist()
+                except Exception as e:
+                    ok, expected, counts = False, [], type(e).__name__ + ': ' + str(e)
+
+                print("%-8s %-18s %-6s %-20s %-20s %s" % (model, name, path, list(map(int, expected)), counts,
+                                                           'OK' if ok else 'FAILED'))
+                if not ok:
+                    failed.append(model + '/' + name + '/' + path)
+
+    print("Sampling strategies:", "FAILED for " + ', '.join(failed) if failed else "OK")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
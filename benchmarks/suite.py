@@ -0,0 +1,342 @@
+# Performance benchmark suite of the synthesizers, the transformers and the evaluation metrics.
+#
+# Each case runs on generated tables (`benchmarks.tables`) of several sizes, in a fresh interpreter, so that the peak
+# resident set size (RSS) of the process can be attributed to the case. The results are written as JSON, together
+# with a description of the machine and the library versions; two result files can be compared with `--compare`.
+#
+# Usage:
+#   python -m benchmarks.suite --list
+#   python -m benchmarks.suite [--cases 'transformer/*' 'gan/*'] [--sizes 1000 10000] [--output results.json]
+#   python -m benchmarks.suite --compare baseline.json results.json
+
+import argparse
+import fnmatch
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+FORMAT_VERSION = 1
+
+# The line prefix of the result that a case process prints on its standard output.
+RESULT_PREFIX = 'BENCHMARK-RESULT '
+
+def best_time(function, repeat):
+    """Call `function` `repeat` times; return the shortest wall time (in seconds) and the last result."""
+    best, result = None, None
+    for _ in range(repeat):
+        t = time.perf_counter()
+        result = function()
+        t = time.perf_counter() - t
+        best = t if best is None else min(best, t)
+    return best, result
+
+
+def peak_rss_mb():
+    """The peak resident set size of this process, in MB.
+
+    On Linux this is the high-water mark of the process memory (`VmHWM`). `ru_maxrss` is only a fallback, because on
+    Linux it carries over the peak of the parent process across `execve`.
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+# Cases. Each case takes the number of rows and the number of repetitions and returns a dictionary of metrics.
+
+def transformer_case(normalizer):
+    def run(rows, repeat):
+        from artsyn.TabularTransformer import TabularTransformer
+        from benchmarks.tables import mixed_table
+
+        df, categorical = mixed_table(rows)
+        discrete = [df.columns[j] for j in categorical] + ['class']
+
+        transformer = TabularTransformer(cont_normalizer=normalizer)
+        fit_s, _ = best_time(lambda: transformer.fit(df, discrete), repeat)
+        transform_s, data = best_time(lambda: transformer.transform(df), repeat)
+        inverse_s, _ = best_time(lambda: transformer.inverse_transform(data), repeat)
+        return {'fit_s': fit_s, 'transform_s': transform_s, 'inverse_transform_s': inverse_s,
+                'transform_rows_per_s': rows / transform_s, 'output_dimensions': int(transformer.output_dimensions)}
+    return run
+
+
+def clustering_case(method):
+    def run(rows, repeat):
+        import numpy as np
+        from artsyn.generators.ctd_clusterer import ctdClusterer
+        from benchmarks.tables import mixed_table, encode
+
+        df, categorical = mixed_table(rows)
+        x, y = encode(df, categorical)
+        continuous = [j for j in range(x.shape[1]) if j not in categorical]
+        samples_per_class = np.unique(y, return_counts=True)[1]
+
+        def cluster():
+            clusterer = ctdClusterer(cluster_method=method, max_clusters=10, samples_per_class=samples_per_class,
+                                     continuous_columns=tuple(continuous), categorical_columns=tuple(categorical))
+            clusterer.perform_clustering(x, y, len(samples_per_class), pac=10)
+            return clusterer
+
+        seconds, clusterer = best_time(cluster, repeat)
+        return {'perform_clustering_s': seconds, 'num_clusters': int(clusterer.num_clusters_)}
+    return run
+
+
+def timed(obj, name):
+    """Replace the method `name` of `obj` with a wrapper that accumulates its wall time and its number of calls."""
+    method, stats = getattr(obj, name), {'seconds': 0.0, 'calls': 0}
+
+    def wrapper(*args, **kwargs):
+        t = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            stats['seconds'] += time.perf_counter() - t
+            stats['calls'] += 1
+
+    setattr(obj, name, wrapper)
+    return stats
+
+
+def gan_case(model, amp=None, compile=False):
+    """Training and sampling throughput of a GAN, trained with the mixed precision mode `amp` and, if `compile` is set,
+    with compiled modules. The time per training step excludes the preprocessing: it is measured over `train_batch`
+    (cGAN, sbGAN) or over the training loop (ctGAN, ctdGAN). It also excludes the compilation, which is reported
+    separately (`compile_s`)."""
+    def run(rows, repeat):
+        import numpy as np
+        from benchmarks.tables import mixed_table, encode
+
+        df, categorical = mixed_table(rows)
+        x, y = encode(df, categorical)
+        batch_size, epochs = 500, 3
+        steps = epochs * max(rows // batch_size, 1)
+
+        def train():
+            if model == 'ctGAN':
+                from artsyn.generators.ct_gan import ctGAN
+                gan = ctGAN(epochs=epochs, batch_size=batch_size, pac=10, amp=amp, compile=compile)
+                loop = timed(gan, '_train_loop')
+                gan.train(np.column_stack((x, y)), discrete_columns=categorical + [x.shape[1]])
+            elif model == 'ctdGAN':
+                from artsyn.generators.ctd_gan import ctdGAN
+                gan = ctdGAN(epochs=epochs, batch_size=batch_size, pac=10, amp=amp, compile=compile)
+                loop = timed(gan, '_train_loop')
+                gan._train(x, y, categorical_columns=categorical)
+            else:
+                if model == 'cGAN':
+                    from artsyn.generators.c_gan import cGAN as GAN
+                else:
+                    from artsyn.generators.sb_gan import sbGAN as GAN
+                gan = GAN(epochs=epochs, batch_size=batch_size, pac=10, amp=amp, compile=compile)
+                loop = timed(gan, 'train_batch')
+                # The compiled modules are created before the first `train_batch` call.
+                setup = timed(gan, '_compile_training')
+                gan.fit(x, y)
+                loop['seconds'] += setup['seconds']
+            return gan, loop
+
+        fit_s, (gan, loop) = best_time(train, repeat)
+        compile_s = gan.compile_time_
+        step_ms = 1000 * (loop['seconds'] - compile_s) / (loop['calls'] if model in ('cGAN', 'sbGAN') else steps)
+
+        sample = gan.sample_original if model == 'ctGAN' else gan.sample
+        sample_s, _ = best_time(lambda: sample(rows), repeat)
+        return {'fit_s': fit_s, 'epochs': epochs, 'compile_s': compile_s, 'step_ms': step_ms, 'sample_s': sample_s,
+                'sample_rows_per_s': rows / sample_s}
+    return run
+
+
+def cbr_case(rows, repeat):
+    from artsyn.generators.cbr import CBR
+    from benchmarks.tables import numeric_table
+
+    x, y = numeric_table(rows)
+    fit_s, (x_res, _) = best_time(lambda: CBR(verbose=False).fit_resample(x, y), repeat)
+
+    model = CBR(verbose=False)
+    model.fit_resample(x, y)
+    sample_s, _ = best_time(lambda: sum(chunk.shape[0] for chunk in model.sample_iter(rows)), repeat)
+    return {'fit_resample_s': fit_s, 'generated_rows': int(x_res.shape[0] - x.shape[0]),
+            'sample_iter_rows_per_s': rows / sample_s}
+
+
+def mixed_matrix_case(rows, repeat):
+    from artsyn.Tools import compute_mixed_matrix
+    from benchmarks.tables import mixed_table
+
+    df, categorical = mixed_table(rows)
+    cat_cols = [df.columns[j] for j in categorical] + ['class']
+    df[cat_cols] = df[cat_cols].astype('category')
+
+    seconds, _ = best_time(lambda: compute_mixed_matrix(df, cat_cols), repeat)
+    return {'compute_mixed_matrix_s': seconds, 'num_columns': df.shape[1]}
+
+
+def gower_case(rows, repeat):
+    from artsyn.TabularEvaluator import TabularEvaluator
+    from benchmarks.tables import mixed_table
+
+    real, categorical = mixed_table(rows, random_state=0)
+    synthetic, _ = mixed_table(rows, random_state=1)
+    evaluator = TabularEvaluator(real, synthetic, 'class', categorical + [real.shape[1] - 1])
+
+    seconds, _ = best_time(evaluator.gower_metrics, repeat)
+    return {'gower_metrics_s': seconds, 'pairs_per_s': rows * rows / seconds}
+
+
+# Case name -> (function, default sizes)
+CASES = {
+    'transformer/stds': (transformer_case('stds'), (1000, 10000, 100000)),
+    'transformer/vgm': (transformer_case('vgm'), (1000, 10000, 100000)),
+    'clustering/kmeans': (clustering_case('kmeans'), (1000, 10000, 50000)),
+    'clustering/gmm': (clustering_case('gmm'), (1000, 10000, 50000)),
+    'clustering/hac': (clustering_case('hac'), (1000, 5000)),
+    'clustering/kprot': (clustering_case('kprot'), (1000, 5000)),
+    'gan/ctGAN': (gan_case('ctGAN'), (2000, 10000)),
+    'gan/ctdGAN': (gan_case('ctdGAN'), (2000, 10000)),
+    'gan/cGAN': (gan_case('cGAN'), (2000, 10000)),
+    'gan/sbGAN': (gan_case('sbGAN'), (2000, 10000)),
+    'gan/ctGAN-bf16': (gan_case('ctGAN', amp='bf16'), (2000, 10000)),
+    'gan/ctdGAN-bf16': (gan_case('ctdGAN', amp='bf16'), (2000, 10000)),
+    'gan/cGAN-bf16': (gan_case('cGAN', amp='bf16'), (2000, 10000)),
+    'gan/sbGAN-bf16': (gan_case('sbGAN', amp='bf16'), (2000, 10000)),
+    'gan/ctGAN-compile': (gan_case('ctGAN', compile=True), (2000, 10000)),
+    'gan/ctdGAN-compile': (gan_case('ctdGAN', compile=True), (2000, 10000)),
+    'gan/cGAN-compile': (gan_case('cGAN', compile=True), (2000, 10000)),
+    'gan/sbGAN-compile': (gan_case('sbGAN', compile=True), (2000, 10000)),
+    'cbr': (cbr_case, (1000, 10000, 50000)),
+    'mixed-matrix': (mixed_matrix_case, (1000, 10000, 100000)),
+    'gower': (gower_case, (1000, 5000)),
+}
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+# Runner
+
+def run_case(name, rows, repeat):
+    """Run one case in this process and print its result."""
+    baseline_rss = peak_rss_mb()
+    t = time.perf_counter()
+    try:
+        result = {'metrics': CASES[name][0](rows, repeat)}
+    except ImportError as e:
+        result = {'skipped': str(e)}
+    result.update({'wall_s': time.perf_counter() - t, 'baseline_rss_mb': baseline_rss, 'peak_rss_mb': peak_rss_mb()})
+    print(RESULT_PREFIX + json.dumps(result), flush=True)
+
+
+def spawn_case(name, rows, repeat, timeout):
+    """Run one case in a fresh interpreter and return its result."""
+    command = [sys.executable, '-m', 'benchmarks.suite', '--run', name, str(rows), '--repeat', str(repeat)]
+    try:
+        out = subprocess.run(command, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {'error': 'timeout after ' + str(timeout) + ' s'}
+
+    for line in reversed(out.stdout.splitlines()):
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):])
+
+    lines = out.stderr.strip().splitlines()
+    return {'error': lines[-1] if lines else 'exit code ' + str(out.returncode)}
+
+
+def machine():
+    import numpy
+    import pandas
+    import sklearn
+    import torch
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+
+    return {'platform': platform.platform(), 'processor': platform.processor(), 'cpu_count': os.cpu_count(),
+            'python': platform.python_version(), 'numpy': numpy.__version__, 'pandas': pandas.__version__,
+            'sklearn': sklearn.__version__, 'torch': torch.__version__, 'torch_threads': torch.get_num_threads(),
+            'commit': commit}
+
+
+def compare(baseline_file, results_file):
+    """Print the ratio of each timing metric of `results_file` to the one of `baseline_file` (< 1 is faster)."""
+    with open(baseline_file) as f:
+        baseline = {(r['case'], r['rows']): r for r in json.load(f)['results']}
+    with open(results_file) as f:
+        results = json.load(f)['results']
+
+    for r in results:
+        old = baseline.get((r['case'], r['rows']))
+        if old is None or 'metrics' not in r or 'metrics' not in old:
+            continue
+        for metric, value in r['metrics'].items():
+            timing = metric.endswith(('_s', '_ms')) and not metric.endswith('_per_s')
+            if not timing or not old['metrics'].get(metric):
+                continue
+            print("%-20s %8d  %-24s %10.4f -> %10.4f  x%.2f" %
+                  (r['case'], r['rows'], metric, old['metrics'][metric], value, value / old['metrics'][metric]))
+        print("%-20s %8d  %-24s %10.1f -> %10.1f  x%.2f" %
+              (r['case'], r['rows'], 'peak_rss_mb', old['peak_rss_mb'], r['peak_rss_mb'],
+               r['peak_rss_mb'] / old['peak_rss_mb']))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--cases', nargs='*', default=['*'], help='Glob patterns of the case names.')
+    parser.add_argument('--sizes', nargs='*', type=int, help='Numbers of rows (default: the sizes of each case).')
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--timeout', type=int, default=3600, help='Timeout of each case, in seconds.')
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--list', action='store_true', help='List the cases and their default sizes.')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'RESULTS'))
+    parser.add_argument('--run', nargs=2, metavar=('CASE', 'ROWS'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_case(args.run[0], int(args.run[1]), args.repeat)
+        return
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    names = [n for n in CASES if any(fnmatch.fnmatch(n, pattern) for pattern in args.cases)]
+    if args.list:
+        for name in names:
+            print("%-20s %s" % (name, ', '.join(str(s) for s in CASES[name][1])))
+        return
+
+    report = {'format_version': FORMAT_VERSION, 'started': time.strftime('%Y-%m-%dT%H:%M:%S'), 'machine': machine(),
+              'repeat': args.repeat, 'results': []}
+    for name in names:
+        for rows in args.sizes or CASES[name][1]:
+            result = dict({'case': name, 'rows': rows}, **spawn_case(name, rows, args.repeat, args.timeout))
+            report['results'].append(result)
+
+            if 'metrics' in result:
+                summary = ', '.join("%s=%.4g" % (k, v) for k, v in result['metrics'].items())
+                print("%-20s %8d  %s  (peak RSS %.0f MB)" % (name, rows, summary, result['peak_rss_mb']))
+            else:
+                print("%-20s %8d  %s" % (name, rows, result.get('skipped') or result.get('error')))
+
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=1)
+
+
+if __name__ == '__main__':
+    main()
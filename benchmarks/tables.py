@@ -0,0 +1,71 @@
+# Generated tables for the benchmarks.
+#
+# * `numeric_table`: the two-feature imbalanced classification data of `TabularDataset.create_synthetic`.
+# * `mixed_table`: a table with continuous columns of different shapes (normal, skewed, multimodal, integer counts),
+#   categorical string columns with skewed frequencies and an imbalanced class column.
+
+import numpy as np
+import pandas as pd
+
+
+def numeric_table(num_rows, random_state=0):
+    """Create `num_rows` rows with `TabularDataset.create_synthetic` (two features, two classes with a 1:4 ratio).
+
+    Returns:
+        The feature matrix and the class labels.
+    """
+    from artsyn.TabularDataset import TabularDataset
+
+    dataset = TabularDataset('synthetic', random_state=random_state)
+    dataset.create_synthetic(num_samples=num_rows, num_classes=2, imb_ratio=[0.8, 0.2])
+    return dataset.x_, dataset.y_
+
+
+def mixed_table(num_rows, num_continuous=6, num_categorical=4, num_classes=3, random_state=0):
+    """Create a mixed-type table of `num_rows` rows.
+
+    Returns:
+        A `pd.DataFrame` with the feature columns and the class column 'class' (last), and the indices of the
+        categorical feature columns.
+    """
+    rng = np.random.default_rng(random_state)
+    columns = {}
+
+    shapes = ('normal', 'lognormal', 'bimodal', 'counts')
+    for j in range(num_continuous):
+        shape = shapes[j % len(shapes)]
+        if shape == 'normal':
+            values = rng.normal(loc=j, scale=1 + j, size=num_rows)
+        elif shape == 'lognormal':
+            values = rng.lognormal(mean=0, sigma=1, size=num_rows)
+        elif shape == 'bimodal':
+            values = np.where(rng.random(num_rows) < 0.3, rng.normal(-5, 1, num_rows), rng.normal(5, 2, num_rows))
+        else:
+            values = rng.poisson(lam=3 + j, size=num_rows).astype(float)
+        columns['c' + str(j)] = values
+
+    for j in range(num_categorical):
+        num_values = 3 + 4 * j
+        weights = 1.0 / np.arange(1, num_values + 1)
+        columns['d' + str(j)] = rng.choice(['v' + str(v) for v in range(num_values)], size=num_rows,
+                                           p=weights / weights.sum())
+
+    # Imbalanced classes that depend on the first continuous and the first categorical column.
+    class_weights = np.geomspace(1, 0.1, num_classes)
+    score = columns['c0'] + (columns['d0'] == 'v0') if num_categorical > 0 else columns['c0']
+    noise = rng.choice(num_classes, size=num_rows, p=class_weights / class_weights.sum())
+    columns['class'] = np.where(rng.random(num_rows) < 0.8, noise, (score > np.median(score)).astype(int))
+
+    return pd.DataFrame(columns), list(range(num_continuous, num_continuous + num_categorical))
+
+
+def encode(df, categorical_columns):
+    """Label encode the categorical columns of a `mixed_table`.
+
+    Returns:
+        The feature matrix (float) and the class labels.
+    """
+    x = df.iloc[:, :-1].copy()
+    for j in categorical_columns:
+        x[x.columns[j]] = pd.factorize(x.iloc[:, j], sort=True)[0]
+    return x.to_numpy(dtype=float), df.iloc[:, -1].to_numpy()
@@ -46,7 +46,8 @@ setup(
                       "pandas",
                       "matplotlib",
                       "seaborn",
-                      "joblib",
+                      "joblib>=1.3",
+                      "threadpoolctl",
                       "sdv",
                       "torch>=2.0.0",
                       "scikit-learn>=1.4.0",